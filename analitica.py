@@ -0,0 +1,195 @@
+# ==========================================================
+# Agregados de analítica (ingresos, ocupación, no-show, clientes)
+# - data/analitica/AAAA-MM.csv: por día × Tipo × Zona × Estado (turnos, servicios, minutos, ingresos)
+# - data/analitica/clientes.csv: por Cliente_ID × Estado (turnos, ingresos)
+# - Se actualizan por diferencia (sale la versión vieja del turno, entra la nueva) en cada
+#   reserva / cancelación / finalización / edición; reconstruir() los rehace desde cero
+# - Los precios salen del catálogo: si el catálogo cambia (otra firma) hay que reconstruir
+# - Uso por consola: python analitica.py reconstruir
+# ==========================================================
+import argparse
+import hashlib
+import json
+import os
+from datetime import date, datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import storage
+
+CLAVES_DIA = ["Fecha", "Tipo", "Zona", "Estado"]
+METRICAS_DIA = ["Turnos", "Servicios", "Minutos", "Ingresos"]
+CLAVES_CLIENTE = ["Cliente_ID", "Estado"]
+METRICAS_CLIENTE = ["Turnos", "Ingresos"]
+
+_cache: dict = {}  # archivo de agregados -> (mtime + tamaño, DataFrame)
+
+
+def analitica_dir(data_dir: Path) -> Path:
+    return Path(data_dir) / "analitica"
+
+
+def _lock(data_dir: Path) -> storage.FileLock:
+    return storage.FileLock(analitica_dir(data_dir) / ".analitica.lock")
+
+
+def firma(servicios: dict[tuple[str, str], tuple[int, int]]) -> str:
+    """Huella del catálogo (Tipo, Zona, duración, precio): si cambia, los agregados quedan viejos."""
+    texto = json.dumps(sorted([t, z, d, p] for (t, z), (d, p) in servicios.items()), ensure_ascii=False)
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()[:16]
+
+
+def contribucion(turnos: pd.DataFrame, servicios: dict[tuple[str, str], tuple[int, int]],
+                 signo=1) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Aporte de un conjunto de turnos a los agregados. Cada turno se abre en sus zonas: cuenta
+    como un turno (y suma su Duracion_total) en la primera zona y cada zona suma su precio.
+    `signo` (escalar o uno por fila) resta las versiones viejas. Devuelve (por día, por cliente).
+    """
+    if turnos.empty:
+        return (pd.DataFrame(columns=CLAVES_DIA + METRICAS_DIA), pd.DataFrame(columns=CLAVES_CLIENTE + METRICAS_CLIENTE))
+    t = pd.DataFrame({
+        "Fecha": pd.to_datetime(turnos["Fecha"].astype(str), errors="coerce").dt.strftime("%Y-%m-%d").to_numpy(),
+        "Tipo": turnos["Tipo"].astype(str).to_numpy(),
+        "Estado": turnos["Estado"].astype(str).to_numpy(),
+        "Cliente_ID": turnos["Cliente_ID"].astype(str).to_numpy(),
+        "Minutos": pd.to_numeric(turnos["Duracion_total"], errors="coerce").fillna(0).to_numpy(),
+        "Zona": turnos["Zonas"].astype(str).str.split(",").to_numpy(),
+        "_signo": signo,
+    }).dropna(subset=["Fecha"]).reset_index(drop=True)
+    t["_turno"] = t.index
+    z = t.explode("Zona")
+    z["Zona"] = z["Zona"].fillna("").str.strip()
+    primera = (~z["_turno"].duplicated()).to_numpy()
+    precios = {f"{tp}\x1f{zn}": p for (tp, zn), (_, p) in servicios.items()}
+    signos = z["_signo"].to_numpy()
+    z["Ingresos"] = (z["Tipo"] + "\x1f" + z["Zona"]).map(precios).fillna(0).to_numpy() * signos
+    z["Turnos"] = primera * signos
+    z["Servicios"] = signos
+    z["Minutos"] = z["Minutos"].where(primera, 0) * signos
+    dias = z.groupby(CLAVES_DIA, as_index=False, sort=False)[METRICAS_DIA].sum()
+    clientes = z.groupby(CLAVES_CLIENTE, as_index=False, sort=False)[METRICAS_CLIENTE].sum()
+    return dias, clientes
+
+
+def _sumar(base: pd.DataFrame, delta: pd.DataFrame, claves: list[str], metricas: list[str]) -> pd.DataFrame:
+    """base + delta por clave (ambos ya agrupados); se descartan las claves que quedan en cero."""
+    out = base.set_index(claves)[metricas].astype(float).add(delta.set_index(claves)[metricas], fill_value=0)
+    return out[(out != 0).any(axis=1)].reset_index()
+
+
+def _leer_csv(path: Path, columnas: list[str]) -> pd.DataFrame:
+    if not path.exists():
+        return pd.DataFrame(columns=columnas)
+    return pd.read_csv(path, dtype={c: str for c in CLAVES_DIA + CLAVES_CLIENTE}, keep_default_na=False)
+
+
+def _meta_path(data_dir: Path) -> Path:
+    return analitica_dir(data_dir) / "meta.json"
+
+
+def leer_meta(data_dir: Path) -> dict | None:
+    path = _meta_path(data_dir)
+    return json.loads(path.read_text(encoding="utf-8")) if path.exists() else None
+
+
+def invalidar(data_dir: Path):
+    """Marca los agregados como viejos (p. ej. tras reemplazar la tabla entera): el próximo tablero reconstruye."""
+    with _lock(data_dir):
+        _meta_path(data_dir).unlink(missing_ok=True)
+
+
+def aplicar(data_dir: Path, quitar: pd.DataFrame | None, agregar: pd.DataFrame | None,
+            servicios: dict[tuple[str, str], tuple[int, int]]) -> bool:
+    """
+    Actualiza los agregados con la diferencia entre las filas de turnos `agregar` y `quitar`.
+    Solo reescribe los meses tocados y la tabla de clientes. Si los agregados no existen o
+    se armaron con otro catálogo no hace nada (devuelve False): toca reconstruir.
+    """
+    with _lock(data_dir):
+        meta = leer_meta(data_dir)
+        if meta is None or meta.get("firma") != firma(servicios):
+            return False
+        partes = [df for df in (agregar, quitar) if df is not None and not df.empty]
+        if not partes:
+            return True
+        signos = np.concatenate([np.full(len(df), 1 if df is agregar else -1) for df in partes])
+        delta_d, delta_c = contribucion(pd.concat(partes, ignore_index=True), servicios, signos)
+        carpeta = analitica_dir(data_dir)
+        for mes, grupo in delta_d.groupby(delta_d["Fecha"].str[:7]):
+            path = carpeta / f"{mes}.csv"
+            storage.escribir_csv_atomico(_sumar(_leer_csv(path, CLAVES_DIA + METRICAS_DIA), grupo, CLAVES_DIA, METRICAS_DIA), path)
+        path = carpeta / "clientes.csv"
+        storage.escribir_csv_atomico(
+            _sumar(_leer_csv(path, CLAVES_CLIENTE + METRICAS_CLIENTE), delta_c, CLAVES_CLIENTE, METRICAS_CLIENTE), path)
+        return True
+
+
+def reconstruir(data_dir: Path, turnos: pd.DataFrame, servicios: dict[tuple[str, str], tuple[int, int]]) -> int:
+    """Rehace todos los agregados desde `turnos` (tabla viva + archivo). Devuelve los turnos leídos."""
+    carpeta = analitica_dir(data_dir)
+    carpeta.mkdir(parents=True, exist_ok=True)
+    dias, clientes = contribucion(turnos, servicios)
+    with _lock(data_dir):
+        for path in carpeta.glob("*.csv"):
+            path.unlink()
+        for mes, grupo in dias.groupby(dias["Fecha"].str[:7]):
+            storage.escribir_csv_atomico(grupo.reset_index(drop=True), carpeta / f"{mes}.csv")
+        storage.escribir_csv_atomico(clientes, carpeta / "clientes.csv")
+        meta = {"firma": firma(servicios), "reconstruido": datetime.now().isoformat(timespec="seconds"),
+                "turnos": len(turnos)}
+        tmp = _meta_path(data_dir).with_name(".meta.json.tmp")
+        tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, _meta_path(data_dir))
+    return len(turnos)
+
+
+def _leer_cacheado(path: Path, claves: list[str], metricas: list[str]) -> pd.DataFrame:
+    """Un archivo de agregados, parseado de nuevo solo si cambió (mtime + tamaño)."""
+    llave = storage._stat_key(path)
+    hit = _cache.get(path)
+    if hit is not None and hit[0] == llave:
+        return hit[1]
+    df = _leer_csv(path, claves + metricas)
+    for m in metricas:
+        df[m] = pd.to_numeric(df[m], errors="coerce").fillna(0)
+    _cache[path] = (llave, df)
+    return df
+
+
+def leer(data_dir: Path, desde: date, hasta: date) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    (agregados por día entre `desde` y `hasta`, agregados por cliente). Solo se leen los
+    meses del rango: el costo depende del rango y del catálogo, no de cuántos turnos hay.
+    """
+    carpeta = analitica_dir(data_dir)
+    meses = pd.period_range(desde, hasta, freq="M").strftime("%Y-%m")
+    frames = [_leer_cacheado(carpeta / f"{mes}.csv", CLAVES_DIA, METRICAS_DIA) for mes in meses]
+    frames = [f for f in frames if not f.empty]
+    if frames:
+        dias = pd.concat(frames, ignore_index=True)
+    else:
+        dias = pd.DataFrame(columns=CLAVES_DIA + METRICAS_DIA).astype({m: float for m in METRICAS_DIA})
+    dias = dias[dias["Fecha"].between(desde.isoformat(), hasta.isoformat())].reset_index(drop=True)
+    clientes = _leer_cacheado(carpeta / "clientes.csv", CLAVES_CLIENTE, METRICAS_CLIENTE)
+    return dias, clientes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Agregados de analítica de turnos")
+    parser.add_argument("accion", choices=["reconstruir"])
+    parser.add_argument("--data", default=None, help="Carpeta de datos (por defecto data/ o ESTETICA_DATA_DIR)")
+    parser.add_argument("--storage", default=None, help="csv o sqlite")
+    args = parser.parse_args(argv)
+
+    import core
+    if args.data or args.storage:
+        core.configurar(Path(args.data) if args.data else None, args.storage)
+    n = core.reconstruir_analitica()
+    print(f"Agregados reconstruidos desde {n} turnos en {analitica_dir(core.DATA_DIR)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 # ==========================================================
 # Estética | Turnos tipo Calendly (Local, sin Google/Secrets)
-# Landing + Reserva paso a paso + Admin (Agenda, Servicios, Clientes, Historial)
+# Landing + Reserva paso a paso + Admin (Agenda, Servicios, Clientes, Historial, Análisis)
 # - Selección por grupos exclusivos (Piernas / Brazos / Rostro) + zonas sueltas (en un bloque)
 # - Horarios en selectbox (mobile friendly) + bloquea horarios pasados del día actual
 # - Editor masivo de turnos, catálogo editable, clientes editable
@@ -8,12 +8,24 @@
 # - En "Turno pendiente" y "Cliente existente": Nombre (– email)
 # - Estilos responsive para celular
 # ==========================================================
+import io
+
 import streamlit as st
 import pandas as pd
-from datetime import datetime, timedelta, time, date
-from pathlib import Path
-import uuid
-import re
+from datetime import timedelta, date
+
+import archivo
+import core
+import historias
+import importacion
+import recordatorios
+import rendimiento
+from core import (
+    DIAS_BUSQUEDA, HIST_POR_PAGINA, SLOT_STEP_MIN,
+    load_df, load_turnos, indice_clientes, indice_turnos, aplicar_cambios_editor,
+    catalogo, humanize_list, generar_slots, filter_future_slots, disponibilidad_rango,
+    leer_historial, compactar_historiales, reindexar_historias, historia_cliente,
+)
 
 # =========================
 # CONFIG GENERAL
@@ -21,273 +33,71 @@ import re
 st.set_page_config(page_title="Turnos Estética", page_icon="💆‍♀️", layout="wide")
 
 APP_TITLE = "💆‍♀️ Turnos Estética"
-BASE_DIR = Path(__file__).parent
-DATA_DIR = BASE_DIR / "data"
-DATA_DIR.mkdir(exist_ok=True)
-
-FILES = {
-    "servicios": DATA_DIR / "servicios.csv",
-    "clientes": DATA_DIR / "clientes.csv",
-    "turnos": DATA_DIR / "turnos.csv",
-    "historial": DATA_DIR / "historial.csv",
-}
 
-HISTORIAS_DIR = DATA_DIR / "historias"
-HISTORIAS_DIR.mkdir(exist_ok=True)
-
-# Parámetros
-SLOT_STEP_MIN = 10
-BUFFER_MIN_DEFAULT = 5
+# Parámetros de la interfaz
+DIAS_SEMANA = ["Lun", "Mar", "Mié", "Jue", "Vie", "Sáb", "Dom"]
+MESES = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio", "Julio", "Agosto",
+         "Septiembre", "Octubre", "Noviembre", "Diciembre"]
+EDIT_POR_PAGINA = [25, 50, 100]  # filas por página del editor masivo de turnos
+COLS_EDIT_TURNOS = ["Turno_ID","Cliente_ID","Fecha","Inicio","Fin","Tipo","Zonas","Duracion_total","Estado","Recursos","Notas","RecordatorioEnviado"]
 
 # Admin
 ADMIN_USER = "admin"
 ADMIN_PASS = "admin"
 
-# Disponibilidad semanal (1=Lun ... 7=Dom)
-DEFAULT_DISPONIBILIDAD_CODE = {
-    1: [("09:00", "13:00"), ("14:00", "17:00")],
-    2: [("09:00", "17:00")],
-    3: [("09:00", "17:00")],
-    4: [("09:00", "17:00")],
-    5: [("09:00", "15:00")],
-    # 6,7 sin turnos (sábado/domingo)
-}
-
-# =========================
-# SEMILLAS
-# =========================
-DEFAULT_SERVICIOS = pd.DataFrame([
-    # Tipo, Zona, Duracion_min, Precio
-    # ---- LÁSER ----
-    ["Láser", "Axilas",            15,  8000],
-    ["Láser", "Medias piernas",    25, 16000],
-    ["Láser", "Piernas completas", 40, 25000],
-    ["Láser", "Brazos",            30, 18000],
-    ["Láser", "Medio brazo",       20, 12000],
-    ["Láser", "Cavado",            20, 12000],
-    ["Láser", "Tiro de cola",      15, 10000],
-    ["Láser", "Rostro completo",   25, 15000],
-    ["Láser", "Cara",              15,  9000],
-    # ---- DESCARTABLE ----
-    ["Descartable", "Axilas",            20,  6000],
-    ["Descartable", "Medias piernas",    30, 12000],
-    ["Descartable", "Piernas completas", 45, 20000],
-    ["Descartable", "Brazos",            35, 15000],
-    ["Descartable", "Medio brazo",       25, 10000],
-    ["Descartable", "Cavado",            25, 10000],
-    ["Descartable", "Tiro de cola",      20,  8000],
-    ["Descartable", "Rostro completo",   30, 12000],
-    ["Descartable", "Cara",              20,  8000],
-], columns=["Tipo", "Zona", "Duracion_min", "Precio"])
-
-DEFAULT_CLIENTES = pd.DataFrame([], columns=["Cliente_ID", "Nombre", "WhatsApp", "Email", "Notas"])
-DEFAULT_TURNOS = pd.DataFrame([], columns=[
-    "Turno_ID","Cliente_ID","Fecha","Inicio","Fin","Tipo","Zonas",
-    "Duracion_total","Estado","Notas","RecordatorioEnviado"
-])
-DEFAULT_HISTORIAL_GLOBAL = pd.DataFrame([], columns=["Cliente_ID","Nombre","Fecha","Evento","Detalles"])
-
-# =========================
-# IO DATOS
-# =========================
-def ensure_files():
-    if not FILES["servicios"].exists():
-        DEFAULT_SERVICIOS.to_csv(FILES["servicios"], index=False, encoding="utf-8")
-    if not FILES["clientes"].exists():
-        DEFAULT_CLIENTES.to_csv(FILES["clientes"], index=False, encoding="utf-8")
-    if not FILES["turnos"].exists():
-        DEFAULT_TURNOS.to_csv(FILES["turnos"], index=False, encoding="utf-8")
-    if not FILES["historial"].exists():
-        DEFAULT_HISTORIAL_GLOBAL.to_csv(FILES["historial"], index=False, encoding="utf-8")
-
-def load_df(name: str) -> pd.DataFrame:
-    ensure_files()
-    df = pd.read_csv(FILES[name], dtype=str).fillna("")
-    if name == "servicios":
-        for col in ["Tipo", "Zona"]:
-            df[col] = df[col].astype(str).str.strip()
-        df = df[(df["Tipo"] != "") & (df["Zona"] != "")]
-        for c in ["Duracion_min", "Precio"]:
-            df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0).astype(int)
-        df = df.drop_duplicates(subset=["Tipo", "Zona"], keep="first").reset_index(drop=True)
-    elif name == "clientes":
-        if "Cliente_ID" in df.columns and "WhatsApp" in df.columns:
-            df["Cliente_ID"] = df["Cliente_ID"].astype(str).str.strip()
-            df["WhatsApp"] = df["WhatsApp"].astype(str).str.strip()
-            df.loc[df["Cliente_ID"] == "", "Cliente_ID"] = df["WhatsApp"]
-            df.loc[df["WhatsApp"] == "", "WhatsApp"] = df["Cliente_ID"]
-    elif name == "turnos":
-        if "Fecha" in df.columns:
-            df["Fecha"] = pd.to_datetime(df["Fecha"], errors="coerce").dt.date
-    return df
-
-def save_df(name: str, df: pd.DataFrame):
-    df.to_csv(FILES[name], index=False, encoding="utf-8")
-
-# =========================
-# UTILS
-# =========================
-def to_time(hhmm: str):
-    s = str(hhmm).strip()
-    if not s or ":" not in s:
-        return None
-    try:
-        hh, mm = s.split(":")[:2]
-        return time(int(hh), int(mm))
-    except:
-        return None
-
-def overlaps(start1, end1, start2, end2):
-    return (start1 < end2) and (start2 < end1)
-
-def humanize_list(items):
-    return ", ".join(items or [])
-
-def calc_duracion(servicios_df: pd.DataFrame, tipo: str, zonas: list[str]) -> int:
-    sel = servicios_df[(servicios_df["Tipo"] == tipo) & (servicios_df["Zona"].isin(zonas))]
-    return int(sel["Duracion_min"].sum()) if not sel.empty else 0
-
-def calc_precio(servicios_df: pd.DataFrame, tipo: str, zonas: list[str]) -> int:
-    sel = servicios_df[(servicios_df["Tipo"] == tipo) & (servicios_df["Zona"].isin(zonas))]
-    return int(sel["Precio"].sum()) if not sel.empty else 0
-
-def generar_slots(date_obj: date, dur_min: int, turnos_df: pd.DataFrame, slot_step_min: int = SLOT_STEP_MIN):
-    if dur_min <= 0:
-        return []
-    weekday = date_obj.isoweekday()
-    tramos = DEFAULT_DISPONIBILIDAD_CODE.get(weekday, [])
-    if not tramos:
-        return []
-
-    activos = pd.DataFrame()
-    if not turnos_df.empty:
-        activos = turnos_df[(turnos_df["Fecha"] == date_obj) & (~turnos_df["Estado"].isin(["Cancelado", "No-show"]))].copy()
-
-    result = []
-    step = timedelta(minutes=slot_step_min)
-    dur = timedelta(minutes=dur_min)
-    buff = timedelta(minutes=BUFFER_MIN_DEFAULT)
-
-    for (ini, fin) in tramos:
-        ti, tf = to_time(ini), to_time(fin)
-        if not ti or not tf:
-            continue
-        start_dt = datetime.combine(date_obj, ti)
-        end_window = datetime.combine(date_obj, tf)
-        current = start_dt
-        while current + dur <= end_window:
-            c_start, c_end = current, current + dur
-            ok = True
-            if not activos.empty:
-                for _, t in activos.iterrows():
-                    try:
-                        t_start = datetime.combine(date_obj, datetime.strptime(t["Inicio"], "%H:%M").time())
-                        t_end = datetime.combine(date_obj, datetime.strptime(t["Fin"], "%H:%M").time())
-                    except Exception:
-                        continue
-                    if overlaps(c_start - buff, c_end + buff, t_start, t_end):
-                        ok = False
-                        break
-            if ok:
-                result.append(c_start)
-            current += step
-    return sorted(list(dict.fromkeys(result)))
-
-def filter_future_slots(date_obj: date, slots: list[datetime]) -> list[datetime]:
-    """Si la fecha es hoy, filtra slots que ya pasaron respecto al ahora del servidor."""
-    if not slots:
-        return []
-    now = datetime.now()
-    if date_obj == now.date():
-        return [s for s in slots if s > now]
-    return slots
-
-def slugify(text: str) -> str:
-    text = str(text or "").strip().lower()
-    text = re.sub(r"[^\w\s-]", "", text)
-    text = re.sub(r"[\s_-]+", "-", text)
-    return text[:60] if text else "cliente"
-
-def get_cliente_display_row(row) -> str:
-    """Devuelve 'Nombre – email' si hay email; si no, 'Nombre'; si no hay, el Cliente_ID."""
-    nombre = str(row.get("Nombre", "") or "").strip()
-    email = str(row.get("Email", "") or "").strip()
-    cid = str(row.get("Cliente_ID", "") or "").strip()
-    if nombre and email:
-        return f"{nombre} – {email}"
-    if nombre:
-        return nombre
-    return cid or "Sin nombre"
-
-def write_historia_cliente(cliente_id: str, nombre: str, turno_row: pd.Series):
+def guardado_editor(name: str, key: str, res: dict):
     """
-    Crea/actualiza carpeta del cliente y guarda:
-    - un TXT por turno con resumen
-    - un CSV 'historial.csv' por cliente
-    - agrega entrada al historial global
+    Tras guardar se descarta el estado del editor (las posiciones de fila ya no valen
+    contra los datos nuevos) y se recarga; el resultado se muestra en la próxima corrida.
     """
-    carpeta = HISTORIAS_DIR / f"{cliente_id}_{slugify(nombre)}"
-    carpeta.mkdir(parents=True, exist_ok=True)
-
-    # TXT por turno
-    ts = datetime.now().strftime("%Y%m%d_%H%M")
-    turnoid = turno_row["Turno_ID"]
-    txt_path = carpeta / f"{ts}_{turnoid}.txt"
-    resumen = []
-    resumen.append(f"Fecha archivo: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
-    resumen.append(f"Turno_ID: {turnoid}")
-    resumen.append(f"Cliente_ID: {cliente_id}")
-    resumen.append(f"Nombre: {nombre}")
-    resumen.append(f"Turno Fecha: {turno_row.get('Fecha','')}")
-    resumen.append(f"Horario: {turno_row.get('Inicio','')} - {turno_row.get('Fin','')}")
-    resumen.append(f"Tipo: {turno_row.get('Tipo','')}")
-    resumen.append(f"Zonas: {turno_row.get('Zonas','')}")
-    resumen.append(f"Duración (min): {turno_row.get('Duracion_total','')}")
-    resumen.append(f"Estado: {turno_row.get('Estado','')}")
-    resumen.append(f"Notas: {turno_row.get('Notas','')}")
-    txt_path.write_text("\n".join(resumen), encoding="utf-8")
-
-    # CSV por cliente
-    cli_hist_path = carpeta / "historial.csv"
-    cols_cli = ["Fecha","Evento","Turno_ID","Tipo","Zonas","Duracion_min","Notas"]
-    nuevo_cli = pd.DataFrame([{
-        "Fecha": datetime.now().strftime("%Y-%m-%d %H:%M"),
-        "Evento": "Turno finalizado",
-        "Turno_ID": turnoid,
-        "Tipo": turno_row.get("Tipo",""),
-        "Zonas": turno_row.get("Zonas",""),
-        "Duracion_min": turno_row.get("Duracion_total",""),
-        "Notas": turno_row.get("Notas",""),
-    }])
-    if cli_hist_path.exists():
-        df_cli = pd.read_csv(cli_hist_path, dtype=str).fillna("")
-        df_cli = pd.concat([df_cli, nuevo_cli], ignore_index=True)
-    else:
-        df_cli = nuevo_cli[cols_cli] if set(cols_cli).issubset(nuevo_cli.columns) else nuevo_cli
-    df_cli.to_csv(cli_hist_path, index=False, encoding="utf-8")
-
-    # Historial global
-    global_hist = load_df("historial")
-    nuevo_global = pd.DataFrame([{
-        "Cliente_ID": cliente_id,
-        "Nombre": nombre,
-        "Fecha": datetime.now().strftime("%Y-%m-%d %H:%M"),
-        "Evento": "Turno finalizado",
-        "Detalles": f"{turno_row.get('Tipo','')} | {turno_row.get('Zonas','')} | {turno_row.get('Fecha','')} {turno_row.get('Inicio','')}-{turno_row.get('Fin','')}"
-    }])
-    global_hist = pd.concat([global_hist, nuevo_global], ignore_index=True)
-    save_df("historial", global_hist)
-
-def find_cliente_hist_path(cliente_id: str):
+    st.session_state[f"resultado_{name}"] = res
+    del st.session_state[key]
+    st.rerun()
+
+def mostrar_resultado_guardado(name: str):
+    res = st.session_state.pop(f"resultado_{name}", None)
+    if res is None:
+        return
+    st.success(f"Cambios guardados ({res['actualizados']} actualizados, {res['agregados']} agregados, {res['borrados']} borrados).")
+    if res["conflictos"]:
+        st.warning("Algunas filas no se guardaron:\n\n" + "\n".join(f"- {c}" for c in res["conflictos"]))
+    if res.get("auditoria") is not None:
+        mostrar_auditoria(res["auditoria"])
+
+def mostrar_auditoria(problemas: pd.DataFrame):
+    if problemas.empty:
+        st.success("Agenda sin superposiciones ni inconsistencias ✅")
+        return
+    resumen = problemas["Problema"].value_counts()
+    st.warning("Revisá la agenda: " + ", ".join(f"{n} × {p}" for p, n in resumen.items()))
+    st.dataframe(problemas, use_container_width=True, hide_index=True)
+
+def calendario_mes(mapa: pd.DataFrame, detalle: str = "slots"):
     """
-    Busca la carpeta data/historias/<cliente_id>_* y devuelve (hist_csv_path, carpeta_path).
-    Si no existe, retorna (None, None).
+    Mapa de calor del mes (salida de core.mapa_mes): una celda por día, más verde cuanto
+    más lugar queda. detalle="slots" muestra horarios reservables; "libres", minutos libres.
     """
-    for p in (HISTORIAS_DIR).glob(f"{cliente_id}_*"):
-        hist_csv = p / "historial.csv"
-        if hist_csv.exists():
-            return hist_csv, p
-    return None, None
+    tope = max(int(mapa["Slots"].max()), 1)
+    celdas = ['<td></td>'] * mapa["Fecha"].iloc[0].weekday()
+    for f, libres, slots in mapa.itertuples(index=False):
+        if slots:
+            alfa = 0.15 + 0.75 * slots / tope
+            estilo = f"background:rgba(82,196,26,{alfa:.2f})"
+            texto = f"{slots} horarios" if detalle == "slots" else f"{libres // 60}h{libres % 60:02d} libres"
+        else:
+            estilo, texto = "background:#f5f5f5;color:#aaa", "—"
+        celdas.append(f'<td style="{estilo}"><b>{f.day}</b><br><span class="small">{texto}</span></td>')
+    celdas += ['<td></td>'] * (-len(celdas) % 7)
+    filas = "".join("<tr>" + "".join(celdas[i:i + 7]) + "</tr>" for i in range(0, len(celdas), 7))
+    cabecera = "".join(f"<th>{d}</th>" for d in DIAS_SEMANA)
+    st.markdown(f'<table class="cal"><tr>{cabecera}</tr>{filas}</table>', unsafe_allow_html=True)
+
+def meses_entre(desde: date, hasta: date) -> list[tuple[int, int]]:
+    meses, (a, m) = [], (desde.year, desde.month)
+    while (a, m) <= (hasta.year, hasta.month):
+        meses.append((a, m))
+        a, m = (a + 1, 1) if m == 12 else (a, m + 1)
+    return meses
 
 def go_home():
     st.session_state["vista"] = "home"
@@ -299,6 +109,14 @@ def go_home():
 if "vista" not in st.session_state:
     st.session_state["vista"] = "home"
 
+# Medición de tiempos (opt-in). Si la corrida anterior terminó con st.stop()/st.rerun()
+# no llegó al cierre del final del script: se cierra acá.
+if rendimiento.activo():
+    cortada = rendimiento.cerrar_corrida(st.session_state.pop("perf_corrida", None), al_final=False)
+    if cortada:
+        st.session_state["perf_ultima"] = cortada
+    st.session_state["perf_corrida"] = rendimiento.iniciar_corrida(st.session_state["vista"])
+
 _defaults_booking_state = {
     "step": "pick_service",  # pick_service -> pick_date -> pick_time -> client_details -> confirm
     "service_tipo": None,
@@ -333,6 +151,9 @@ st.markdown("""
 .small { font-size:13px; color:#666; }
 hr { border:none; border-top:1px solid #eee; margin:8px 0 16px; }
 .confirm-box { background:#F6FFED; border:1px solid #B7EB8F; border-radius:12px; padding:16px; }
+.cal { width:100%; border-collapse:separate; border-spacing:4px; table-layout:fixed; }
+.cal th { font-size:12px; color:#666; font-weight:600; text-align:center; }
+.cal td { border-radius:8px; padding:6px 4px; text-align:center; vertical-align:top; height:52px; }
 
 /* Mobile tweaks */
 @media (max-width: 768px) {
@@ -352,6 +173,7 @@ st.title(APP_TITLE)
 # HOME (Landing)
 # =========================
 if st.session_state["vista"] == "home":
+    rendimiento.tramo("home")
     left, right = st.columns([3, 1])
     with left:
         st.markdown("## Bienvenida 👋")
@@ -371,6 +193,7 @@ if st.session_state["vista"] == "home":
 # LOGIN ADMIN
 # =========================
 if st.session_state["vista"] == "login_admin":
+    rendimiento.tramo("login_admin")
     st.markdown("### 🔐 Ingresar al panel")
     colA, colB = st.columns(2)
     user = colA.text_input("Usuario")
@@ -390,59 +213,42 @@ if st.session_state["vista"] == "login_admin":
 # RESERVA — TIPO CALENDLY (grupos exclusivos + sueltas)
 # =========================
 if st.session_state["vista"] == "reserva":
-    servicios_df = load_df("servicios")
-    turnos_df = load_df("turnos")
-    clientes_df = load_df("clientes")
-
     if st.button("⬅ Volver al inicio"):
         go_home()
 
     st.markdown("### Reservá tu turno en 3 pasos")
     booking = st.session_state["booking"]
+    rendimiento.tramo(f"reserva/{booking['step']}")
 
     # STEP 1 — Elegir Servicio (grupos exclusivos + sueltas)
     if booking["step"] == "pick_service":
         st.markdown('<div class="step-title">1) Elegí tu servicio</div>', unsafe_allow_html=True)
 
-        if servicios_df.empty:
+        cat = catalogo()
+        if not cat.tipos:
             st.warning("No hay servicios cargados. Volvé más tarde.")
             st.stop()
 
-        tipos_raw = [t for t in servicios_df["Tipo"].unique().tolist() if str(t).strip() != ""]
-        prefer = ["Descartable", "Láser"]
-        tipos = [t for t in prefer if t in tipos_raw] + [t for t in tipos_raw if t not in prefer]
-
-        tipo_sel = st.selectbox("Tipo", tipos, index=0, key="tipo_sel")
-        zonas_tipo = servicios_df[(servicios_df["Tipo"] == tipo_sel) & (servicios_df["Zona"].str.strip() != "")]["Zona"].unique().tolist()
-
-        GROUP_RULES = {
-            "Piernas": ["Medias piernas", "Piernas completas"],
-            "Brazos":  ["Brazos", "Medio brazo"],
-            "Rostro":  ["Rostro completo", "Cara"],
-        }
+        tipo_sel = st.selectbox("Tipo", cat.tipos, index=0, key="tipo_sel")
 
         with st.container():
             st.markdown('<div class="card">', unsafe_allow_html=True)
             st.markdown("##### Zonas")
             seleccion_grupos = []
-            for grupo, miembros in GROUP_RULES.items():
-                presentes = [m for m in miembros if m in zonas_tipo]
-                if len(presentes) >= 2:
-                    choice = st.radio(
-                        f"{grupo}",
-                        ["Ninguna"] + presentes, index=0, horizontal=True, key=f"radio_{tipo_sel}_{grupo}"
-                    )
-                    if choice != "Ninguna":
-                        seleccion_grupos.append(choice)
+            for grupo, presentes in cat.grupos[tipo_sel]:
+                choice = st.radio(
+                    f"{grupo}",
+                    ["Ninguna"] + presentes, index=0, horizontal=True, key=f"radio_{tipo_sel}_{grupo}"
+                )
+                if choice != "Ninguna":
+                    seleccion_grupos.append(choice)
 
-            usados_en_grupos = {m for ml in GROUP_RULES.values() for m in ml}
-            zonas_sueltas = [z for z in zonas_tipo if z not in usados_en_grupos]
+            zonas_sueltas = cat.sueltas[tipo_sel]
             zonas_extra = st.multiselect("Otras zonas (podés elegir varias)", zonas_sueltas, key=f"otras_{tipo_sel}") if zonas_sueltas else []
             st.markdown('</div>', unsafe_allow_html=True)
 
         zonas_final = list(dict.fromkeys(seleccion_grupos + zonas_extra))
-        dur_preview = calc_duracion(servicios_df, tipo_sel, zonas_final) if zonas_final else 0
-        precio_preview = calc_precio(servicios_df, tipo_sel, zonas_final) if zonas_final else 0
+        dur_preview, precio_preview = cat.cotizar(tipo_sel, zonas_final) if zonas_final else (0, 0)
 
         c1, c2, c3 = st.columns([1,1,2])
         c1.metric("Duración total", f"{dur_preview} min")
@@ -466,15 +272,41 @@ if st.session_state["vista"] == "reserva":
         st.markdown('<div class="step-title">2) Elegí la fecha</div>', unsafe_allow_html=True)
         st.caption(f"Servicio: **{booking['service_tipo']}** — Zonas: **{humanize_list(booking['service_zonas'] or [])}** — ⏱ {booking['duracion']} min — AR$ {booking['precio_total']:,}")
 
+        pedidos = catalogo().requisitos(booking["service_tipo"], booking["service_zonas"] or [])
+        primeros, hay_dia = disponibilidad_rango(date.today(), DIAS_BUSQUEDA, booking["duracion"], pedidos=pedidos)
+        fechas_libres = [d for d, ok in hay_dia.items() if ok]
+
         c1, c2 = st.columns([1, 3])
         with c1:
-            fecha = st.date_input("Fecha", min_value=date.today(), value=booking["fecha"] or date.today())
+            fecha_default = booking["fecha"] or (fechas_libres[0] if fechas_libres else date.today())
+            fecha = st.date_input("Fecha", min_value=date.today(), value=fecha_default)
+            if fecha and fecha in hay_dia and not hay_dia[fecha]:
+                st.warning("Ese día no hay horarios para la duración elegida.")
             if st.button("⬅ Cambiar zonas"):
                 st.session_state["booking"] = _defaults_booking_state.copy()
                 st.session_state["booking"]["step"] = "pick_service"
                 st.rerun()
         with c2:
-            st.info("Luego vas a elegir el horario disponible.")
+            if not primeros:
+                st.info(f"No hay horarios disponibles en los próximos {DIAS_BUSQUEDA} días.")
+            else:
+                st.markdown("##### Próximos horarios disponibles")
+                cols = st.columns(min(3, len(primeros)))
+                for i, slot in enumerate(primeros):
+                    if cols[i % len(cols)].button(f"{DIAS_SEMANA[slot.weekday()]} {slot:%d/%m %H:%M}", key=f"prox_{i}", use_container_width=True):
+                        booking["fecha"] = slot.date()
+                        booking["slot_dt"] = slot
+                        booking["step"] = "client_details"
+                        st.session_state["booking"] = booking
+                        st.rerun()
+                st.caption("Días con lugar: " + ", ".join(d.strftime("%d/%m") for d in fechas_libres[:10]))
+
+        # Mapa del mes: horarios reservables por día para esta duración
+        meses = meses_entre(date.today(), date.today() + timedelta(days=DIAS_BUSQUEDA - 1))
+        mes_fecha = (fecha.year, fecha.month) if fecha else meses[0]
+        mes_sel = st.selectbox("Disponibilidad del mes", meses, index=meses.index(mes_fecha) if mes_fecha in meses else 0,
+                               format_func=lambda am: f"{MESES[am[1] - 1]} {am[0]}")
+        calendario_mes(core.mapa_mes(mes_sel[0], mes_sel[1], booking["duracion"], pedidos=pedidos))
 
         if st.button("Siguiente ➡️", type="primary"):
             if not fecha:
@@ -490,11 +322,16 @@ if st.session_state["vista"] == "reserva":
         st.markdown('<div class="step-title">3) Elegí el horario</div>', unsafe_allow_html=True)
         st.caption(f"{booking['fecha']} — {booking['service_tipo']} / {humanize_list(booking['service_zonas'] or [])} — ⏱ {booking['duracion']} min — AR$ {booking['precio_total']:,}")
 
+        aviso = st.session_state.pop("aviso_reserva", None)
+        if aviso:
+            st.error(aviso)
+
         if not booking["fecha"]:
             st.warning("Elegí una fecha.")
         else:
-            turnos_df = load_df("turnos")  # refresco
-            slots_all = generar_slots(booking["fecha"], booking["duracion"], turnos_df, SLOT_STEP_MIN)
+            pedidos = catalogo().requisitos(booking["service_tipo"], booking["service_zonas"] or [])
+            # Grilla del día cacheada: se rearma sola si los turnos de esa fecha cambiaron
+            slots_all = generar_slots(booking["fecha"], booking["duracion"], pedidos=pedidos)
             slots = filter_future_slots(booking["fecha"], slots_all)
             if not slots:
                 st.error("No hay horarios disponibles para esa fecha.")
@@ -525,8 +362,6 @@ if st.session_state["vista"] == "reserva":
     if booking["step"] == "client_details":
         st.markdown('<div class="step-title">4) Tus datos</div>', unsafe_allow_html=True)
         st.caption(f"{booking['fecha']} — {booking['slot_dt'].strftime('%H:%M') if booking['slot_dt'] else ''} — {booking['service_tipo']} / {humanize_list(booking['service_zonas'] or [])}")
-        turnos_df = load_df("turnos")
-        clientes_df = load_df("clientes")
 
         with st.form("client_form"):
             c1, c2 = st.columns(2)
@@ -539,43 +374,20 @@ if st.session_state["vista"] == "reserva":
             if not nombre.strip() or not whatsapp.strip() or not booking["slot_dt"]:
                 st.warning("Completá nombre, WhatsApp y elegí un horario.")
             else:
-                # Alta/actualización cliente (usa WhatsApp como ID)
-                if clientes_df.empty or not (clientes_df["Cliente_ID"].astype(str) == whatsapp.strip()).any():
-                    clientes_df = pd.concat([clientes_df, pd.DataFrame([{
-                        "Cliente_ID": whatsapp.strip(),
-                        "Nombre": nombre.strip(),
-                        "WhatsApp": whatsapp.strip(),
-                        "Email": email.strip(),
-                        "Notas": ""
-                    }])], ignore_index=True)
-                else:
-                    ix = clientes_df.index[clientes_df["Cliente_ID"] == whatsapp.strip()].tolist()[0]
-                    if nombre.strip():
-                        clientes_df.at[ix, "Nombre"] = nombre.strip()
-                    if email.strip():
-                        clientes_df.at[ix, "Email"] = email.strip()
-                save_df("clientes", clientes_df)
-
-                # Guardar turno
-                inicio_str = booking["slot_dt"].strftime("%H:%M")
-                fin_str = (booking["slot_dt"] + timedelta(minutes=booking["duracion"])).strftime("%H:%M")
-                turno_id = str(uuid.uuid4())[:8]
-                zonas_str = humanize_list(booking["service_zonas"] or [])
-                new_row = pd.DataFrame([{
-                    "Turno_ID": turno_id,
-                    "Cliente_ID": whatsapp.strip(),
-                    "Fecha": booking["fecha"].strftime("%Y-%m-%d"),
-                    "Inicio": inicio_str,
-                    "Fin": fin_str,
-                    "Tipo": booking["service_tipo"],
-                    "Zonas": zonas_str,
-                    "Duracion_total": str(booking["duracion"]),
-                    "Estado": "Confirmado",
-                    "Notas": notas.strip(),
-                    "RecordatorioEnviado": ""
-                }])
-                turnos_df = pd.concat([turnos_df, new_row], ignore_index=True)
-                save_df("turnos", turnos_df)
+                # Guardar turno (vuelve a validar el horario bajo lock de la fecha) y alta/actualización
+                # del cliente (usa WhatsApp como ID)
+                ok, motivo = core.reservar(
+                    booking["fecha"], booking["slot_dt"].strftime("%H:%M"),
+                    booking["service_tipo"], booking["service_zonas"] or [],
+                    cliente_id=whatsapp.strip(), nombre=nombre.strip(), email=email.strip(),
+                    notas=notas.strip(), duracion=booking["duracion"],
+                )
+                if not ok:
+                    booking["slot_dt"] = None
+                    booking["step"] = "pick_time"
+                    st.session_state["booking"] = booking
+                    st.session_state["aviso_reserva"] = motivo
+                    st.rerun()
 
                 booking["nombre"] = nombre.strip()
                 booking["whatsapp"] = whatsapp.strip()
@@ -630,12 +442,13 @@ if st.session_state["vista"] == "admin":
         go_home()
     st.success("Ingreso correcto ✅")
 
-    tab_turnos, tab_servicios, tab_clientes, tab_historial = st.tabs(
-        ["📆 Turnos", "🧾 Servicios", "👤 Clientes", "📓 Historial"]
+    tab_turnos, tab_servicios, tab_clientes, tab_historial, tab_analisis, tab_rendimiento = st.tabs(
+        ["📆 Turnos", "🧾 Servicios", "👤 Clientes", "📓 Historial", "📊 Análisis", "⏱️ Rendimiento"]
     )
 
     # -------- 📆 TURNOS
     with tab_turnos:
+        rendimiento.tramo("admin/turnos")
         turnos_df = load_df("turnos")
         clientes_df = load_df("clientes")
 
@@ -643,14 +456,11 @@ if st.session_state["vista"] == "admin":
         c1, c2, c3 = st.columns([1,1,2])
         desde = c1.date_input("Desde", value=date.today())
         hasta = c2.date_input("Hasta", value=date.today() + timedelta(days=14))
-        filtro_estado = c3.multiselect("Estado", options=["Confirmado","Reprogramado","Cancelado","No-show","Realizado"], default=["Confirmado","Reprogramado"])
-
-        df_agenda = turnos_df.copy()
-        if not df_agenda.empty:
-            df_agenda["Fecha"] = pd.to_datetime(df_agenda["Fecha"]).dt.date
-            df_agenda = df_agenda[(df_agenda["Fecha"] >= desde) & (df_agenda["Fecha"] <= hasta)]
-            if filtro_estado:
-                df_agenda = df_agenda[df_agenda["Estado"].isin(filtro_estado)]
+        filtro_estado = c3.multiselect("Estado", options=core.ESTADOS, default=["Confirmado","Reprogramado"])
+
+        df_agenda = load_turnos(desde, hasta)
+        if filtro_estado and not df_agenda.empty:
+            df_agenda = df_agenda[df_agenda["Estado"].isin(filtro_estado)]
         if df_agenda.empty:
             st.info("Sin turnos en el rango / estado seleccionado.")
         else:
@@ -664,19 +474,38 @@ if st.session_state["vista"] == "admin":
         st.divider()
 
         # -------- 🛠️ EDITAR TURNOS (masivo)
-        st.markdown("### 🛠️ Editar turnos (toda la base)")
-        base_turnos = load_df("turnos")
-        if base_turnos.empty:
-            st.info("No hay turnos activos.")
+        st.markdown("### 🛠️ Editar turnos")
+        estado_options = core.ESTADOS
+        e1, e2, e3, e4 = st.columns([1,1,2,1])
+        ed_desde = e1.date_input("Desde", value=date.today() - timedelta(days=7), key="edit_desde")
+        ed_hasta = e2.date_input("Hasta", value=date.today() + timedelta(days=30), key="edit_hasta")
+        ed_estados = e3.multiselect("Estado", options=estado_options, default=estado_options, key="edit_estados")
+        por_pagina = e4.selectbox("Filas", EDIT_POR_PAGINA, key="edit_por_pagina")
+
+        # Solo se cargan los turnos de la ventana (rango + estado), no toda la base
+        ventana = load_turnos(ed_desde, ed_hasta)
+        if ed_estados and not ventana.empty:
+            ventana = ventana[ventana["Estado"].isin(ed_estados)]
+        if ventana.empty:
+            st.info("No hay turnos en la ventana seleccionada.")
         else:
-            estado_options = ["Confirmado","Reprogramado","Cancelado","No-show","Realizado"]
-            base_edit = base_turnos.copy()
+            ventana = ventana.sort_values(by=["Fecha","Inicio"], kind="stable").reset_index(drop=True)
+            paginas = max(1, -(-len(ventana) // por_pagina))
+            pg1, pg2 = st.columns([1, 3])
+            pagina = pg1.number_input("Página", min_value=1, max_value=paginas, value=1, step=1, key="edit_pagina")
+            pg2.caption(f"{len(ventana)} turnos en la ventana · página {pagina} de {paginas}")
+            base_edit = ventana.iloc[(pagina - 1) * por_pagina: pagina * por_pagina].copy()
             base_edit["Fecha"] = base_edit["Fecha"].astype(str)
-            edit_turnos = st.data_editor(
-                base_edit[["Turno_ID","Cliente_ID","Fecha","Inicio","Fin","Tipo","Zonas","Duracion_total","Estado","Notas"]],
+            base_edit = base_edit.reindex(columns=COLS_EDIT_TURNOS).fillna("")
+            # La clave cambia con la ventana: las ediciones pendientes no se mezclan entre páginas
+            clave_ventana = f"{ed_desde}_{ed_hasta}_{'-'.join(ed_estados)}_{por_pagina}_{pagina}"
+            st.data_editor(
+                base_edit,
                 num_rows="dynamic",
                 use_container_width=True,
-                key="edit_turnos_all",
+                hide_index=True,
+                key=f"edit_turnos_{clave_ventana}",
+                disabled=["RecordatorioEnviado"],
                 column_config={
                     "Estado": st.column_config.SelectboxColumn(options=estado_options),
                     "Fecha": st.column_config.TextColumn(help="YYYY-MM-DD"),
@@ -686,28 +515,63 @@ if st.session_state["vista"] == "admin":
                 }
             )
             if st.button("💾 Guardar cambios de turnos"):
-                out = edit_turnos.copy()
-                out["Fecha"] = pd.to_datetime(out["Fecha"], errors="coerce").dt.date.astype(str)
-                save_df("turnos", out)
-                st.success("Cambios guardados.")
-                st.rerun()
+                res = aplicar_cambios_editor(
+                    "turnos", base_edit, st.session_state[f"edit_turnos_{clave_ventana}"],
+                    lambda: load_turnos(ed_desde, ed_hasta).assign(Fecha=lambda d: d["Fecha"].astype(str)),
+                )
+                res["auditoria"] = core.auditar_agenda()
+                guardado_editor("turnos", f"edit_turnos_{clave_ventana}", res)
+        mostrar_resultado_guardado("turnos")
+
+        # ---- 🗓️ Ocupación del mes
+        with st.expander("🗓️ Ocupación del mes"):
+            o1, o2, o3 = st.columns([1, 1, 1])
+            mes_ref = o1.date_input("Mes", value=date.today(), key="ocupacion_mes")
+            dur_ref = o2.number_input("Duración (min)", min_value=SLOT_STEP_MIN, value=60, step=SLOT_STEP_MIN, key="ocupacion_dur")
+            detalle = o3.radio("Mostrar", ["slots", "libres"], horizontal=True, key="ocupacion_detalle",
+                               format_func=lambda v: "Horarios" if v == "slots" else "Minutos libres")
+            calendario_mes(core.mapa_mes(mes_ref.year, mes_ref.month, int(dur_ref)), detalle)
+
+        # ---- 💬 Recordatorios del día siguiente
+        with st.expander("💬 Recordatorios"):
+            r1, r2 = st.columns([1, 2])
+            fecha_rec = r1.date_input("Turnos del", value=date.today() + timedelta(days=1), key="recordatorios_fecha")
+            a_enviar = recordatorios.pendientes(fecha_rec)
+            r2.caption(f"{len(a_enviar)} recordatorios pendientes · bandeja: {recordatorios.get_enviador().nombre}")
+            if not a_enviar.empty:
+                st.dataframe(a_enviar[["Inicio", "Nombre", "Canal", "Destino", "Mensaje"]], use_container_width=True, hide_index=True)
+                if st.button("💬 Enviar recordatorios"):
+                    res = recordatorios.enviar_recordatorios(fecha_rec)
+                    st.success(f"{res['enviados']} recordatorios enviados ✅")
+                    if res["sin_contacto"]:
+                        st.warning(f"{res['sin_contacto']} turnos sin WhatsApp ni email.")
+
+        # ---- 🔍 Auditoría: superposiciones, buffer y Fin inconsistente en toda la agenda
+        with st.expander("🔍 Auditoría de agenda"):
+            st.caption("Turnos activos que se pisan o quedan a menos del buffer del día (Horarios de atención) del anterior, "
+                       "y turnos cuyo Fin no coincide con Inicio + duración. Se corre sola después de guardar cambios.")
+            if st.button("🔍 Auditar agenda"):
+                mostrar_auditoria(core.auditar_agenda())
 
         st.divider()
 
-        # ---- ✅ Finalizar turno y archivar en carpeta del cliente
+        # ---- ✅ Finalizar turno y archivar en la historia del cliente
         st.markdown("### ✅ Finalizar turno y archivar")
 
         pendientes = turnos_df[~turnos_df["Estado"].isin(["Realizado", "Cancelado"])]
         if pendientes.empty:
             st.info("No hay turnos pendientes para finalizar.")
         else:
+            idx_turnos = indice_turnos()
+            idx_clientes = indice_clientes()
+
             # Etiqueta que incluye NOMBRE (– email), fecha y detalle
             def fmt_turno(tid: str) -> str:
-                row = pendientes[pendientes["Turno_ID"] == tid].iloc[0]
-                etiqueta_cliente = str(row["Cliente_ID"])
-                if not clientes_df.empty and (clientes_df["Cliente_ID"] == row["Cliente_ID"]).any():
-                    cli_row = clientes_df[clientes_df["Cliente_ID"] == row["Cliente_ID"]].iloc[0]
-                    etiqueta_cliente = get_cliente_display_row(cli_row)
+                row = idx_turnos.get(tid)
+                if row is None:
+                    return tid
+                cli = idx_clientes.get(str(row["Cliente_ID"]))
+                etiqueta_cliente = cli["_label"] if cli else str(row["Cliente_ID"])
                 return f"{etiqueta_cliente} | {row['Fecha']} {row['Inicio']} | {row['Tipo']} - {row['Zonas']}"
 
             sel_turno_id = st.selectbox(
@@ -729,12 +593,9 @@ if st.session_state["vista"] == "admin":
                     st.warning("No hay clientes cargados. Marcá 'Cliente nuevo'.")
                     nuevo_nombre = nuevo_whats = nuevo_email = ""
                 else:
-                    cliente_ids = clientes_df["Cliente_ID"].astype(str).tolist()
-                    def fmt_cliente(cid: str) -> str:
-                        row = clientes_df[clientes_df["Cliente_ID"] == cid].iloc[0]
-                        return get_cliente_display_row(row)
-                    sel_cliente_id = st.selectbox("Cliente existente", cliente_ids, format_func=fmt_cliente)
-                    row_sel = clientes_df[clientes_df["Cliente_ID"] == sel_cliente_id].iloc[0]
+                    cliente_ids = list(idx_clientes)
+                    sel_cliente_id = st.selectbox("Cliente existente", cliente_ids, format_func=lambda cid: idx_clientes[cid]["_label"])
+                    row_sel = idx_clientes[sel_cliente_id]
                     nuevo_nombre = str(row_sel.get("Nombre", "") or "")
                     nuevo_whats  = str(row_sel.get("Cliente_ID", "") or "")
                     nuevo_email  = str(row_sel.get("Email", "") or "")
@@ -745,101 +606,169 @@ if st.session_state["vista"] == "admin":
                 if is_new and (not nuevo_nombre.strip() or not nuevo_whats.strip()):
                     st.error("Completá nombre y WhatsApp para crear cliente nuevo.")
                 else:
-                    # 1) Alta cliente si corresponde
-                    clientes = load_df("clientes")
-                    if is_new:
-                        if (clientes["Cliente_ID"] == nuevo_whats.strip()).any():
-                            st.warning("Ese Cliente_ID (WhatsApp) ya existe, se usará el existente.")
-                        else:
-                            clientes = pd.concat([clientes, pd.DataFrame([{
-                                "Cliente_ID": nuevo_whats.strip(),
-                                "Nombre": nuevo_nombre.strip(),
-                                "WhatsApp": nuevo_whats.strip(),
-                                "Email": nuevo_email.strip(),
-                                "Notas": ""
-                            }])], ignore_index=True)
-                            save_df("clientes", clientes)
-
-                    # 2) Marcar turno como Realizado
-                    turnos = load_df("turnos")
-                    ix = turnos.index[turnos["Turno_ID"] == sel_turno_id].tolist()
-                    if not ix:
+                    if is_new and nuevo_whats.strip() in indice_clientes():
+                        st.warning("Ese Cliente_ID (WhatsApp) ya existe, se usará el existente.")
+                    # Alta del cliente si corresponde, turno Realizado y archivo en su historia
+                    registro = core.finalizar(
+                        sel_turno_id, cliente_id=nuevo_whats.strip(), nombre=nuevo_nombre.strip(),
+                        email=nuevo_email.strip(), notas=notas_adic.strip(),
+                    )
+                    if registro is None:
                         st.error("No se encontró el turno.")
                     else:
-                        irow = ix[0]
-                        turnos.at[irow, "Cliente_ID"] = nuevo_whats.strip() or turnos.at[irow, "Cliente_ID"]
-                        turnos.at[irow, "Estado"] = "Realizado"
-                        if notas_adic.strip():
-                            prev = str(turnos.at[irow, "Notas"] or "")
-                            turnos.at[irow, "Notas"] = (prev + " | " if prev else "") + notas_adic.strip()
-                        save_df("turnos", turnos)
-
-                        # 3) Escribir historia
-                        row_turno = turnos.loc[irow]
-                        nombre_para_guardar = (nuevo_nombre.strip() or
-                                               (clientes[clientes["Cliente_ID"] == row_turno["Cliente_ID"]].iloc[0]["Nombre"]
-                                                if not clientes.empty and (clientes["Cliente_ID"] == row_turno["Cliente_ID"]).any()
-                                                else ""))
-
-                        write_historia_cliente(
-                            cliente_id=str(row_turno["Cliente_ID"]),
-                            nombre=nombre_para_guardar,
-                            turno_row=row_turno
-                        )
-
-                        st.success("Turno finalizado y archivado en carpeta del cliente ✅")
-                        st.info(f"Carpeta: data/historias/{row_turno['Cliente_ID']}_{slugify(nombre_para_guardar)}")
+                        st.success("Turno finalizado y archivado en la historia del cliente ✅")
                         st.rerun()
 
+        st.divider()
+
+        # ---- 🗄️ Archivo de turnos cerrados (fuera de la tabla viva)
+        with st.expander("🗄️ Archivar turnos cerrados"):
+            st.caption("Mueve turnos Realizados / Cancelados / No-show anteriores a la fecha elegida a un archivo comprimido (Parquet).")
+            a1, a2 = st.columns([1, 2])
+            archivar_antes = a1.date_input("Anteriores a", value=date.today() - timedelta(days=archivo.DIAS_ARCHIVO_DEFAULT), key="archivar_antes")
+            if a1.button("🗄️ Archivar ahora"):
+                n = archivo.archivar_turnos(core.get_storage(), core.DATA_DIR, archivar_antes)
+                st.success(f"{n} turnos archivados.")
+            resumen = archivo.resumen_archivo(core.DATA_DIR)
+            a2.write(", ".join(f"{anio}: {filas} turnos" for anio, filas in resumen.items()) if resumen else "El archivo está vacío.")
+
+        # ---- 📥 Importación masiva desde CSV / XLSX
+        with st.expander("📥 Importar turnos o clientes"):
+            st.caption("CSV (coma o punto y coma) o XLSX. Turnos: Fecha, Inicio, Tipo, Zonas y Cliente_ID o WhatsApp "
+                       "(opcionales: Nombre, Email, Estado, Notas, Turno_ID). Duración y Fin se calculan del catálogo.")
+            i1, i2 = st.columns([1, 3])
+            imp_tabla = i1.radio("Tabla", ["turnos", "clientes"], key="imp_tabla")
+            subido = i2.file_uploader("Archivo", type=["csv", "xlsx"], key="imp_archivo")
+            if subido is not None:
+                def _importar(aplicar: bool) -> dict | None:
+                    try:
+                        return importacion.importar(imp_tabla, importacion.leer_tabla(io.BytesIO(subido.getvalue()), subido.name), aplicar)
+                    except ValueError as e:
+                        st.error(str(e))
+                        return None
+
+                b1, b2 = st.columns(2)
+                if b1.button("🔎 Revisar (sin guardar)"):
+                    st.session_state["imp_resultado"] = (subido.file_id, imp_tabla, _importar(False))
+                previo = st.session_state.get("imp_resultado")
+                if previo and previo[:2] == (subido.file_id, imp_tabla) and previo[2] and previo[2]["validas"]:
+                    if b2.button(f"📥 Importar {previo[2]['validas']} filas válidas", type="primary"):
+                        st.session_state["imp_resultado"] = (subido.file_id, imp_tabla, _importar(True))
+                previo = st.session_state.get("imp_resultado")
+                if previo and previo[:2] == (subido.file_id, imp_tabla) and previo[2]:
+                    res = previo[2]
+                    if res["aplicado"]:
+                        st.success(f"Importadas {res['validas']} filas ✅")
+                    m1, m2, m3, m4 = st.columns(4)
+                    m1.metric("Válidas", res["validas"])
+                    m2.metric("Con error", res["errores"])
+                    m3.metric("Clientes nuevos", res["clientes_nuevos"])
+                    m4.metric("Clientes actualizados", res["clientes_actualizados"])
+                    informe = res["informe"]
+                    con_motivo = informe[informe["Motivo"] != ""]
+                    if not con_motivo.empty:
+                        st.dataframe(con_motivo.head(500), use_container_width=True, hide_index=True)
+                    st.download_button("⬇️ Descargar informe", informe.to_csv(index=False).encode("utf-8"),
+                                       file_name=f"informe_importacion_{imp_tabla}.csv", mime="text/csv")
+
     # -------- 🧾 SERVICIOS
     with tab_servicios:
+        rendimiento.tramo("admin/servicios")
         servicios_df = load_df("servicios")
         st.markdown("#### Duraciones y costos")
-        st.caption("Podés editar los valores directamente y guardar.")
-        edit_serv_tab = st.data_editor(
-            servicios_df[["Tipo","Zona","Duracion_min","Precio"]],
+        st.caption("Podés editar los valores directamente y guardar. Recursos: qué necesita cada servicio, "
+                   "separado por coma (un Recurso_ID o una Clase, p. ej. 'Operadora, laser'); "
+                   f"vacío = una de clase '{core.CLASE_DEFECTO}'.")
+        base_serv = servicios_df[["Tipo","Zona","Duracion_min","Precio","Recursos"]]
+        st.data_editor(
+            base_serv,
             num_rows="dynamic",
             use_container_width=True,
             key="edit_servicios_tab"
         )
         if st.button("💾 Guardar (servicios)", key="save_serv_tab"):
-            for c in ["Duracion_min", "Precio"]:
-                edit_serv_tab[c] = pd.to_numeric(edit_serv_tab[c], errors="coerce").fillna(0).astype(int)
-            save_df("servicios", edit_serv_tab)
-            st.success("Servicios guardados.")
+            res = aplicar_cambios_editor("servicios", base_serv, st.session_state["edit_servicios_tab"],
+                                         lambda: load_df("servicios"))
+            guardado_editor("servicios", "edit_servicios_tab", res)
+        mostrar_resultado_guardado("servicios")
+        rec = core.recursos()
+        if rec.multi:
+            for (tipo, zona), pedidos in catalogo().recursos.items():
+                malos = rec.desconocidos(pedidos)
+                if malos:
+                    st.warning(f"{tipo} / {zona}: {', '.join(malos)} no coincide con ningún recurso activo; "
+                               "ese servicio queda sin horarios hasta corregirlo.")
+            if rec.desconocidos([core.CLASE_DEFECTO]):
+                st.warning(f"No hay recursos de clase '{core.CLASE_DEFECTO}': los servicios sin Recursos "
+                           "se pueden asignar a cualquier recurso.")
+
+        st.markdown("#### Horarios de atención")
+        st.caption("Tipo 'Semanal': Dias (1=Lun … 7=Dom, p. ej. '1-5' o '1,3') y Tramos ('09:00-13:00 14:00-18:00'); "
+                   "con Desde/Hasta rige solo en esas fechas (p. ej. horario de verano). 'Especial': Tramos que "
+                   "reemplazan los de Desde…Hasta. 'Cerrado': feriados y vacaciones de Desde a Hasta. "
+                   f"Buffer_min y Paso_min (opcionales) cambian el buffer ({core.BUFFER_MIN_DEFAULT} min) y el paso de "
+                   f"la grilla de reserva ({SLOT_STEP_MIN} min) en los días de la regla.")
+        horarios_df = load_df("horarios")
+        st.data_editor(horarios_df, num_rows="dynamic", use_container_width=True, key="edit_horarios")
+        if st.button("💾 Guardar horarios"):
+            res = aplicar_cambios_editor("horarios", horarios_df, st.session_state["edit_horarios"],
+                                         lambda: load_df("horarios"))
+            guardado_editor("horarios", "edit_horarios", res)
+        mostrar_resultado_guardado("horarios")
+        hor = core.horarios()
+        for rid, error in hor.errores.items():
+            st.warning(f"Regla {rid}: {error}. Se ignora hasta corregirla.")
+        with st.expander("📅 Cómo quedan los próximos días"):
+            st.dataframe(hor.rango(date.today(), date.today() + timedelta(days=13)), hide_index=True,
+                         use_container_width=True)
+
+        st.markdown("#### Recursos (operadoras, cabinas, equipos)")
+        st.caption("Sin recursos la agenda es un solo sillón. Disponibilidad: días 1=Lun … 7=Dom y tramos, "
+                   "p. ej. '1-4 09:00-17:00; 5 09:00-13:00' (vacía = horarios de atención). Activo: 'No' lo saca de la agenda. "
+                   "Cada turno guarda en Recursos los que se le asignaron.")
+        recursos_df = load_df("recursos")
+        st.data_editor(recursos_df, num_rows="dynamic", use_container_width=True, key="edit_recursos")
+        if st.button("💾 Guardar recursos"):
+            res = aplicar_cambios_editor("recursos", recursos_df, st.session_state["edit_recursos"],
+                                         lambda: load_df("recursos"))
+            guardado_editor("recursos", "edit_recursos", res)
+        mostrar_resultado_guardado("recursos")
+        for rid, error in core.recursos().errores.items():
+            st.warning(f"{rid}: {error}. Ese recurso queda sin horarios hasta corregirlo.")
 
     # -------- 👤 CLIENTES
     with tab_clientes:
+        rendimiento.tramo("admin/clientes")
         clientes_df = load_df("clientes")
         st.markdown("#### Base de clientes")
         st.caption("Campos: Cliente_ID (WhatsApp), Nombre, WhatsApp, Email, Notas")
-        edit_cli = st.data_editor(
+        st.data_editor(
             clientes_df,
             num_rows="dynamic",
             use_container_width=True,
             key="edit_clientes"
         )
         if st.button("💾 Guardar clientes"):
-            save_df("clientes", edit_cli)
-            st.success("Clientes guardados.")
+            res = aplicar_cambios_editor("clientes", clientes_df, st.session_state["edit_clientes"],
+                                         lambda: load_df("clientes"))
+            guardado_editor("clientes", "edit_clientes", res)
+        mostrar_resultado_guardado("clientes")
 
     # -------- 📓 HISTORIAL (selector por cliente + global)
     with tab_historial:
+        rendimiento.tramo("admin/historial")
         st.markdown("#### Historial por cliente")
 
         clientes_df = load_df("clientes")
         if clientes_df.empty:
             st.info("Aún no hay clientes cargados.")
         else:
-            def fmt_cliente(cid: str) -> str:
-                row = clientes_df[clientes_df["Cliente_ID"] == cid].iloc[0]
-                return get_cliente_display_row(row)
-
-            cliente_ids = clientes_df["Cliente_ID"].astype(str).tolist()
-            sel_cliente_id = st.selectbox("Elegí un cliente", cliente_ids, format_func=fmt_cliente)
+            idx_clientes = indice_clientes()
+            cliente_ids = list(idx_clientes)
+            sel_cliente_id = st.selectbox("Elegí un cliente", cliente_ids, format_func=lambda cid: idx_clientes[cid]["_label"])
 
             # Ficha del cliente
-            row_cli = clientes_df[clientes_df["Cliente_ID"] == sel_cliente_id].iloc[0]
+            row_cli = idx_clientes[sel_cliente_id]
             c1, c2, c3 = st.columns(3)
             c1.metric("Nombre", str(row_cli.get("Nombre", "") or "-"))
             c2.metric("WhatsApp", str(row_cli.get("WhatsApp", "") or "-"))
@@ -847,24 +776,35 @@ if st.session_state["vista"] == "admin":
 
             st.divider()
 
-            # Intentar cargar historial del folder del cliente
-            hist_csv_path, carpeta_path = find_cliente_hist_path(sel_cliente_id)
-
-            if hist_csv_path is not None:
-                st.markdown("##### Historial del cliente (carpeta dedicada)")
-                df_cli_hist = pd.read_csv(hist_csv_path, dtype=str).fillna("")
-                if "Fecha" in df_cli_hist.columns:
-                    _tmp = pd.to_datetime(df_cli_hist["Fecha"], errors="coerce")
-                    df_cli_hist = df_cli_hist.assign(_ord=_tmp).sort_values("_ord", ascending=False).drop(columns=["_ord"])
-                st.dataframe(df_cli_hist, use_container_width=True)
-                st.download_button(
+            # Historia del cliente (registros empaquetados, leídos por el índice de offsets)
+            df_cli_hist = historia_cliente(sel_cliente_id)
+
+            if not df_cli_hist.empty:
+                st.markdown("##### Historia del cliente")
+                df_cli_hist = df_cli_hist.iloc[::-1].reset_index(drop=True)  # la más nueva primero
+                st.dataframe(df_cli_hist.drop(columns=["Cliente_ID"]), use_container_width=True)
+                h1, h2 = st.columns(2)
+                h1.download_button(
                     "⬇️ Descargar historial CSV",
                     data=df_cli_hist.to_csv(index=False).encode("utf-8"),
                     file_name=f"historial_{sel_cliente_id}.csv",
                     mime="text/csv",
                     use_container_width=True
                 )
-                st.caption(f"Carpeta: {carpeta_path.as_posix()}")
+                # Vista TXT de un turno, armada a pedido desde su registro
+                pos_txt = h2.selectbox(
+                    "Ficha TXT de", range(len(df_cli_hist)),
+                    format_func=lambda i: f"{df_cli_hist.at[i, 'Fecha']} · {df_cli_hist.at[i, 'Tipo']} ({df_cli_hist.at[i, 'Turno_ID']})",
+                    key=f"ficha_txt_{sel_cliente_id}",
+                )
+                registro_txt = df_cli_hist.iloc[pos_txt].to_dict()
+                h2.download_button(
+                    "⬇️ Descargar TXT",
+                    data=historias.texto(registro_txt).encode("utf-8"),
+                    file_name=historias.nombre_txt(registro_txt),
+                    mime="text/plain",
+                    use_container_width=True
+                )
             else:
                 st.markdown("##### Historial del cliente (desde historial global)")
                 hist_global = load_df("historial")
@@ -874,8 +814,7 @@ if st.session_state["vista"] == "admin":
                 else:
                     if "Fecha" in df_filt.columns:
                         _tmp = pd.to_datetime(df_filt["Fecha"], errors="coerce")
-                        df_filt = df_filt.assign(_ord=_tmp).sort_values("_ord", descending=False).drop(columns=["_ord"])
-                        df_filt = df_filt.sort_values("_ord", ascending=False).drop(columns=["_ord"])
+                        df_filt = df_filt.assign(_ord=_tmp).sort_values("_ord", ascending=False).drop(columns=["_ord"])
                     st.dataframe(df_filt, use_container_width=True)
                     st.download_button(
                         "⬇️ Descargar historial (global filtrado) CSV",
@@ -885,13 +824,125 @@ if st.session_state["vista"] == "admin":
                         use_container_width=True
                     )
 
+            # Turnos archivados: se consultan solo si se piden
+            if st.checkbox("Ver turnos archivados", key=f"ver_archivo_{sel_cliente_id}"):
+                df_arch = archivo.leer_archivo(core.DATA_DIR, cliente_id=sel_cliente_id)
+                if df_arch.empty:
+                    st.info("Este cliente no tiene turnos archivados.")
+                else:
+                    st.dataframe(df_arch.sort_values(["Fecha", "Inicio"], ascending=False), use_container_width=True)
+
         st.divider()
         st.markdown("#### Historial global (solo lectura)")
-        hist = load_df("historial")
-        st.dataframe(hist.sort_values(by="Fecha", ascending=False), use_container_width=True)
+        pagina = st.session_state.get("hist_pagina", 0)
+        hist, hay_mas = leer_historial(pagina)
+        st.dataframe(hist, use_container_width=True)
+        p1, p2, p3, p4 = st.columns([1, 1, 2, 1])
+        if p1.button("⬅ Más recientes", disabled=pagina == 0):
+            st.session_state["hist_pagina"] = pagina - 1
+            st.rerun()
+        if p2.button("Más antiguos ➡", disabled=not hay_mas):
+            st.session_state["hist_pagina"] = pagina + 1
+            st.rerun()
+        p3.caption(f"Página {pagina + 1} · {HIST_POR_PAGINA} por página")
+        if p4.button("🧹 Compactar"):
+            quitadas, registros = compactar_historiales()
+            st.success(f"Historial compactado ({quitadas} duplicados en el global, {registros} registros repetidos en las historias).")
+        if p4.button("🔧 Reindexar historias"):
+            carpetas, registros = reindexar_historias()
+            st.success(f"Índice de historias rehecho: {registros} registros"
+                       + (f", {carpetas} carpetas viejas empaquetadas." if carpetas else "."))
+
+    # -------- 📊 ANÁLISIS (solo lee los agregados de analitica.py, no recorre los turnos)
+    with tab_analisis:
+        rendimiento.tramo("admin/analisis")
+        st.markdown("#### Ingresos y ocupación")
+        a1, a2, a3 = st.columns([1, 1, 1])
+        a_desde = a1.date_input("Desde", value=date.today() - timedelta(days=90), key="an_desde")
+        a_hasta = a2.date_input("Hasta", value=date.today(), key="an_hasta")
+        if a3.button("🔄 Reconstruir agregados"):
+            n = core.reconstruir_analitica()
+            st.success(f"Agregados reconstruidos desde {n} turnos (incluye los archivados).")
+        if a_desde > a_hasta:
+            st.warning("La fecha 'Desde' es posterior a 'Hasta'.")
+        else:
+            tablero = core.tablero_analitica(a_desde, a_hasta)
+            dias = tablero["dias"]
+            realizados = dias[dias["Estado"] == "Realizado"]
+            no_show = int(dias.loc[dias["Estado"] == "No-show", "Turnos"].sum())
+            ocupan = dias[dias["Estado"] != "Cancelado"]
+            dia_semana = pd.to_datetime(ocupan["Fecha"]).dt.dayofweek + 1
+            ocupados = ocupan["Minutos"].groupby(dia_semana).sum().reindex(range(1, 8), fill_value=0)
+            disponibles = core.minutos_disponibles(a_desde, a_hasta)
+            n_realizados = int(realizados["Turnos"].sum())
+
+            m1, m2, m3, m4 = st.columns(4)
+            m1.metric("Ingresos realizados", f"$ {int(realizados['Ingresos'].sum()):,}".replace(",", "."))
+            m2.metric("Turnos realizados", n_realizados)
+            m3.metric("No-show", f"{no_show / max(n_realizados + no_show, 1):.0%}")
+            m4.metric("Ocupación", f"{ocupados.sum() / max(disponibles.sum(), 1):.0%}")
+
+            if realizados.empty:
+                st.info("No hay turnos realizados en el rango.")
+            else:
+                st.markdown("##### Ingresos por zona y tipo")
+                st.bar_chart(realizados.pivot_table(index="Zona", columns="Tipo", values="Ingresos",
+                                                    aggfunc="sum", fill_value=0))
+            st.markdown("##### Ocupación por día de la semana")
+            st.caption("Minutos reservados (todo menos cancelados) sobre los minutos de atención del rango.")
+            ocupacion = pd.DataFrame({
+                "Día": DIAS_SEMANA,
+                "Reservado (h)": (ocupados.to_numpy() / 60).round(1),
+                "Disponible (h)": (disponibles.to_numpy() / 60).round(1),
+            })
+            ocupacion["Ocupación"] = (ocupados.to_numpy() / disponibles.clip(lower=1).to_numpy() * 100).round(0)
+            st.dataframe(ocupacion[disponibles.to_numpy() > 0], use_container_width=True, hide_index=True)
+
+            st.markdown("##### Mejores clientes (histórico)")
+            top = (tablero["clientes"].query("Estado == 'Realizado'")
+                   .nlargest(10, "Ingresos")[["Cliente_ID", "Turnos", "Ingresos"]])
+            idx = indice_clientes()
+            top.insert(1, "Nombre", top["Cliente_ID"].map(lambda c: (idx.get(c) or {}).get("Nombre", "")))
+            st.dataframe(top.astype({"Turnos": int, "Ingresos": int}), use_container_width=True, hide_index=True)
+            if tablero["meta"]:
+                st.caption(f"Agregados reconstruidos por última vez: {tablero['meta']['reconstruido']} · "
+                           "se actualizan con cada reserva, cancelación, finalización o edición.")
+
+    # -------- ⏱️ RENDIMIENTO (tiempos por corrida)
+    with tab_rendimiento:
+        rendimiento.tramo("admin/rendimiento")
+        st.markdown("#### Rendimiento")
+        st.toggle(
+            "Medir tiempos", value=rendimiento.activo(), key="perf_toggle",
+            on_change=lambda: rendimiento.activar(st.session_state["perf_toggle"]),
+        )
+        st.caption("Mide carga/guardado de tablas, generación de horarios, escritura de historias y cada "
+                   "sección de la página. También se activa con ESTETICA_PERF=1. "
+                   f"Registro: {rendimiento.log_path().relative_to(core.DATA_DIR.parent).as_posix()}")
+        ultima = st.session_state.get("perf_ultima")
+        if not rendimiento.activo():
+            st.info("La medición está apagada.")
+        elif not ultima or not ultima["registros"]:
+            st.info("Todavía no hay mediciones: usá la app y volvé a esta pestaña.")
+        else:
+            st.markdown(f"##### Corrida anterior · vista **{ultima['vista']}** · {ultima['total_ms']:.0f} ms en total")
+            df_ult = pd.DataFrame(ultima["registros"]).sort_values("ms", ascending=False)
+            st.dataframe(df_ult, use_container_width=True, hide_index=True)
+
+        corridas = rendimiento.leer_corridas()
+        if corridas:
+            st.markdown(f"##### Acumulado de las últimas {len(corridas)} corridas")
+            regs = pd.DataFrame([r for c in corridas for r in c["registros"]])
+            resumen = (regs.groupby(["tipo", "nombre"])["ms"]
+                       .agg(llamadas="count", media_ms="mean", max_ms="max", total_ms="sum")
+                       .round(2).sort_values("total_ms", ascending=False).reset_index())
+            st.dataframe(resumen, use_container_width=True, hide_index=True)
 
 # =============================
 # Footer
 # =============================
 st.markdown("---")
 st.caption("Hecho por PiDBiM")
+
+if "perf_corrida" in st.session_state:
+    st.session_state["perf_ultima"] = rendimiento.cerrar_corrida(st.session_state.pop("perf_corrida"))
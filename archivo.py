@@ -0,0 +1,135 @@
+# ==========================================================
+# Archivo de turnos cerrados (Parquet, un archivo por año)
+# - Mueve turnos viejos en estado terminal fuera de la tabla viva
+# - Lecturas perezosas: solo abre los años pedidos y filtra en el lector
+# - Uso por consola: python archivo.py --antes 2025-06-01
+# ==========================================================
+import argparse
+import os
+from datetime import date, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+import storage
+
+ESTADOS_CERRADOS = ["Realizado", "Cancelado", "No-show"]
+DIAS_ARCHIVO_DEFAULT = 90
+
+
+def archivo_dir(data_dir: Path) -> Path:
+    return Path(data_dir) / "archivo"
+
+
+def _path_anio(data_dir: Path, anio: int) -> Path:
+    return archivo_dir(data_dir) / f"turnos_{anio}.parquet"
+
+
+def _anios(data_dir: Path) -> list[int]:
+    return sorted(int(p.stem.split("_")[1]) for p in archivo_dir(data_dir).glob("turnos_*.parquet"))
+
+
+def _tipar(df: pd.DataFrame) -> pd.DataFrame:
+    """Tipos reales para el archivo: Fecha datetime, duración entera, estados/tipos categóricos."""
+    out = df.copy()
+    out["Fecha"] = pd.to_datetime(out["Fecha"].astype(str), errors="coerce")
+    if "Duracion_total" in out.columns:
+        out["Duracion_total"] = pd.to_numeric(out["Duracion_total"], errors="coerce").astype("Int32")
+    for col in out.columns:
+        if col in ("Fecha", "Duracion_total"):
+            continue
+        if col in ("Estado", "Tipo"):
+            out[col] = out[col].astype(str).astype("category")
+        else:
+            out[col] = out[col].astype(str).astype("string")
+    return out
+
+
+def _escribir_parquet(df: pd.DataFrame, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        df.to_parquet(tmp, index=False, compression="zstd")
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def archivar_turnos(backend, data_dir: Path, antes: date, estados: list[str] | None = None) -> int:
+    """
+    Pasa al archivo los turnos con Fecha anterior a `antes` y Estado terminal, y los
+    borra de la tabla viva. Primero escribe el archivo y después borra: si algo falla
+    en el medio, volver a correrlo no duplica (se deduplica por Turno_ID).
+    """
+    estados = estados or ESTADOS_CERRADOS
+    with backend.lock("turnos"):
+        turnos = backend.read_range("turnos", "0000-01-01", (antes - timedelta(days=1)).isoformat())
+        if turnos.empty:
+            return 0
+        fechas = pd.to_datetime(turnos["Fecha"], errors="coerce")
+        mask = (fechas < pd.Timestamp(antes)) & turnos["Estado"].isin(estados)
+        cerrados = turnos[mask]
+        if cerrados.empty:
+            return 0
+        for anio, grupo in cerrados.groupby(fechas[mask].dt.year):
+            path = _path_anio(data_dir, int(anio))
+            if path.exists():
+                grupo = pd.concat([pd.read_parquet(path).astype(str), grupo], ignore_index=True)
+                grupo = grupo.drop_duplicates(subset=["Turno_ID"], keep="last")
+            _escribir_parquet(_tipar(grupo), path)
+        backend.delete("turnos", "Turno_ID", cerrados["Turno_ID"].tolist())
+        return len(cerrados)
+
+
+def leer_archivo(data_dir: Path, desde: date | None = None, hasta: date | None = None,
+                 cliente_id: str | None = None, columnas: list[str] | None = None) -> pd.DataFrame:
+    """
+    Turnos archivados, filtrados en el lector de Parquet: solo se abren los años que
+    cubren [desde, hasta] y solo se materializan las filas del cliente pedido.
+    """
+    anios = [a for a in _anios(data_dir)
+             if (desde is None or a >= desde.year) and (hasta is None or a <= hasta.year)]
+    filtros = []
+    if cliente_id is not None:
+        filtros.append(("Cliente_ID", "==", str(cliente_id)))
+    if desde is not None:
+        filtros.append(("Fecha", ">=", pd.Timestamp(desde)))
+    if hasta is not None:
+        filtros.append(("Fecha", "<=", pd.Timestamp(hasta)))
+    frames = [pd.read_parquet(_path_anio(data_dir, a), columns=columnas, filters=filtros or None) for a in anios]
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=columnas or [])
+    df = pd.concat(frames, ignore_index=True)
+    if "Fecha" in df.columns:
+        df["Fecha"] = df["Fecha"].dt.date
+    return df
+
+
+def resumen_archivo(data_dir: Path) -> dict[int, int]:
+    """Filas archivadas por año (lee solo metadatos de cada Parquet)."""
+    import pyarrow.parquet as pq
+    return {a: pq.ParquetFile(_path_anio(data_dir, a)).metadata.num_rows for a in _anios(data_dir)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archiva turnos cerrados en Parquet")
+    parser.add_argument("--data", default=str(Path(__file__).parent / "data"), help="Carpeta de datos")
+    parser.add_argument("--antes", default=None, help="Archivar turnos anteriores a esta fecha (AAAA-MM-DD)")
+    parser.add_argument("--dias", type=int, default=DIAS_ARCHIVO_DEFAULT,
+                        help="Si no se da --antes: archivar lo que tenga más de N días")
+    parser.add_argument("--estados", nargs="+", default=ESTADOS_CERRADOS, help="Estados a archivar")
+    parser.add_argument("--storage", default=os.environ.get("ESTETICA_STORAGE", "csv"), help="csv o sqlite")
+    args = parser.parse_args(argv)
+
+    antes = date.fromisoformat(args.antes) if args.antes else date.today() - timedelta(days=args.dias)
+    backend = storage.get_storage(args.storage, Path(args.data), {})
+    n = archivar_turnos(backend, Path(args.data), antes, args.estados)
+    print(f"{n} turnos archivados (anteriores a {antes.isoformat()})")
+    for anio, filas in resumen_archivo(Path(args.data)).items():
+        print(f"  {anio}: {filas} filas")
+
+
+if __name__ == "__main__":
+    main()
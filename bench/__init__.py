@@ -0,0 +1,6 @@
+# ==========================================================
+# Benchmarks de los caminos calientes de la app
+# - datos.py: genera datasets sintéticos con los esquemas reales (DEFAULT_*)
+# - __main__.py: mide load_df, save_df, slots, historias y la reserva completa (vía core.py)
+# - Uso: python -m bench --escala media --storage csv [--comparar anterior.json]
+# ==========================================================
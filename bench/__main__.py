@@ -0,0 +1,146 @@
+# ==========================================================
+# Runner de benchmarks
+#   python -m bench --escala chica|media|grande --storage csv|sqlite
+#   python -m bench --escala media --comparar bench/resultados/anterior.json
+# Genera el dataset en una carpeta temporal, mide cada caso N veces y escribe
+# un JSON con min/mediana/media por caso (segundos) para comparar entre corridas.
+# ==========================================================
+import argparse
+import json
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+RESULTADOS_DIR = Path(__file__).resolve().parent / "resultados"
+
+
+def cargar_core(data_dir: Path, backend: str):
+    """Importa el núcleo (sin Streamlit) apuntando a `data_dir` y al backend pedido."""
+    if str(BASE_DIR) not in sys.path:
+        sys.path.insert(0, str(BASE_DIR))
+    import core
+    core.configurar(data_dir, backend)
+    return core
+
+
+def medir(fn, repeticiones: int, preparar=None) -> dict:
+    tiempos = []
+    for i in range(repeticiones):
+        if preparar:
+            preparar(i)
+        t0 = time.perf_counter()
+        fn(i)
+        tiempos.append(time.perf_counter() - t0)
+    return {"n": repeticiones, "min": min(tiempos), "mediana": statistics.median(tiempos),
+            "media": statistics.fmean(tiempos)}
+
+
+def casos(core, repeticiones: int) -> dict[str, dict]:
+    hoy = date.today()
+    turnos = core.load_df("turnos")
+    cache = core._df_cache()
+
+    def frio(_):
+        cache.clear()
+
+    # Día más cargado del dataset: peor caso para el motor de slots
+    fechas = turnos["Fecha"].value_counts()
+    dia = fechas.index[0] if not fechas.empty else hoy
+    turnos_dia = core.load_turnos(dia, dia)
+    slots = core.generar_slots(dia, 60, turnos_dia)
+
+    historial = core.load_df("historial")
+    cliente_hist = tuple(historial.iloc[0][["Cliente_ID", "Nombre"]]) if not historial.empty else ("bench", "Bench")
+    turno_hist = turnos.iloc[0]
+
+    def reservar(i):
+        # Un día libre distinto por repetición (lejos del dataset) a las 09:00
+        fecha = hoy + timedelta(days=400 + 7 * i)
+        while not core.horarios().tramos(fecha):
+            fecha += timedelta(days=1)
+        ok, _ = core.reservar(fecha, "09:00", "Láser", ["Axilas"], cliente_id=cliente_hist[0],
+                              nombre="Bench", duracion=60)
+        assert ok, "la reserva de benchmark chocó con un turno existente"
+
+    return {
+        "load_df_turnos_frio": medir(lambda _: core.load_df("turnos"), repeticiones, frio),
+        "load_df_turnos_cache": medir(lambda _: core.load_df("turnos"), repeticiones),
+        "load_df_clientes_frio": medir(lambda _: core.load_df("clientes"), repeticiones, frio),
+        "load_turnos_semana": medir(lambda _: core.load_turnos(hoy, hoy + timedelta(days=6)), repeticiones, frio),
+        "save_df_turnos": medir(lambda _: core.save_df("turnos", turnos), repeticiones),
+        "generar_slots_dia_cargado": medir(lambda _: core.generar_slots(dia, 60, turnos_dia), repeticiones),
+        "generar_slots_grilla": medir(lambda i: core.generar_slots(dia, 30 + 5 * i), repeticiones),
+        "filter_future_slots": medir(lambda _: core.filter_future_slots(hoy, slots), repeticiones),
+        "historia_cliente": medir(lambda _: core.historia_cliente(cliente_hist[0]), repeticiones),
+        "write_historia_cliente": medir(
+            lambda _: core.write_historia_cliente(cliente_hist[0], cliente_hist[1], turno_hist), repeticiones),
+        "reservar": medir(reservar, repeticiones),
+    }
+
+
+def comparar(actual: dict, previo: dict):
+    print(f"\n{'caso':30} {'antes':>10} {'ahora':>10} {'ratio':>7}")
+    for caso, r in actual["casos"].items():
+        p = previo.get("casos", {}).get(caso)
+        if p is None:
+            print(f"{caso:30} {'-':>10} {r['mediana']:10.4f} {'':>7}")
+            continue
+        ratio = r["mediana"] / p["mediana"] if p["mediana"] else float("inf")
+        print(f"{caso:30} {p['mediana']:10.4f} {r['mediana']:10.4f} {ratio:6.2f}x")
+
+
+def main(argv=None):
+    from bench import datos
+
+    parser = argparse.ArgumentParser(description="Benchmarks de la app de turnos")
+    parser.add_argument("--escala", choices=list(datos.ESCALAS), default="chica")
+    parser.add_argument("--storage", choices=["csv", "sqlite"], default="csv")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--salida", default=None, help="JSON de resultados (por defecto bench/resultados/...)")
+    parser.add_argument("--comparar", default=None, help="JSON de una corrida anterior")
+    parser.add_argument("--conservar", action="store_true", help="No borrar la carpeta de datos generada")
+    args = parser.parse_args(argv)
+
+    data_dir = Path(tempfile.mkdtemp(prefix=f"estetica-bench-{args.escala}-"))
+    try:
+        core = cargar_core(data_dir, args.storage)
+        t0 = time.perf_counter()
+        filas = datos.generar(args.escala, args.semilla)
+        print(f"Datos generados en {time.perf_counter() - t0:.1f}s: {filas}")
+        resultado = {
+            "escala": args.escala,
+            "storage": args.storage,
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": core.pd.__version__,
+            "filas": filas,
+            "casos": casos(core, args.repeticiones),
+        }
+    finally:
+        if args.conservar:
+            print(f"Datos conservados en {data_dir}")
+        else:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    for caso, r in resultado["casos"].items():
+        print(f"{caso:30} mediana {r['mediana'] * 1000:10.2f} ms   min {r['min'] * 1000:10.2f} ms")
+
+    salida = Path(args.salida) if args.salida else (
+        RESULTADOS_DIR / f"{args.escala}-{args.storage}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    salida.parent.mkdir(parents=True, exist_ok=True)
+    salida.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"Resultados: {salida}")
+
+    if args.comparar:
+        comparar(resultado, json.loads(Path(args.comparar).read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# ==========================================================
+# Datos sintéticos para benchmarks
+# - Mismos esquemas que core.py (DEFAULT_TURNOS, DEFAULT_CLIENTES, DEFAULT_SERVICIOS)
+# - Turnos dentro de la disponibilidad semanal, con zonas y duraciones del catálogo
+# - Historias profundas empaquetadas (un registro JSONL por evento) con su índice de offsets
+# ==========================================================
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+import core
+import historias
+
+ESCALAS = {
+    "chica":  {"turnos": 1_000,   "clientes": 100,    "historias": 50,    "eventos": 20},
+    "media":  {"turnos": 50_000,  "clientes": 10_000, "historias": 500,   "eventos": 40},
+    "grande": {"turnos": 500_000, "clientes": 10_000, "historias": 2_000, "eventos": 60},
+}
+
+DIAS_PASADO = 730
+DIAS_FUTURO = 60
+
+NOMBRES = ["Ana", "Bea", "Carla", "Dolores", "Eva", "Flor", "Gime", "Inés", "Juli", "Lara",
+           "Mica", "Noe", "Paula", "Romina", "Sofi", "Vale", "Santi", "Quique", "Tomás", "Lucas"]
+APELLIDOS = ["Bazzani", "Gómez", "Pérez", "Rodríguez", "Fernández", "López", "Díaz", "Martínez",
+             "Sosa", "Romero", "Álvarez", "Torres", "Ruiz", "Ramírez", "Acosta", "Medina"]
+
+
+def generar_clientes(n: int, rng: np.random.Generator) -> pd.DataFrame:
+    ids = 3510000000 + rng.choice(9_999_999, size=n, replace=False)
+    nombres = (pd.Series(rng.choice(NOMBRES, n)) + " " + pd.Series(rng.choice(APELLIDOS, n))).tolist()
+    con_email = rng.random(n) < 0.6
+    df = pd.DataFrame({
+        "Cliente_ID": ids.astype(str),
+        "Nombre": nombres,
+        "WhatsApp": ids.astype(str),
+        "Email": [f"{core.slugify(nom)}{i}@mail.com" if e else "" for i, (nom, e) in enumerate(zip(nombres, con_email))],
+        "Notas": "",
+    })
+    return df.reindex(columns=core.DEFAULT_CLIENTES.columns).fillna("")
+
+
+def _combos(rng: np.random.Generator, n: int = 300) -> list[tuple[str, str, int]]:
+    """Combinaciones (Tipo, Zonas, duración) tomadas del catálogo real."""
+    cat = core.Catalogo(core._normalizar("servicios", core.DEFAULT_SERVICIOS.copy()))
+    combos = []
+    for _ in range(n):
+        tipo = cat.tipos[rng.integers(len(cat.tipos))]
+        zonas = list(rng.choice(cat.zonas[tipo], size=int(rng.integers(1, 4)), replace=False))
+        combos.append((tipo, ", ".join(zonas), cat.cotizar(tipo, zonas)[0]))
+    return combos
+
+
+def _minutos(hhmm: str) -> int:
+    hh, mm = hhmm.split(":")
+    return int(hh) * 60 + int(mm)
+
+
+def generar_turnos(n: int, clientes: pd.DataFrame, rng: np.random.Generator, hoy: date) -> pd.DataFrame:
+    # Días con disponibilidad en la ventana [hoy - DIAS_PASADO, hoy + DIAS_FUTURO]
+    dias = [hoy + timedelta(days=d) for d in range(-DIAS_PASADO, DIAS_FUTURO + 1)]
+    dias = [d for d in dias if core.DEFAULT_DISPONIBILIDAD_CODE.get(d.isoweekday())]
+    fechas = np.array(dias, dtype=object)[rng.integers(len(dias), size=n)]
+
+    combos = _combos(rng)
+    elegido = rng.integers(len(combos), size=n)
+    tipos = np.array([c[0] for c in combos], dtype=object)[elegido]
+    zonas = np.array([c[1] for c in combos], dtype=object)[elegido]
+    durs = np.array([c[2] for c in combos])[elegido]
+
+    # Inicio: múltiplo del paso dentro de la primera franja del día
+    franjas = {d: core.DEFAULT_DISPONIBILIDAD_CODE[d][0] for d in core.DEFAULT_DISPONIBILIDAD_CODE}
+    ini_franja = np.array([_minutos(franjas[f.isoweekday()][0]) for f in fechas])
+    fin_franja = np.array([_minutos(franjas[f.isoweekday()][1]) for f in fechas])
+    pasos = np.maximum((fin_franja - ini_franja - durs) // core.SLOT_STEP_MIN, 1)
+    inicio = ini_franja + (rng.random(n) * pasos).astype(int) * core.SLOT_STEP_MIN
+    fin = inicio + durs
+
+    pasado = fechas < hoy
+    estados = np.where(
+        pasado,
+        rng.choice(["Realizado", "Cancelado", "No-show", "Confirmado"], n, p=[0.8, 0.1, 0.05, 0.05]),
+        rng.choice(["Confirmado", "Reprogramado"], n, p=[0.9, 0.1]),
+    )
+    df = pd.DataFrame({
+        "Turno_ID": [f"{i:08x}" for i in rng.choice(16 ** 7, size=n, replace=False)],
+        "Cliente_ID": clientes["Cliente_ID"].to_numpy()[rng.integers(len(clientes), size=n)],
+        "Fecha": [f.isoformat() for f in fechas],
+        "Inicio": [f"{m // 60:02d}:{m % 60:02d}" for m in inicio],
+        "Fin": [f"{m // 60:02d}:{m % 60:02d}" for m in fin],
+        "Tipo": tipos,
+        "Zonas": zonas,
+        "Duracion_total": durs.astype(str),
+        "Estado": estados,
+        "Notas": "",
+        "RecordatorioEnviado": "",
+    })
+    return df.reindex(columns=core.DEFAULT_TURNOS.columns).fillna("")
+
+
+def generar_historias(clientes: pd.DataFrame, turnos: pd.DataFrame, n_clientes: int, eventos: int,
+                      rng: np.random.Generator) -> pd.DataFrame:
+    """
+    Historias de los primeros `n_clientes` clientes, `eventos` registros cada una, agregadas
+    juntas a los archivos de historias (historias.agregar). Devuelve las filas del historial global.
+    """
+    globales = []
+    registros = []
+    muestra = turnos.iloc[rng.integers(len(turnos), size=n_clientes * eventos)]
+    for i, cli in enumerate(clientes.head(n_clientes).itertuples(index=False)):
+        propios = muestra.iloc[i * eventos:(i + 1) * eventos]
+        filas = pd.DataFrame({
+            "Fecha": propios["Fecha"].to_numpy() + " " + propios["Fin"].to_numpy(),
+            "Evento": "Turno finalizado",
+            "Turno_ID": propios["Turno_ID"].to_numpy(),
+            "Cliente_ID": cli.Cliente_ID,
+            "Nombre": cli.Nombre,
+            "Turno_Fecha": propios["Fecha"].to_numpy(),
+            "Inicio": propios["Inicio"].to_numpy(),
+            "Fin": propios["Fin"].to_numpy(),
+            "Tipo": propios["Tipo"].to_numpy(),
+            "Zonas": propios["Zonas"].to_numpy(),
+            "Duracion_min": propios["Duracion_total"].to_numpy(),
+            "Estado": "Realizado",
+            "Notas": "",
+        }).sort_values("Fecha")
+        registros.extend(filas.to_dict("records"))
+        globales.append(pd.DataFrame({
+            "Cliente_ID": cli.Cliente_ID,
+            "Nombre": cli.Nombre,
+            "Fecha": filas["Fecha"].to_numpy(),
+            "Evento": "Turno finalizado",
+            "Detalles": filas["Tipo"].to_numpy() + " | " + filas["Zonas"].to_numpy(),
+        }))
+    historias.agregar(core.HISTORIAS_DIR, registros)
+    if not globales:
+        return core.DEFAULT_HISTORIAL_GLOBAL.copy()
+    return pd.concat(globales, ignore_index=True).sort_values("Fecha", kind="stable").reset_index(drop=True)
+
+
+def generar(escala: str, semilla: int = 42, hoy: date | None = None) -> dict[str, int]:
+    """
+    Llena el backend del núcleo (core.get_storage()) con un dataset de la escala pedida.
+    Antes hay que apuntar core a una carpeta descartable (core.configurar). Devuelve las
+    filas generadas por tabla.
+    """
+    params = ESCALAS[escala]
+    rng = np.random.default_rng(semilla)
+    hoy = hoy or date.today()
+    backend = core.get_storage()
+    backend.ensure()
+
+    clientes = generar_clientes(params["clientes"], rng)
+    turnos = generar_turnos(params["turnos"], clientes, rng, hoy)
+    historial = generar_historias(clientes, turnos, min(params["historias"], len(clientes)), params["eventos"], rng)
+
+    backend.write("servicios", core.DEFAULT_SERVICIOS)
+    backend.write("clientes", clientes)
+    backend.write("turnos", turnos)
+    backend.write("historial", historial)
+    core._df_cache().clear()
+    core._indices_cache().clear()
+    return {"servicios": len(core.DEFAULT_SERVICIOS), "clientes": len(clientes), "turnos": len(turnos),
+            "historial": len(historial), "historias": min(params["historias"], len(clientes))}
@@ -0,0 +1,1811 @@
+# ==========================================================
+# Núcleo de turnos (sin Streamlit)
+# - Datos: backend CSV/SQLite con caches por versión de tabla (ver storage.py)
+# - Catálogo de servicios, horarios de atención (semanales, fechas especiales y cierres,
+#   compilados por versión), motor de horarios libres (grilla de minutos por día, cacheada),
+#   reservas con control de conflictos
+# - Historias por cliente (un JSONL de solo agregado + índice de offsets, ver historias.py)
+#   e historial global
+# - Auditoría de agenda: superposiciones / buffer / Fin inconsistente (barrido por Fecha)
+# - Analítica: agregados por día × Tipo × Zona que se actualizan en cada escritura de turnos
+# - API estable para la app, jobs y benchmarks: disponibilidad, reservar, cancelar,
+#   finalizar, buscar_cliente / buscar_turno
+# - Uso por consola: python core.py disponibilidad --fecha 2025-11-03 --tipo Láser --zonas Axilas
+# ==========================================================
+import argparse
+import contextlib
+import re
+import threading
+import uuid
+from datetime import datetime, timedelta, time, date
+from pathlib import Path
+import os
+
+import numpy as np
+import pandas as pd
+
+import analitica
+import archivo
+import historias
+import rendimiento
+import storage
+
+# =========================
+# CONFIG GENERAL
+# =========================
+BASE_DIR = Path(__file__).parent
+DATA_DIR = Path(os.environ.get("ESTETICA_DATA_DIR", BASE_DIR / "data"))  # otra carpeta: benchmarks, pruebas
+DATA_DIR.mkdir(parents=True, exist_ok=True)
+
+# Backend de datos: "csv" (un archivo por tabla) o "sqlite" (data/estetica.db)
+STORAGE_BACKEND = os.environ.get("ESTETICA_STORAGE", "csv")
+
+HISTORIAS_DIR = DATA_DIR / "historias"
+HISTORIAS_DIR.mkdir(exist_ok=True)
+rendimiento.configurar(DATA_DIR / "perf")  # ESTETICA_PERF=1 o el panel "Rendimiento" del admin
+
+# Parámetros
+SLOT_STEP_MIN = 10
+BUFFER_MIN_DEFAULT = 5
+DIAS_BUSQUEDA = 45  # ventana de "próximos horarios" en la reserva
+MAX_RANGOS_CACHE = 32  # rangos de turnos cacheados por load_turnos
+HIST_POR_PAGINA = 50
+# Clase de recurso que ocupa un servicio sin Recursos en el catálogo (con recursos cargados)
+CLASE_DEFECTO = os.environ.get("ESTETICA_CLASE_DEFECTO", "Operadora")
+
+# Disponibilidad semanal (1=Lun ... 7=Dom): semilla de la tabla horarios, que es la que se edita
+# desde la app (y la que rige, también para los recursos sin Disponibilidad propia)
+DEFAULT_DISPONIBILIDAD_CODE = {
+    1: [("09:00", "13:00"), ("14:00", "17:00")],
+    2: [("09:00", "17:00")],
+    3: [("09:00", "17:00")],
+    4: [("09:00", "17:00")],
+    5: [("09:00", "15:00")],
+    # 6,7 sin turnos (sábado/domingo)
+}
+
+# =========================
+# SEMILLAS
+# =========================
+DEFAULT_SERVICIOS = pd.DataFrame([
+    # Tipo, Zona, Duracion_min, Precio
+    # ---- LÁSER ----
+    ["Láser", "Axilas",            15,  8000],
+    ["Láser", "Medias piernas",    25, 16000],
+    ["Láser", "Piernas completas", 40, 25000],
+    ["Láser", "Brazos",            30, 18000],
+    ["Láser", "Medio brazo",       20, 12000],
+    ["Láser", "Cavado",            20, 12000],
+    ["Láser", "Tiro de cola",      15, 10000],
+    ["Láser", "Rostro completo",   25, 15000],
+    ["Láser", "Cara",              15,  9000],
+    # ---- DESCARTABLE ----
+    ["Descartable", "Axilas",            20,  6000],
+    ["Descartable", "Medias piernas",    30, 12000],
+    ["Descartable", "Piernas completas", 45, 20000],
+    ["Descartable", "Brazos",            35, 15000],
+    ["Descartable", "Medio brazo",       25, 10000],
+    ["Descartable", "Cavado",            25, 10000],
+    ["Descartable", "Tiro de cola",      20,  8000],
+    ["Descartable", "Rostro completo",   30, 12000],
+    ["Descartable", "Cara",              20,  8000],
+], columns=["Tipo", "Zona", "Duracion_min", "Precio"]).assign(Recursos="")
+
+DEFAULT_CLIENTES = pd.DataFrame([], columns=["Cliente_ID", "Nombre", "WhatsApp", "Email", "Notas"])
+DEFAULT_TURNOS = pd.DataFrame([], columns=[
+    "Turno_ID","Cliente_ID","Fecha","Inicio","Fin","Tipo","Zonas",
+    "Duracion_total","Estado","Notas","RecordatorioEnviado","Recursos"
+])
+DEFAULT_HISTORIAL_GLOBAL = pd.DataFrame([], columns=["Cliente_ID","Nombre","Fecha","Evento","Detalles"])
+# Operadoras, cabinas y equipos. Vacía = un solo sillón con la disponibilidad general
+DEFAULT_RECURSOS = pd.DataFrame([], columns=["Recurso_ID", "Nombre", "Clase", "Disponibilidad", "Activo"])
+
+# Horarios de atención (ver Horarios): una regla semanal por día de DEFAULT_DISPONIBILIDAD_CODE
+DEFAULT_HORARIOS = pd.DataFrame(
+    [{"Regla_ID": f"semanal-{d}", "Tipo": "Semanal", "Dias": str(d), "Tramos": " ".join(f"{a}-{b}" for a, b in tramos)}
+     for d, tramos in DEFAULT_DISPONIBILIDAD_CODE.items()],
+).reindex(columns=["Regla_ID", "Tipo", "Desde", "Hasta", "Dias", "Tramos", "Buffer_min", "Paso_min", "Nota"]).fillna("")
+
+DEFAULT_TABLAS = {
+    "servicios": DEFAULT_SERVICIOS,
+    "clientes": DEFAULT_CLIENTES,
+    "turnos": DEFAULT_TURNOS,
+    "historial": DEFAULT_HISTORIAL_GLOBAL,
+    "recursos": DEFAULT_RECURSOS,
+    "horarios": DEFAULT_HORARIOS,
+}
+
+# =========================
+# IO DATOS
+# =========================
+# Estado compartido por todo el proceso (la app de Streamlit importa este módulo una sola vez)
+_backends: dict[tuple[str, Path], object] = {}
+_backends_lock = threading.Lock()
+_DF_CACHE: dict = {}
+_INDICES_CACHE: dict = {}
+
+def configurar(data_dir: Path | None = None, backend: str | None = None):
+    """Apunta el núcleo a otra carpeta de datos / backend (CLI, benchmarks) y vacía los caches."""
+    global DATA_DIR, STORAGE_BACKEND, HISTORIAS_DIR
+    if data_dir is not None:
+        DATA_DIR = Path(data_dir)
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        HISTORIAS_DIR = DATA_DIR / "historias"
+        HISTORIAS_DIR.mkdir(exist_ok=True)
+        rendimiento.configurar(DATA_DIR / "perf")
+    if backend is not None:
+        STORAGE_BACKEND = backend
+    _DF_CACHE.clear()
+    _INDICES_CACHE.clear()
+
+def get_storage(tipo: str | None = None):
+    """Backend compartido por todo el proceso (ver storage.py)."""
+    key = (tipo or STORAGE_BACKEND, DATA_DIR)
+    backend = _backends.get(key)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(key)
+            if backend is None:
+                backend = _backends[key] = storage.get_storage(key[0], DATA_DIR, DEFAULT_TABLAS)
+    return backend
+
+def ensure_files():
+    get_storage().ensure()
+
+def _df_cache() -> dict:
+    """Cache compartido por todo el proceso: name -> (versión de la tabla, DataFrame normalizado)."""
+    return _DF_CACHE
+
+@rendimiento.cronometrado("load_df", con_arg=True)
+def load_df(name: str) -> pd.DataFrame:
+    """
+    Lee y normaliza una tabla. Si no cambió desde la última lectura (CSV: ruta + mtime + tamaño;
+    SQLite: contador de versión), devuelve una copia de la versión cacheada sin volver a parsear.
+    """
+    ensure_files()
+    key = get_storage().version(name)
+    cache = _df_cache()
+    hit = cache.get(name)
+    if hit is not None and hit[0] == key:
+        return hit[1].copy()
+    df = _normalizar(name, get_storage().read(name))
+    cache[name] = (key, df)
+    return df.copy()
+
+@rendimiento.cronometrado("load_turnos")
+def load_turnos(desde: date, hasta: date) -> pd.DataFrame:
+    """
+    Turnos con Fecha entre desde y hasta (inclusive). Con turnos particionados solo se
+    leen las particiones del rango (SQLite usa el índice de Fecha). Cacheado como load_df.
+    """
+    ensure_files()
+    d, h = desde.isoformat(), hasta.isoformat()
+    key = get_storage().version_rango("turnos", d, h)
+    cache = _df_cache()
+    ck = ("turnos", d, h)
+    hit = cache.get(ck)
+    if hit is not None and hit[0] == key:
+        return hit[1].copy()
+    df = _normalizar("turnos", get_storage().read_range("turnos", d, h))
+    if not df.empty:
+        df = df[(df["Fecha"] >= desde) & (df["Fecha"] <= hasta)].reset_index(drop=True)
+    rangos = [k for k in cache if isinstance(k, tuple)]
+    if len(rangos) >= MAX_RANGOS_CACHE:
+        cache.pop(rangos[0], None)
+    cache[ck] = (key, df)
+    return df.copy()
+
+def _indices_cache() -> dict:
+    """Índices por clave compartidos por el proceso: name -> (versión de la tabla, índice)."""
+    return _INDICES_CACHE
+
+def _indice(name: str, clave: str) -> dict[str, dict]:
+    key = get_storage().version(name)
+    cache = _indices_cache()
+    hit = cache.get(name)
+    if hit is not None and hit[0] == key:
+        return hit[1]
+    df = load_df(name)
+    idx = {}
+    for row in df.to_dict("records"):
+        idx.setdefault(str(row.get(clave, "")), row)  # ante IDs repetidos gana la primera fila
+    if name == "clientes":
+        for row in idx.values():
+            row["_label"] = get_cliente_display_row(row)
+    cache[name] = (key, idx)
+    return idx
+
+def indice_clientes() -> dict[str, dict]:
+    """
+    Cliente_ID -> fila del cliente (dict) con su etiqueta 'Nombre – email' en '_label'.
+    Se arma una vez por versión de la tabla; no modificar las filas devueltas.
+    """
+    return _indice("clientes", "Cliente_ID")
+
+def indice_turnos() -> dict[str, dict]:
+    """Turno_ID -> fila del turno (dict). Igual que indice_clientes."""
+    return _indice("turnos", "Turno_ID")
+
+def _normalizar(name: str, df: pd.DataFrame) -> pd.DataFrame:
+    if name == "servicios":
+        for col in ["Tipo", "Zona"]:
+            df[col] = df[col].astype(str).str.strip()
+        df = df[(df["Tipo"] != "") & (df["Zona"] != "")]
+        for c in ["Duracion_min", "Precio"]:
+            df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0).astype(int)
+        df = df.drop_duplicates(subset=["Tipo", "Zona"], keep="first").reset_index(drop=True)
+        if "Recursos" not in df.columns:
+            df["Recursos"] = ""
+    elif name == "clientes":
+        if "Cliente_ID" in df.columns and "WhatsApp" in df.columns:
+            df["Cliente_ID"] = df["Cliente_ID"].astype(str).str.strip()
+            df["WhatsApp"] = df["WhatsApp"].astype(str).str.strip()
+            df.loc[df["Cliente_ID"] == "", "Cliente_ID"] = df["WhatsApp"]
+            df.loc[df["WhatsApp"] == "", "WhatsApp"] = df["Cliente_ID"]
+    elif name == "turnos":
+        if "Fecha" in df.columns:
+            df["Fecha"] = pd.to_datetime(df["Fecha"], errors="coerce").dt.date
+        if "Recursos" not in df.columns:
+            df["Recursos"] = ""
+    elif name == "recursos":
+        df = df.reindex(columns=DEFAULT_RECURSOS.columns).fillna("")
+    elif name == "horarios":
+        df = df.reindex(columns=DEFAULT_HORARIOS.columns).fillna("")
+    return df
+
+@rendimiento.cronometrado("save_df", con_arg=True, filas=None)
+def save_df(name: str, df: pd.DataFrame):
+    """Reemplaza la tabla completa (editores masivos)."""
+    get_storage().write(name, df)
+    _df_cache().pop(name, None)
+    if name == "turnos":
+        analitica.invalidar(DATA_DIR)
+
+def _escritura(name: str):
+    """
+    Lock de escritura de turnos (ver _grillas_frescas): la foto de las grillas al día, la
+    escritura y la actualización de esas grillas quedan sin escrituras ajenas en el medio.
+    """
+    return get_storage().lock_escritura(name) if name == "turnos" else contextlib.nullcontext()
+
+def insert_row(name: str, row: dict):
+    """Agrega una sola fila sin reescribir la tabla."""
+    with _escritura(name):
+        frescas = _grillas_frescas() if name == "turnos" else None
+        get_storage().insert(name, row)
+        _df_cache().pop(name, None)
+        if name == "turnos":
+            agregar = pd.DataFrame([row])
+            _actualizar_analitica(None, agregar)
+            _actualizar_grillas(frescas, None, agregar)
+
+def insert_rows(name: str, df: pd.DataFrame) -> int:
+    """Agrega muchas filas en una sola escritura (importaciones)."""
+    with _escritura(name):
+        frescas = _grillas_frescas() if name == "turnos" else None
+        n = get_storage().insert_many(name, df)
+        _df_cache().pop(name, None)
+        if name == "turnos":
+            _actualizar_analitica(None, df)
+            _actualizar_grillas(frescas, None, df)
+    return n
+
+def update_rows(name: str, clave: str, cambios: pd.DataFrame, fechas=None) -> int:
+    """
+    Actualiza en bloque las filas cuyo `clave` aparece en `cambios` con sus columnas.
+    `fechas` (Fecha actual de esos turnos) evita recorrer todas las particiones.
+    """
+    antes = despues = frescas = None
+    with _escritura(name):
+        if name == "turnos":
+            frescas = _grillas_frescas()
+            if (COLS_ANALITICA | COLS_AGENDA).intersection(cambios.columns):
+                antes = _turnos_donde(fechas)
+                antes = antes[antes[clave].astype(str).isin(cambios[clave].astype(str))]
+        n = get_storage().update_many(name, clave, cambios, fechas=fechas)
+        _df_cache().pop(name, None)
+        if antes is not None and not antes.empty:
+            despues = antes.set_index(antes[clave].astype(str))
+            nuevos = cambios.drop_duplicates(subset=[clave], keep="last").set_index(cambios[clave].astype(str))
+            despues.update(nuevos.drop(columns=[clave]))
+            despues = despues.reset_index(drop=True)
+            if COLS_ANALITICA.intersection(cambios.columns):
+                _actualizar_analitica(antes, despues)
+        if frescas is not None:
+            _actualizar_grillas(frescas, antes, despues)
+    return n
+
+def update_row(name: str, where: dict, values: dict, fecha: str | None = None) -> int:
+    """
+    Actualiza las filas que coinciden con `where`. Devuelve cuántas cambió.
+    `fecha` (Fecha actual del turno) evita recorrer todas las particiones de turnos.
+    """
+    antes = frescas = None
+    with _escritura(name):
+        if name == "turnos":
+            frescas = _grillas_frescas()
+            if (COLS_ANALITICA | COLS_AGENDA).intersection(values):
+                antes = _turnos_donde([fecha] if fecha else None, where)
+        n = get_storage().update(name, where, values, fecha=fecha)
+        _df_cache().pop(name, None)
+        despues = antes.assign(**values) if antes is not None and n else None
+        if despues is not None and COLS_ANALITICA.intersection(values):
+            _actualizar_analitica(antes, despues)
+        if frescas is not None:
+            _actualizar_grillas(frescas, antes if n else None, despues)
+    return n
+
+def delete_rows(name: str, clave: str, keys, fechas=None) -> int:
+    """Borra en bloque las filas cuyo `clave` está en `keys`; `fechas` como en update_rows."""
+    keys = [str(k) for k in keys]
+    antes = frescas = None
+    with _escritura(name):
+        if name == "turnos":
+            frescas = _grillas_frescas()
+            antes = _turnos_donde(fechas)
+            antes = antes[antes[clave].astype(str).isin(keys)]
+        n = get_storage().delete(name, clave, keys, fechas=fechas)
+        _df_cache().pop(name, None)
+        if antes is not None and n:
+            _actualizar_analitica(antes, None)
+        if frescas is not None:
+            _actualizar_grillas(frescas, antes if n else None, None)
+    return n
+
+def delete_row(name: str, where: dict, fecha: str | None = None) -> int:
+    """Borra las filas que coinciden con `where`. Devuelve cuántas borró."""
+    with _escritura(name):
+        frescas = _grillas_frescas() if name == "turnos" else None
+        antes = _turnos_donde([fecha] if fecha else None, where) if name == "turnos" else None
+        n = get_storage().delete_row(name, where, fecha=fecha)
+        _df_cache().pop(name, None)
+        if antes is not None and n:
+            _actualizar_analitica(antes, None)
+        if frescas is not None:
+            _actualizar_grillas(frescas, antes if n else None, None)
+    return n
+
+# =========================
+# UTILS
+# =========================
+def to_time(hhmm: str):
+    s = str(hhmm).strip()
+    if not s or ":" not in s:
+        return None
+    try:
+        hh, mm = s.split(":")[:2]
+        return time(int(hh), int(mm))
+    except:
+        return None
+
+def overlaps(start1, end1, start2, end2):
+    return (start1 < end2) and (start2 < end1)
+
+def humanize_list(items):
+    return ", ".join(items or [])
+
+# Zonas excluyentes entre sí: se elige una sola de cada grupo
+GROUP_RULES = {
+    "Piernas": ["Medias piernas", "Piernas completas"],
+    "Brazos":  ["Brazos", "Medio brazo"],
+    "Rostro":  ["Rostro completo", "Cara"],
+}
+TIPOS_PREFERIDOS = ["Descartable", "Láser"]
+
+class Catalogo:
+    """
+    Catálogo de servicios compilado a diccionarios: (Tipo, Zona) -> (duración, precio),
+    recursos que pide cada servicio, zonas por tipo y reparto en grupos excluyentes /
+    zonas sueltas. Las cotizaciones de combinaciones de zonas se memorizan.
+    """
+
+    def __init__(self, servicios_df: pd.DataFrame):
+        self.servicios: dict[tuple[str, str], tuple[int, int]] = {}
+        self.recursos: dict[tuple[str, str], tuple[str, ...]] = {}
+        self.zonas: dict[str, list[str]] = {}
+        servicios_df = servicios_df.reindex(columns=["Tipo", "Zona", "Duracion_min", "Precio", "Recursos"]).fillna("")
+        for tipo, zona, dur, precio, recursos in servicios_df.itertuples(index=False):
+            if not str(tipo).strip() or not str(zona).strip() or (tipo, zona) in self.servicios:
+                continue
+            self.servicios[(tipo, zona)] = (int(dur), int(precio))
+            self.recursos[(tipo, zona)] = tuple(r.strip() for r in str(recursos).split(",") if r.strip())
+            self.zonas.setdefault(tipo, []).append(zona)
+        self.tipos = [t for t in TIPOS_PREFERIDOS if t in self.zonas] + [t for t in self.zonas if t not in TIPOS_PREFERIDOS]
+        usados_en_grupos = {m for ml in GROUP_RULES.values() for m in ml}
+        self.grupos: dict[str, list[tuple[str, list[str]]]] = {}
+        self.sueltas: dict[str, list[str]] = {}
+        for tipo, zonas in self.zonas.items():
+            presentes = [(g, [m for m in miembros if m in zonas]) for g, miembros in GROUP_RULES.items()]
+            self.grupos[tipo] = [(g, ms) for g, ms in presentes if len(ms) >= 2]
+            self.sueltas[tipo] = [z for z in zonas if z not in usados_en_grupos]
+        self._cotizaciones: dict[tuple[str, frozenset], tuple[int, int]] = {}
+
+    def cotizar(self, tipo: str, zonas) -> tuple[int, int]:
+        """(duración total, precio total) de un tipo con sus zonas; zonas desconocidas suman 0."""
+        key = (tipo, frozenset(zonas))
+        hit = self._cotizaciones.get(key)
+        if hit is None:
+            items = [self.servicios[(tipo, z)] for z in key[1] if (tipo, z) in self.servicios]
+            hit = (sum(d for d, _ in items), sum(p for _, p in items))
+            self._cotizaciones[key] = hit
+        return hit
+
+    def requisitos(self, tipo: str, zonas) -> tuple[str, ...]:
+        """Recursos que pide el servicio (unión de los de sus zonas, sin repetir); vacío = uno de CLASE_DEFECTO."""
+        return tuple(dict.fromkeys(r for z in zonas for r in self.recursos.get((tipo, z), ())))
+
+def catalogo() -> Catalogo:
+    """Catálogo compilado una vez por versión de servicios y compartido por el proceso."""
+    key = get_storage().version("servicios")
+    cache = _indices_cache()
+    hit = cache.get("catalogo")
+    if hit is not None and hit[0] == key:
+        return hit[1]
+    cat = Catalogo(load_df("servicios"))
+    cache["catalogo"] = (key, cat)
+    return cat
+
+def calc_duracion(tipo: str, zonas: list[str]) -> int:
+    return catalogo().cotizar(tipo, zonas)[0]
+
+def calc_precio(tipo: str, zonas: list[str]) -> int:
+    return catalogo().cotizar(tipo, zonas)[1]
+
+ESTADOS = ["Confirmado", "Reprogramado", "Cancelado", "No-show", "Realizado"]
+# Estados que no ocupan agenda
+ESTADOS_LIBERAN = ["Cancelado", "No-show"]
+
+# Horas que se aceptan en turnos y horarios: 'H:MM', 'HH:MM', 'HH:MM:SS' o 'HH.MM'
+RE_HORA = re.compile(r"(\d{1,2})[:.](\d{2})(?::\d{2})?")
+
+def hhmm_a_min(hhmm) -> int | None:
+    """'HH:MM' (o una variante de RE_HORA) -> minutos desde las 00:00 (None si no parsea)."""
+    if isinstance(hhmm, str) and len(hhmm) == 5 and hhmm.isascii() and hhmm[2] == ":" and hhmm[:2].isdigit() and hhmm[3:].isdigit():
+        hh, mm = int(hhmm[:2]), int(hhmm[3:])
+        return hh * 60 + mm if hh < 24 and mm < 60 else None
+    m = RE_HORA.fullmatch(str(hhmm).strip()) if hhmm is not None else None
+    if not m:
+        return None
+    hh, mm = int(m[1]), int(m[2])
+    return hh * 60 + mm if hh < 24 and mm < 60 else None
+
+def min_a_hhmm(minutos: int) -> str:
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+# =========================
+# HORARIOS DE ATENCIÓN (reglas semanales, fechas especiales y cierres)
+# =========================
+TIPOS_HORARIO = ["Semanal", "Especial", "Cerrado"]
+MAX_DIAS_REGLA = 3 * 366  # rango máximo de una regla por fechas
+
+def _fusionar(tramos: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """Tramos ordenados y sin solaparse (la grilla abre cada tramo y arma los inicios desde su comienzo)."""
+    fusion = []
+    for a, b in sorted(tramos):
+        if fusion and a <= fusion[-1][1]:
+            fusion[-1] = (fusion[-1][0], max(fusion[-1][1], b))
+        else:
+            fusion.append((a, b))
+    return fusion
+
+def _parse_dias(texto: str) -> set[int]:
+    """'1-5', '6' o '1-3,5' (1=Lun ... 7=Dom) -> días de la semana. ValueError si no se entiende."""
+    dias = set()
+    for parte in str(texto).replace(" ", "").split(","):
+        m = re.fullmatch(r"([1-7])(?:-([1-7]))?", parte)
+        if not m:
+            raise ValueError(f"Días inválidos '{texto}' (1=Lun ... 7=Dom, p. ej. '1-5' o '1,3')")
+        dias.update(range(int(m[1]), int(m[2] or m[1]) + 1))
+    return dias
+
+def _parse_tramos(partes: list[str], contexto: str) -> list[tuple[int, int]]:
+    tramos = []
+    for parte in partes:
+        a, _, b = parte.partition("-")
+        ia, ib = hhmm_a_min(a), hhmm_a_min(b)
+        if ia is None or ib is None or ia >= ib:
+            raise ValueError(f"Tramo inválido '{parte}' en '{contexto}'")
+        tramos.append((ia, ib))
+    return tramos
+
+def _fecha_regla(v) -> date | None:
+    texto = str(v or "").strip()
+    if not texto:
+        return None
+    f = pd.to_datetime(texto, errors="coerce", dayfirst=not re.match(r"\d{4}-", texto))
+    if pd.isna(f):
+        raise ValueError(f"Fecha inválida '{texto}' (AAAA-MM-DD)")
+    return f.date()
+
+def _minutos_regla(v, nombre: str, minimo: int) -> int | None:
+    texto = str(v or "").strip()
+    if not texto:
+        return None
+    n = pd.to_numeric(texto, errors="coerce")
+    if pd.isna(n) or n < minimo or n != int(n):
+        raise ValueError(f"{nombre} inválido '{texto}' (minutos, entero ≥ {minimo})")
+    return int(n)
+
+def _sumar_regla(previa, regla):
+    """Dos reglas del mismo nivel para un día: se suman los tramos y gana el último buffer/paso indicado."""
+    if previa is None:
+        return regla
+    return (_fusionar(previa[0] + regla[0]), regla[1] if regla[1] is not None else previa[1],
+            regla[2] if regla[2] is not None else previa[2])
+
+class Horarios:
+    """
+    Tabla horarios compilada una vez por versión. Tipo de cada regla:
+    - Semanal: Dias + Tramos; con Desde y/o Hasta rige solo en esas fechas (horario de verano...)
+      y, para sus días, reemplaza al semanal sin vigencia.
+    - Especial: Tramos que reemplazan los de las fechas Desde..Hasta (abrir un sábado, cerrar temprano);
+      Dias opcional para tomar solo algunos días del rango.
+    - Cerrado: Desde..Hasta sin turnos (feriados, vacaciones). Gana sobre todo lo demás.
+    Buffer_min / Paso_min opcionales pisan BUFFER_MIN_DEFAULT / SLOT_STEP_MIN en los días de la
+    regla. Reglas del mismo nivel para un mismo día se suman. Las filas con errores se ignoran
+    (quedan en `errores`). Sin ninguna fila rige DEFAULT_DISPONIBILIDAD_CODE.
+    dia(fecha) resuelve una fecha una sola vez (queda memorizada): el motor no parsea nada.
+    """
+
+    def __init__(self, horarios_df: pd.DataFrame):
+        self.semanal: dict[int, tuple] = {}
+        self.temporadas: list[tuple] = []  # (desde, hasta, días, (tramos, buffer, paso))
+        self.especiales: dict[date, tuple] = {}
+        self.cerrados: set[date] = set()
+        self.errores: dict[str, str] = {}
+        self._dias: dict[date, tuple[list[tuple[int, int]], int, int]] = {}
+        if horarios_df.empty:
+            for d in DEFAULT_DISPONIBILIDAD_CODE:
+                self.semanal[d] = (_fusionar([(hhmm_a_min(a), hhmm_a_min(b)) for a, b in DEFAULT_DISPONIBILIDAD_CODE[d]]), None, None)
+            return
+        for pos, fila in enumerate(horarios_df[DEFAULT_HORARIOS.columns].itertuples(index=False)):
+            rid = str(fila.Regla_ID).strip() or f"fila {pos + 1}"
+            try:
+                self._agregar(fila)
+            except ValueError as e:
+                self.errores[rid] = str(e)
+
+    def _agregar(self, fila):
+        tipo = str(fila.Tipo).strip().capitalize()
+        if tipo not in TIPOS_HORARIO:
+            raise ValueError(f"Tipo inválido '{fila.Tipo}' (uno de: {', '.join(TIPOS_HORARIO)})")
+        desde, hasta = _fecha_regla(fila.Desde), _fecha_regla(fila.Hasta)
+        dias = _parse_dias(fila.Dias) if str(fila.Dias).strip() else None
+        tramos_txt = str(fila.Tramos).replace(",", " ").split()
+        regla = (_fusionar(_parse_tramos(tramos_txt, str(fila.Tramos))),
+                 _minutos_regla(fila.Buffer_min, "Buffer_min", 0), _minutos_regla(fila.Paso_min, "Paso_min", 1))
+        if tipo == "Semanal":
+            if dias is None or not regla[0]:
+                raise ValueError("Una regla semanal necesita Dias y Tramos (p. ej. '1-5' y '09:00-17:00')")
+            if desde is None and hasta is None:
+                for d in dias:
+                    self.semanal[d] = _sumar_regla(self.semanal.get(d), regla)
+            else:
+                self.temporadas.append((desde, hasta, dias, regla))
+            return
+        if desde is None:
+            raise ValueError(f"Una regla '{tipo}' necesita Desde (AAAA-MM-DD)")
+        hasta = hasta or desde
+        if hasta < desde or (hasta - desde).days > MAX_DIAS_REGLA:
+            raise ValueError(f"Rango de fechas inválido {desde}..{hasta}")
+        fechas = [desde + timedelta(days=k) for k in range((hasta - desde).days + 1)]
+        fechas = [f for f in fechas if dias is None or f.isoweekday() in dias]
+        if tipo == "Cerrado":
+            self.cerrados.update(fechas)
+        elif not regla[0]:
+            raise ValueError("Una regla especial necesita Tramos (para no atender, Tipo 'Cerrado')")
+        else:
+            for f in fechas:
+                self.especiales[f] = _sumar_regla(self.especiales.get(f), regla)
+
+    def dia(self, fecha: date) -> tuple[list[tuple[int, int]], int, int]:
+        """(tramos en minutos, buffer, paso) de una fecha."""
+        hit = self._dias.get(fecha)
+        if hit is None:
+            dia = fecha.isoweekday()
+            if fecha in self.cerrados:
+                regla = ([], None, None)
+            else:
+                regla = self.especiales.get(fecha)
+                if regla is None:
+                    for desde, hasta, dias, r in self.temporadas:
+                        if dia in dias and (desde is None or desde <= fecha) and (hasta is None or fecha <= hasta):
+                            regla = _sumar_regla(regla, r)
+                if regla is None:
+                    regla = self.semanal.get(dia, ([], None, None))
+            tramos, buffer, paso = regla
+            hit = (tramos, BUFFER_MIN_DEFAULT if buffer is None else buffer, paso or SLOT_STEP_MIN)
+            self._dias[fecha] = hit
+        return hit
+
+    def tramos(self, fecha: date) -> list[tuple[int, int]]:
+        return self.dia(fecha)[0]
+
+    def cerrado(self, fecha: date) -> bool:
+        return fecha in self.cerrados
+
+    def rango(self, desde: date, hasta: date) -> pd.DataFrame:
+        """Un día por fila entre `desde` y `hasta`: Fecha, Tramos (texto), Minutos, Buffer_min, Paso_min."""
+        filas = []
+        for k in range((hasta - desde).days + 1):
+            f = desde + timedelta(days=k)
+            tramos, buffer, paso = self.dia(f)
+            filas.append((f, " ".join(f"{a // 60:02d}:{a % 60:02d}-{b // 60:02d}:{b % 60:02d}" for a, b in tramos)
+                          or ("Cerrado" if self.cerrado(f) else ""), sum(b - a for a, b in tramos), buffer, paso))
+        return pd.DataFrame(filas, columns=["Fecha", "Tramos", "Minutos", "Buffer_min", "Paso_min"])
+
+def horarios() -> Horarios:
+    """Horarios compilados una vez por versión de la tabla, como catalogo() y recursos()."""
+    key = get_storage().version("horarios")
+    cache = _indices_cache()
+    hit = cache.get("horarios")
+    if hit is not None and hit[0] == key:
+        return hit[1]
+    hor = Horarios(load_df("horarios"))
+    cache["horarios"] = (key, hor)
+    return hor
+
+def buffers_por_fecha(fechas: pd.Series) -> pd.Series:
+    """Buffer de cada fila según el horario de su Fecha (date), con la misma indexación."""
+    hor = horarios()
+    unicas = {f: hor.dia(f)[1] if isinstance(f, date) and not pd.isna(f) else BUFFER_MIN_DEFAULT for f in fechas.unique()}
+    return fechas.map(unicas).astype(int)
+
+# =========================
+# RECURSOS (operadoras, cabinas, equipos)
+# =========================
+RECURSOS_INACTIVOS = {"no", "false", "0", "inactivo"}
+
+def parse_disponibilidad(texto) -> dict[int, list[tuple[int, int]]]:
+    """
+    Disponibilidad de un recurso: bloques 'días tramos' separados por ';', con días 1=Lun ... 7=Dom
+    sueltos, en rango o por coma y tramos HH:MM-HH:MM. Ej: '1-4 09:00-17:00; 5 09:00-13:00 14:00-15:00'.
+    Vacía = {} (el recurso sigue los horarios generales). ValueError si algún bloque no se entiende.
+    """
+    out: dict[int, list[tuple[int, int]]] = {}
+    for bloque in (b.strip() for b in str(texto or "").split(";")):
+        if not bloque:
+            continue
+        partes = bloque.split()
+        try:
+            dias = _parse_dias(partes[0])
+        except ValueError:
+            dias = None
+        if not dias or len(partes) < 2:
+            raise ValueError(f"No se entiende '{bloque}' (esperado: '1-5 09:00-17:00')")
+        tramos = _parse_tramos(partes[1:], bloque)
+        for d in dias:
+            out[d] = _fusionar(out.get(d, []) + tramos)
+    return out
+
+class Recursos:
+    """
+    Recursos activos compilados: id, nombre, clase y tramos por día de la semana en minutos
+    (None = sin Disponibilidad propia, sigue los horarios de atención).
+    Un servicio pide recursos por Recurso_ID o por Clase (uno distinto por cada pedido); sin
+    pedidos, uno de CLASE_DEFECTO (o cualquiera si no hay recursos de esa clase). Un turno
+    ocupa los de su columna Recursos, o todos si está vacía (turnos de antes de cargar
+    recursos). Sin recursos, `multi` es False y la agenda es el sillón único de siempre.
+    """
+
+    def __init__(self, recursos_df: pd.DataFrame):
+        self.ids: list[str] = []
+        self.nombres: list[str] = []
+        self.clases: list[str] = []
+        self.tramos: list[dict[int, list[tuple[int, int]]] | None] = []
+        self.errores: dict[str, str] = {}
+        for rid, nombre, clase, disp, activo in recursos_df[DEFAULT_RECURSOS.columns].itertuples(index=False):
+            rid = str(rid).strip()
+            if not rid or rid in self.ids or str(activo).strip().lower() in RECURSOS_INACTIVOS:
+                continue
+            try:
+                tramos = parse_disponibilidad(disp) or None
+            except ValueError as e:
+                self.errores[rid] = str(e)
+                tramos = {}
+            self.ids.append(rid)
+            self.nombres.append(str(nombre).strip() or rid)
+            self.clases.append(str(clase).strip().lower())
+            self.tramos.append(tramos)
+        self.multi = bool(self.ids)
+        self.pos = {rid: i for i, rid in enumerate(self.ids)}
+        self.todos = tuple(range(len(self.ids)))
+        # Servicio sin Recursos: uno de la clase por defecto; si no hay ninguno de esa clase, cualquiera
+        self.por_defecto = self._de_clase(CLASE_DEFECTO) or self.todos
+        self._de_turno: dict[str, tuple[int, ...]] = {}
+
+    def _de_clase(self, clase: str) -> tuple[int, ...]:
+        return tuple(i for i, c in enumerate(self.clases) if c == clase.strip().lower())
+
+    def candidatos(self, pedido: str) -> tuple[int, ...]:
+        """Recursos que cumplen un pedido: un Recurso_ID, una Clase, '*' (cualquiera) o vacío (por_defecto)."""
+        pedido = str(pedido).strip()
+        if pedido == "":
+            return self.por_defecto
+        if pedido == "*":
+            return self.todos
+        if pedido in self.pos:
+            return (self.pos[pedido],)
+        return self._de_clase(pedido)
+
+    def requisitos(self, pedidos) -> list[tuple[int, ...]]:
+        return [self.candidatos(p) for p in (pedidos or ("",))]
+
+    def desconocidos(self, pedidos) -> list[str]:
+        """Pedidos (Recurso_ID o Clase) que no coinciden con ningún recurso activo."""
+        return [p for p in (str(x).strip() for x in pedidos) if p and not self.candidatos(p)]
+
+    def de_turno(self, texto) -> tuple[int, ...]:
+        """Recursos que ocupa un turno según su columna Recursos (vacía o desconocida = todos)."""
+        hit = self._de_turno.get(texto)
+        if hit is None:
+            hit = tuple(self.pos[r] for r in dict.fromkeys(x.strip() for x in str(texto or "").split(",")) if r in self.pos)
+            self._de_turno[texto] = hit = hit or self.todos
+        return hit
+
+def recursos() -> Recursos:
+    """Recursos compilados una vez por versión de la tabla, como catalogo()."""
+    key = get_storage().version("recursos")
+    cache = _indices_cache()
+    hit = cache.get("recursos")
+    if hit is not None and hit[0] == key:
+        return hit[1]
+    rec = Recursos(load_df("recursos"))
+    cache["recursos"] = (key, rec)
+    return rec
+
+# =========================
+# GRILLA DE MINUTOS (motor de disponibilidad)
+# =========================
+MIN_DIA = 24 * 60
+# Columnas de turnos que mueven la agenda: cambiar solo Notas o RecordatorioEnviado no toca las grillas
+COLS_AGENDA = {"Fecha", "Inicio", "Fin", "Estado", "Recursos"}
+MAX_GRILLAS_CACHE = 120  # días con grilla cacheada (un mes de mapa + la ventana de búsqueda)
+
+class Grilla:
+    """
+    Agenda de un día como grilla de minutos (0..1439) en NumPy, una fila por recurso (o una
+    sola, el sillón): qué minutos caen dentro de los tramos y cuántos turnos ocupan cada minuto
+    (sin buffer). Reservar y liberar suman o restan sobre ese conteo; los inicios libres para
+    cualquier duración salen de la suma acumulada de minutos libres (ventana deslizante), que se
+    calcula una vez por cambio y sirve para todas las duraciones.
+    """
+
+    def __init__(self, tramos: list[list[tuple[int, int]]], buffer_min: int = BUFFER_MIN_DEFAULT,
+                 paso_min: int = SLOT_STEP_MIN):
+        self.tramos = tramos
+        self.buffer_min = buffer_min
+        self.paso_min = paso_min
+        self.abierto = np.zeros((len(tramos), MIN_DIA), dtype=bool)
+        for r, tramos_fila in enumerate(tramos):
+            for a, b in tramos_fila:
+                self.abierto[r, max(a, 0):min(b, MIN_DIA)] = True
+        self.conteo = np.zeros((len(tramos), MIN_DIA), dtype=np.int32)
+        self._acum = None
+
+    def _marcar(self, filas, inicios, fines, signo: int):
+        filas, inicios, fines = (np.atleast_1d(np.asarray(x, dtype=int)) for x in (filas, inicios, fines))
+        ok = fines > inicios
+        if not ok.any():
+            return
+        delta = np.zeros((len(self.tramos), MIN_DIA + 1), dtype=np.int32)
+        np.add.at(delta, (filas[ok], np.clip(inicios[ok], 0, MIN_DIA)), signo)
+        np.add.at(delta, (filas[ok], np.clip(fines[ok], 0, MIN_DIA)), -signo)
+        self.conteo += np.cumsum(delta[:, :MIN_DIA], axis=1, dtype=np.int32)
+        self._acum = None
+
+    def reservar(self, filas, inicios, fines):
+        """Ocupa [inicio, fin) en cada fila (escalares o arrays de igual largo)."""
+        self._marcar(filas, inicios, fines, 1)
+
+    def liberar(self, filas, inicios, fines):
+        """Deshace un reservar() (turno cancelado, movido o borrado)."""
+        self._marcar(filas, inicios, fines, -1)
+
+    def _acumulado(self) -> np.ndarray:
+        """Suma acumulada por fila de los minutos libres: en un tramo y a más del buffer de todo turno."""
+        if self._acum is None:
+            n, b = len(self.tramos), self.buffer_min
+            ocupado = np.zeros((n, MIN_DIA + 1), dtype=np.int32)
+            np.cumsum(self.conteo > 0, axis=1, out=ocupado[:, 1:])
+            m = np.arange(MIN_DIA)
+            cerca = ocupado[:, np.minimum(m + b + 1, MIN_DIA)] - ocupado[:, np.maximum(m - b, 0)]
+            self._acum = np.zeros((n, MIN_DIA + 1), dtype=np.int32)
+            np.cumsum(self.abierto & (cerca == 0), axis=1, out=self._acum[:, 1:])
+        return self._acum
+
+    def inicios(self, dur_min: int, slot_step_min: int | None = None, filas=None) -> np.ndarray:
+        """Inicios de la grilla de reserva: cada slot_step_min (o el paso del día) desde el comienzo de cada tramo de esas filas."""
+        filas = range(len(self.tramos)) if filas is None else filas
+        paso = slot_step_min or self.paso_min
+        grillas = [np.arange(a, b - dur_min + 1, paso) for r in filas for a, b in self.tramos[r]]
+        return np.unique(np.concatenate(grillas)) if grillas else np.empty(0, dtype=int)
+
+    def libres(self, dur_min: int, inicios: np.ndarray, filas=None) -> np.ndarray:
+        """Máscara filas × inicios: los `dur_min` minutos desde cada inicio están libres en esa fila."""
+        acum = self._acumulado() if filas is None else self._acumulado()[filas]
+        inicios = np.asarray(inicios, dtype=int)
+        fines = inicios + dur_min
+        ok = (inicios >= 0) & (fines <= MIN_DIA) & (dur_min > 0)
+        return ok & (acum[:, np.clip(fines, 0, MIN_DIA)] - acum[:, np.clip(inicios, 0, MIN_DIA)] == dur_min)
+
+    def minutos_libres(self, desde_min: int = -1) -> int:
+        """Minutos de los tramos sin ningún turno encima (sin buffer) desde `desde_min`, sumados entre filas."""
+        return int((self.abierto & (self.conteo <= 0))[:, max(desde_min, 0):].sum())
+
+def _celdas_turnos(turnos: pd.DataFrame | None, rec: Recursos) -> tuple[np.ndarray, ...]:
+    """
+    (fila, inicio, fin, posición en `turnos`) en minutos de los turnos activos: una entrada por
+    recurso que ocupa cada uno. Con muchos turnos (un rango) los horarios se parsean en bloque;
+    minutos_serie y hhmm_a_min aceptan exactamente lo mismo, así que da igual el camino.
+    """
+    vacio = (np.empty(0, dtype=int),) * 4
+    if turnos is None or turnos.empty:
+        return vacio
+    pos = np.flatnonzero(~turnos["Estado"].isin(ESTADOS_LIBERAN).to_numpy())
+    activos = turnos.iloc[pos]
+    if len(activos) > 500:
+        ini, fin = minutos_serie(activos["Inicio"]).to_numpy(), minutos_serie(activos["Fin"]).to_numpy()
+    else:  # un día: el parseo de a uno es más barato que armar las Series
+        ini = np.array([hhmm_a_min(x) for x in activos["Inicio"]], dtype=float)
+        fin = np.array([hhmm_a_min(x) for x in activos["Fin"]], dtype=float)
+    ok = ~np.isnan(ini) & ~np.isnan(fin)
+    pos, ini, fin = pos[ok], ini[ok].astype(int), fin[ok].astype(int)
+    if not rec.multi:
+        return np.zeros(len(pos), dtype=int), ini, fin, pos
+    asignados = activos["Recursos"].to_numpy()[ok] if "Recursos" in activos.columns else [""] * len(pos)
+    por_turno = [rec.de_turno(x) for x in asignados]
+    veces = np.fromiter((len(p) for p in por_turno), dtype=int, count=len(por_turno))
+    if not veces.sum():
+        return vacio
+    filas = np.concatenate([np.asarray(p, dtype=int) for p in por_turno])
+    return filas, np.repeat(ini, veces), np.repeat(fin, veces), np.repeat(pos, veces)
+
+def _por_fecha(turnos: pd.DataFrame, celdas: tuple[np.ndarray, ...]) -> dict[date, tuple[np.ndarray, ...]]:
+    """Reparte las celdas de _celdas_turnos por la Fecha (date) del turno del que salen."""
+    fechas = pd.to_datetime(turnos["Fecha"].astype(str), errors="coerce").dt.date.to_numpy()[celdas[3]]
+    grupos = pd.Series(fechas, dtype=object).groupby(fechas, sort=False).indices if len(fechas) else {}
+    return {d: tuple(c[i] for c in celdas[:3]) for d, i in grupos.items()}
+
+def _grilla_vacia(date_obj: date, rec: Recursos, hor: Horarios) -> Grilla:
+    """
+    Grilla sin turnos con el horario compilado del día (tramos, buffer y paso): los recursos con
+    Disponibilidad propia usan la suya salvo en los días cerrados; el resto y el sillón único, la general.
+    """
+    tramos, buffer, paso = hor.dia(date_obj)
+    if not rec.multi:
+        return Grilla([tramos], buffer, paso)
+    dia, cerrado = date_obj.isoweekday(), hor.cerrado(date_obj)
+    filas = [tramos if t is None else [] if cerrado else t.get(dia, []) for t in (rec.tramos[r] for r in rec.todos)]
+    return Grilla(filas, buffer, paso)
+
+def armar_grilla(date_obj: date, turnos_dia: pd.DataFrame | None) -> Grilla:
+    """Grilla de un día con esos turnos (ya filtrados a la fecha)."""
+    rec = recursos()
+    g = _grilla_vacia(date_obj, rec, horarios())
+    g.reservar(*_celdas_turnos(turnos_dia, rec)[:3])
+    return g
+
+def _versiones_dias(dias) -> dict[date, tuple]:
+    """Versión de los turnos de cada fecha (su partición, o la tabla), de los recursos y de los horarios, una consulta por mes."""
+    st_ = get_storage()
+    v_rec = (st_.version("recursos"), st_.version("horarios"))
+    por_mes: dict[str, tuple] = {}
+    out = {}
+    for d in dias:
+        mes = d.isoformat()[:7]
+        if mes not in por_mes:
+            por_mes[mes] = (st_.version_rango("turnos", d.isoformat(), d.isoformat()), v_rec)
+        out[d] = por_mes[mes]
+    return out
+
+def grillas_rango(desde: date, hasta: date) -> dict[date, Grilla]:
+    """
+    Grillas de la agenda guardada para cada día entre `desde` y `hasta`, cacheadas por fecha
+    (versión de los turnos de ese día, de los recursos y de los horarios). Las que faltan o quedaron viejas se
+    arman juntas con una sola lectura y un solo parseo del rango. No modificar las grillas devueltas.
+    """
+    dias = [desde + timedelta(days=k) for k in range((hasta - desde).days + 1)]
+    versiones = _versiones_dias(dias)
+    cache = _indices_cache()
+    out, faltan = {}, []
+    for d in dias:
+        hit = cache.get(("grilla", d))
+        if hit is not None and hit[0] == versiones[d]:
+            out[d] = hit[1]
+        else:
+            faltan.append(d)
+    if faltan:
+        rec, hor = recursos(), horarios()
+        turnos = load_turnos(faltan[0], faltan[-1])
+        celdas = _por_fecha(turnos, _celdas_turnos(turnos, rec)) if not turnos.empty else {}
+        grillas = [k for k in cache if isinstance(k, tuple) and k[0] == "grilla"]
+        for k in grillas[:max(0, len(grillas) + len(faltan) - MAX_GRILLAS_CACHE)]:
+            cache.pop(k, None)
+        for d in faltan:
+            out[d] = _grilla_vacia(d, rec, hor)
+            if d in celdas:
+                out[d].reservar(*celdas[d])
+            cache[("grilla", d)] = (versiones[d], out[d])
+    return {d: out[d] for d in dias}
+
+def grilla_dia(date_obj: date, turnos_dia: pd.DataFrame | None = None) -> Grilla:
+    """Grilla cacheada de la agenda guardada, o una armada con `turnos_dia` si se pasan."""
+    if turnos_dia is not None:
+        return armar_grilla(date_obj, turnos_dia)
+    return grillas_rango(date_obj, date_obj)[date_obj]
+
+def _grillas_frescas() -> dict[date, Grilla]:
+    """
+    Grillas cacheadas que están al día con lo guardado. Se toman antes de escribir turnos y
+    con el lock de escritura (_escritura) ya tomado: si otro proceso escribiera entre esta foto
+    y la escritura propia, _actualizar_grillas marcaría al día una grilla sin sus turnos.
+    """
+    dias = [k[1] for k in _indices_cache() if isinstance(k, tuple) and k[0] == "grilla"]
+    if not dias:
+        return {}
+    versiones = _versiones_dias(dias)
+    cache = _indices_cache()
+    return {d: cache[("grilla", d)][1] for d in dias if cache[("grilla", d)][0] == versiones[d]}
+
+def _actualizar_grillas(frescas: dict[date, Grilla], quitar: pd.DataFrame | None, agregar: pd.DataFrame | None):
+    """
+    Tras escribir turnos (sin soltar el lock de escritura): a las grillas que estaban al día les
+    libera `quitar` y les reserva `agregar` (filas de turnos, viejas y nuevas) y las vuelve a
+    marcar con la versión nueva, que solo difiere por la escritura propia. Las que no estaban
+    al día se rearman solas en la próxima consulta.
+    """
+    if not frescas:
+        return
+    rec = recursos()
+    versiones = _versiones_dias(list(frescas))
+    for df, marcar in ((quitar, Grilla.liberar), (agregar, Grilla.reservar)):
+        if df is None or df.empty:
+            continue
+        for d, celdas in _por_fecha(df, _celdas_turnos(df, rec)).items():
+            if d in frescas:
+                marcar(frescas[d], *celdas)
+    cache = _indices_cache()
+    for d, g in frescas.items():
+        cache[("grilla", d)] = (versiones[d], g)
+
+def _emparejar(pedidos: list[tuple[int, ...]], libre: np.ndarray) -> list[int] | None:
+    """Un recurso libre y distinto por pedido (vuelta atrás, empezando por el pedido más restringido)."""
+    orden = sorted(range(len(pedidos)), key=lambda k: len(pedidos[k]))
+    elegidos, usados = [-1] * len(pedidos), set()
+
+    def paso(j: int) -> bool:
+        if j == len(orden):
+            return True
+        k = orden[j]
+        for r in pedidos[k]:
+            if libre[r] and r not in usados:
+                usados.add(r)
+                elegidos[k] = r
+                if paso(j + 1):
+                    return True
+                usados.discard(r)
+        return False
+
+    return elegidos if paso(0) else None
+
+def _asignar(pedidos: list[tuple[int, ...]], libres: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Cruza las máscaras por recurso (`libres`, recursos × inicios) con los pedidos del servicio.
+    Si ningún recurso sirve a dos pedidos (lo común: una operadora + un equipo) se resuelve en
+    bloque con el primer candidato libre; si comparten candidatos, inicio por inicio.
+    Devuelve (inicios posibles, recurso asignado por inicio y pedido).
+    """
+    n = libres.shape[1]
+    asignados = np.full((n, len(pedidos)), -1)
+    if len({r for c in pedidos for r in c}) == sum(len(c) for c in pedidos):
+        ok = np.ones(n, dtype=bool)
+        for k, cand in enumerate(pedidos):
+            sub = libres[list(cand)]
+            ok &= sub.any(axis=0)
+            asignados[:, k] = np.asarray(cand)[sub.argmax(axis=0)]
+        return ok, asignados
+    ok = np.zeros(n, dtype=bool)
+    for m in np.flatnonzero(libres.any(axis=0)):
+        elegidos = _emparejar(pedidos, libres[:, m])
+        if elegidos is not None:
+            ok[m] = True
+            asignados[m] = elegidos
+    return ok, asignados
+
+def asignaciones_dia(g: Grilla, dur_min: int, pedidos=None, slot_step_min: int | None = None,
+                     inicios: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Inicios posibles de un día (su Grilla) para `dur_min`: los de la grilla de reserva de los
+    recursos pedidos (cada `slot_step_min`, por defecto el paso del día), o `inicios`. Devuelve además, por inicio, la fila asignada a cada pedido
+    del servicio (índices de recursos(); con sillón único un solo pedido, la fila 0). Cada fila
+    aporta su máscara de inicios libres y las máscaras se cruzan por pedido: sumar recursos suma
+    filas, no combinaciones.
+    """
+    rec = recursos()
+    reqs = rec.requisitos(pedidos) if rec.multi else [(0,)]
+    vacio = (np.empty(0, dtype=int), np.empty((0, len(reqs)), dtype=int))
+    if dur_min <= 0 or not all(reqs):
+        return vacio
+    usados = sorted({r for c in reqs for r in c})
+    if inicios is None:
+        inicios = g.inicios(dur_min, slot_step_min, usados)
+    if not len(inicios):
+        return vacio
+    libres = np.zeros((len(g.tramos), len(inicios)), dtype=bool)
+    libres[usados] = g.libres(dur_min, inicios, usados)
+    ok, asignados = _asignar(reqs, libres)
+    return inicios[ok], asignados[ok]
+
+def _slots_dia(date_obj: date, dur_min: int, g: Grilla, slot_step_min: int | None = None,
+               pedidos=None) -> list[datetime]:
+    base = datetime.combine(date_obj, time())
+    return [base + timedelta(minutes=int(m)) for m in asignaciones_dia(g, dur_min, pedidos, slot_step_min)[0]]
+
+@rendimiento.cronometrado("generar_slots")
+def generar_slots(date_obj: date, dur_min: int, turnos_df: pd.DataFrame | None = None, slot_step_min: int | None = None,
+                  pedidos=None):
+    """
+    Horarios libres de un día. Sin `turnos_df` usa la grilla cacheada de la agenda guardada;
+    con `turnos_df`, una armada con esos turnos. Tramos, buffer y paso (si no se pasa
+    `slot_step_min`) salen de los horarios de atención de la fecha. `pedidos`: recursos que pide
+    el servicio (Catalogo.requisitos); sin recursos cargados no se usan.
+    """
+    if dur_min <= 0:
+        return []
+    if not recursos().multi and not horarios().tramos(date_obj):
+        return []
+    if turnos_df is not None and not turnos_df.empty:
+        turnos_df = turnos_df[turnos_df["Fecha"] == date_obj]
+    return _slots_dia(date_obj, dur_min, grilla_dia(date_obj, turnos_df), slot_step_min, pedidos)
+
+def horario_libre(date_obj: date, inicio_min: int, dur_min: int, turnos_dia: pd.DataFrame | None = None,
+                  pedidos=None) -> bool:
+    """Mismas reglas que generar_slots (tramos + buffer) para un único inicio."""
+    return asignar_recursos(date_obj, inicio_min, dur_min, turnos_dia, pedidos) is not None
+
+def asignar_recursos(date_obj: date, inicio_min: int, dur_min: int, turnos_dia: pd.DataFrame | None = None,
+                     pedidos=None) -> list[str] | None:
+    """Recurso_ID asignados para un inicio puntual ([] con sillón único) o None si no hay lugar."""
+    rec = recursos()
+    inicios, asignados = asignaciones_dia(grilla_dia(date_obj, turnos_dia), dur_min, pedidos,
+                                          inicios=np.array([inicio_min]))
+    if not len(inicios):
+        return None
+    return [rec.ids[r] for r in asignados[0]] if rec.multi else []
+
+def filter_future_slots(date_obj: date, slots: list[datetime]) -> list[datetime]:
+    """Si la fecha es hoy, filtra slots que ya pasaron respecto al ahora del servidor."""
+    if not slots:
+        return []
+    now = datetime.now()
+    if date_obj == now.date():
+        return [s for s in slots if s > now]
+    return slots
+
+def disponibilidad_rango(desde: date, dias: int, dur_min: int, turnos_df: pd.DataFrame | None = None,
+                         max_slots: int = 6, slot_step_min: int | None = None,
+                         pedidos=None) -> tuple[list[datetime], dict[date, bool]]:
+    """
+    Disponibilidad de una ventana de `dias` a partir de `desde` en una sola pasada: sin
+    `turnos_df`, con las grillas cacheadas de la agenda guardada (grillas_rango); si no, filtra
+    esos turnos una vez y los agrupa por Fecha. Salta los días sin tramos.
+    Devuelve (primeros `max_slots` horarios libres, {fecha: hay_horarios}).
+    """
+    hasta = desde + timedelta(days=dias - 1)
+    if turnos_df is None:
+        grillas = grillas_rango(desde, hasta) if dur_min > 0 else {}
+    else:
+        por_fecha = {}
+        if not turnos_df.empty:
+            en_rango = turnos_df[(turnos_df["Fecha"] >= desde) & (turnos_df["Fecha"] <= hasta)]
+            por_fecha = {f: g for f, g in en_rango.groupby("Fecha")}
+        sin_turnos = turnos_df.iloc[0:0]
+    multi, hor = recursos().multi, horarios()
+
+    primeros, hay = [], {}
+    for k in range(dias):
+        d = desde + timedelta(days=k)
+        if dur_min <= 0 or not (multi or hor.tramos(d)):
+            hay[d] = False
+            continue
+        g = grillas[d] if turnos_df is None else armar_grilla(d, por_fecha.get(d, sin_turnos))
+        slots = filter_future_slots(d, _slots_dia(d, dur_min, g, slot_step_min, pedidos))
+        hay[d] = bool(slots)
+        if len(primeros) < max_slots:
+            primeros.extend(slots[:max_slots - len(primeros)])
+    return primeros, hay
+
+def _dia_mapa(g: Grilla, dur_min: int, slot_step_min: int | None, desde_min: int = -1, pedidos=None) -> tuple[int, int]:
+    """(minutos libres, horarios reservables) de un día desde `desde_min`; con varios recursos, minutos sumados entre todos."""
+    inicios = asignaciones_dia(g, dur_min, pedidos, slot_step_min)[0]
+    return g.minutos_libres(desde_min), int((inicios > desde_min).sum())
+
+@rendimiento.cronometrado("mapa_mes")
+def mapa_mes(anio: int, mes: int, dur_min: int, slot_step_min: int | None = None, pedidos=None) -> pd.DataFrame:
+    """
+    Disponibilidad de un mes entero: por día, minutos libres dentro de los tramos y
+    horarios reservables para `dur_min`, sobre las grillas del mes (grillas_rango, una lectura
+    de turnos para las que falten). Cacheado por (mes, duración, pedidos, versión de los turnos
+    del mes, de los recursos y de los horarios); los días pasados quedan en 0 y hoy solo cuenta lo que falta
+    del día. Con varios recursos, los minutos libres son la suma de todos.
+    Devuelve Fecha, Libres_min, Slots.
+    """
+    desde = date(anio, mes, 1)
+    hasta = (desde + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    pedidos = tuple(pedidos or ())
+    ck = ("mapa", anio, mes, dur_min, slot_step_min, pedidos)
+    st_ = get_storage()
+    key = (st_.version_rango("turnos", desde.isoformat(), hasta.isoformat()), st_.version("recursos"), st_.version("horarios"))
+    cache = _indices_cache()
+    hit = cache.get(ck)
+    if hit is None or hit[0] != key:
+        grillas = grillas_rango(desde, hasta)
+        filas = [(d, *_dia_mapa(g, dur_min, slot_step_min, pedidos=pedidos)) for d, g in grillas.items()]
+        mapas = [k for k in cache if isinstance(k, tuple) and k[0] == "mapa"]
+        if len(mapas) >= MAX_RANGOS_CACHE:
+            cache.pop(mapas[0], None)
+        hit = (key, filas)
+        cache[ck] = hit
+    # Lo que depende de la hora actual se resuelve fuera del cache
+    ahora = datetime.now()
+    filas = []
+    for d, libres, slots in hit[1]:
+        if d < ahora.date():
+            libres = slots = 0
+        elif d == ahora.date():
+            libres, slots = _dia_mapa(grilla_dia(d), dur_min, slot_step_min, ahora.hour * 60 + ahora.minute, pedidos)
+        filas.append((d, libres, slots))
+    return pd.DataFrame(filas, columns=["Fecha", "Libres_min", "Slots"])
+
+def reservar_turno(turno: dict, pedidos=None) -> tuple[bool, str]:
+    """
+    Alta de un turno nuevo con control de conflictos: toma el lock de la fecha,
+    vuelve a validar el horario contra la grilla del día (al día con lo guardado: se
+    compara la versión dentro del lock) y recién ahí escribe; la grilla cacheada se
+    actualiza con el turno nuevo sin rearmarse. Con varios recursos, les asigna los que pide el servicio (`pedidos`) en la columna Recursos.
+    Devuelve (True, Turno_ID) o (False, motivo) si el horario ya está tomado.
+    """
+    fecha = turno["Fecha"]
+    fecha_obj = date.fromisoformat(fecha)
+    inicio_min = hhmm_a_min(turno["Inicio"])
+    if inicio_min is None:
+        return False, "Horario inválido."
+    with get_storage().lock("turnos", fecha):
+        asignados = asignar_recursos(fecha_obj, inicio_min, int(turno["Duracion_total"]), pedidos=pedidos)
+        if asignados is None:
+            return False, "Ese horario se acaba de ocupar. Elegí otro, por favor."
+        if asignados:
+            turno = {**turno, "Recursos": ", ".join(asignados)}
+        insert_row("turnos", turno)
+    return True, turno["Turno_ID"]
+
+def slugify(text: str) -> str:
+    text = str(text or "").strip().lower()
+    text = re.sub(r"[^\w\s-]", "", text)
+    text = re.sub(r"[\s_-]+", "-", text)
+    return text[:60] if text else "cliente"
+
+def get_cliente_display_row(row) -> str:
+    """Devuelve 'Nombre – email' si hay email; si no, 'Nombre'; si no hay, el Cliente_ID."""
+    nombre = str(row.get("Nombre", "") or "").strip()
+    email = str(row.get("Email", "") or "").strip()
+    cid = str(row.get("Cliente_ID", "") or "").strip()
+    if nombre and email:
+        return f"{nombre} – {email}"
+    if nombre:
+        return nombre
+    return cid or "Sin nombre"
+
+@rendimiento.cronometrado("write_historia_cliente", filas=None)
+def write_historia_cliente(cliente_id: str, nombre: str, turno_row: pd.Series) -> dict:
+    """
+    Archiva un turno finalizado en la historia del cliente: un registro (los campos del
+    viejo TXT por turno) al final del archivo de historias y su offset en el índice
+    (historias.agregar), más la entrada del historial global. Devuelve el registro.
+    """
+    ahora = datetime.now().strftime("%Y-%m-%d %H:%M")
+    registro = {
+        "Fecha": ahora,
+        "Evento": "Turno finalizado",
+        "Turno_ID": turno_row["Turno_ID"],
+        "Cliente_ID": cliente_id,
+        "Nombre": nombre,
+        "Turno_Fecha": turno_row.get("Fecha", ""),
+        "Inicio": turno_row.get("Inicio", ""),
+        "Fin": turno_row.get("Fin", ""),
+        "Tipo": turno_row.get("Tipo", ""),
+        "Zonas": turno_row.get("Zonas", ""),
+        "Duracion_min": turno_row.get("Duracion_total", ""),
+        "Estado": turno_row.get("Estado", ""),
+        "Notas": turno_row.get("Notas", ""),
+    }
+    historias.agregar(HISTORIAS_DIR, [registro])
+
+    # Historial global (solo se agrega la fila al final)
+    insert_row("historial", {
+        "Cliente_ID": cliente_id,
+        "Nombre": nombre,
+        "Fecha": ahora,
+        "Evento": "Turno finalizado",
+        "Detalles": f"{turno_row.get('Tipo','')} | {turno_row.get('Zonas','')} | {turno_row.get('Fecha','')} {turno_row.get('Inicio','')}-{turno_row.get('Fin','')}"
+    })
+    return registro
+
+def _celda(v) -> str:
+    return "" if v is None or (not isinstance(v, (list, dict)) and pd.isna(v)) else str(v).strip()
+
+def _valor_editor(name: str, col: str, v) -> str:
+    """Normaliza un valor que viene del data_editor al formato guardado."""
+    v = _celda(v)
+    if name == "turnos" and col == "Fecha" and v:
+        f = pd.to_datetime(v, errors="coerce")
+        return "" if pd.isna(f) else f.date().isoformat()
+    if name == "turnos" and col in ("Inicio", "Fin"):
+        m = hhmm_a_min(v)
+        return v if m is None else min_a_hhmm(m)  # lo que no es una hora se rechaza al guardar
+    if name == "servicios" and col in ("Duracion_min", "Precio"):
+        return str(int(pd.to_numeric(v, errors="coerce") or 0)) if v else "0"
+    if name == "horarios" and col in ("Desde", "Hasta") and v:
+        f = pd.to_datetime(v, errors="coerce", dayfirst=not re.match(r"\d{4}-", v))
+        return v if pd.isna(f) else f.date().isoformat()  # lo que no se entiende queda en Horarios.errores
+    if name == "horarios" and col == "Tipo" and v:
+        return v.capitalize()
+    return v
+
+def aplicar_cambios_editor(name: str, original: pd.DataFrame, cambios: dict, leer_actuales) -> dict:
+    """
+    Aplica solo las filas editadas/agregadas/borradas que reporta un st.data_editor
+    (`cambios` = su estado en session_state) como escrituras en bloque por clave: un
+    update_rows, un delete_rows y un insert_rows, cada uno una pasada por archivo (o partición).
+    Antes de tocar una fila se compara con lo guardado ahora (`leer_actuales()`): si
+    cambió desde que se mostró el editor, no se pisa y se informa como conflicto.
+    Devuelve {"actualizados", "agregados", "borrados", "conflictos": [str]}.
+    """
+    claves = storage.CLAVES[name]
+    res = {"actualizados": 0, "agregados": 0, "borrados": 0, "conflictos": []}
+    edited = cambios.get("edited_rows", {}) or {}
+    added = cambios.get("added_rows", []) or []
+    deleted = cambios.get("deleted_rows", []) or []
+    if not (edited or added or deleted):
+        return res
+
+    def clave_de(fila) -> tuple:
+        return tuple(_celda(fila.get(k, "")) for k in claves)
+
+    def etiqueta(k: tuple) -> str:
+        return " / ".join(k)
+
+    with get_storage().lock(name):
+        actuales = {}
+        for fila in leer_actuales().to_dict("records"):
+            actuales.setdefault(clave_de(fila), fila)
+        # Las filas nuevas se comparan con toda la tabla: el editor de turnos solo lee su ventana
+        if name == "turnos":
+            existentes = {(tid,) for tid in indice_turnos()}
+        else:
+            existentes = {clave_de(fila) for fila in load_df(name).to_dict("records")}
+
+        def vigente(pos: int):
+            """Fila original si sigue igual en la base; si no, registra el conflicto."""
+            orig = original.iloc[int(pos)].to_dict()
+            k = clave_de(orig)
+            actual = actuales.get(k)
+            if actual is None:
+                res["conflictos"].append(f"{etiqueta(k)}: ya no existe (la borró otra sesión)")
+                return None, k
+            if any(_celda(actual.get(c, "")) != _celda(orig[c]) for c in original.columns):
+                res["conflictos"].append(f"{etiqueta(k)}: cambió mientras editabas, no se guardó")
+                return None, k
+            return orig, k
+
+        # Primero se junta lo que sigue vigente; después se escribe en bloque (una pasada por archivo)
+        rec = recursos() if name == "servicios" else None
+
+        def invalida(fila: dict) -> str | None:
+            """Motivo para no guardar una fila: Inicio/Fin de un turno que no son una hora, o Recursos
+            de un servicio que no coinciden con ningún recurso."""
+            if name == "turnos":
+                malas = [c for c in ("Inicio", "Fin") if c in fila and hhmm_a_min(fila[c]) is None]
+                return f"{'/'.join(malas)} no es una hora (HH:MM)" if malas else None
+            if rec is None or not rec.multi or not fila.get("Recursos"):
+                return None
+            malos = rec.desconocidos(fila["Recursos"].split(","))
+            return f"Recursos sin ningún recurso que coincida ({', '.join(malos)})" if malos else None
+
+        ediciones, borrados, altas = [], [], []
+        for pos, valores in edited.items():
+            orig, k = vigente(pos)
+            if orig is None:
+                continue
+            values = {c: _valor_editor(name, c, v) for c, v in valores.items()}
+            motivo = invalida(values)
+            if motivo:
+                res["conflictos"].append(f"{etiqueta(k)}: {motivo}, no se guardó")
+                continue
+            ediciones.append((orig, k, values))
+        for pos in deleted:
+            orig, k = vigente(pos)
+            if orig is not None:
+                borrados.append((orig, k))
+        for nueva in added:
+            row = {c: _valor_editor(name, c, nueva.get(c)) for c in original.columns}
+            if name in ("turnos", "horarios") and not row.get(claves[0]):
+                row[claves[0]] = str(uuid.uuid4())[:8]
+            if name == "clientes" and not row.get("Cliente_ID"):
+                row["Cliente_ID"] = row.get("WhatsApp", "")
+            k = clave_de(row)
+            if not all(k):
+                res["conflictos"].append("Fila nueva sin clave completa, no se guardó")
+                continue
+            if k in actuales or k in existentes:
+                res["conflictos"].append(f"{etiqueta(k)}: ya existe, no se agregó")
+                continue
+            motivo = invalida(row)
+            if motivo:
+                res["conflictos"].append(f"{etiqueta(k)}: {motivo}, no se agregó")
+                continue
+            altas.append(row)
+            existentes.add(k)
+
+        def fecha_de(orig) -> str | None:
+            return _celda(orig.get("Fecha")) if name == "turnos" else None
+
+        if len(claves) == 1:
+            clave = claves[0]
+            # Las que cambian la clave misma no se pueden ubicar por clave en bloque: de a una
+            ediciones_bloque = []
+            for orig, k, values in ediciones:
+                if values.get(clave, k[0]) != k[0]:
+                    update_row(name, {clave: k[0]}, values, fecha=fecha_de(orig))
+                else:
+                    ediciones_bloque.append((orig, k, values))
+            if ediciones_bloque:
+                cols = list(dict.fromkeys(c for _, _, values in ediciones_bloque for c in values if c != clave))
+                filas = [{**{c: _celda(orig.get(c, "")) for c in cols}, **values, clave: k[0]}
+                         for orig, k, values in ediciones_bloque]
+                update_rows(name, clave, pd.DataFrame(filas, columns=[clave, *cols]).fillna(""),
+                            fechas=[fecha_de(o) for o, _, _ in ediciones_bloque] if name == "turnos" else None)
+            if borrados:
+                delete_rows(name, clave, [k[0] for _, k in borrados],
+                            fechas=[fecha_de(o) for o, _ in borrados] if name == "turnos" else None)
+        else:  # clave compuesta (servicios: Tipo + Zona, una tabla chica): fila por fila
+            for orig, k, values in ediciones:
+                update_row(name, dict(zip(claves, k)), values)
+            for orig, k in borrados:
+                delete_row(name, dict(zip(claves, k)))
+        if altas:
+            insert_rows(name, pd.DataFrame(altas).reindex(columns=original.columns).fillna(""))
+        res["actualizados"], res["borrados"], res["agregados"] = len(ediciones), len(borrados), len(altas)
+    return res
+
+def leer_historial(pagina: int, por_pagina: int = HIST_POR_PAGINA) -> tuple[pd.DataFrame, bool]:
+    """
+    Página del historial global, la más nueva primero. Como el historial se escribe
+    solo agregando al final, se lee desde el final sin ordenar todo. Devuelve (filas, hay_mas).
+    """
+    ensure_files()
+    df = get_storage().read_tail("historial", pagina * por_pagina, por_pagina + 1)
+    return df.head(por_pagina), len(df) > por_pagina
+
+def compactar_historiales() -> tuple[int, int]:
+    """
+    Compactación periódica: ordena cronológicamente el historial global y los archivos de
+    historias y quita registros duplicados. Devuelve (duplicados globales, registros quitados de las historias).
+    """
+    quitadas = get_storage().compact("historial", "Fecha")
+    _df_cache().pop("historial", None)
+    return quitadas, historias.compactar(HISTORIAS_DIR)
+
+@rendimiento.cronometrado("historia_cliente")
+def historia_cliente(cliente_id: str) -> pd.DataFrame:
+    """
+    Historia de un cliente (historias.COLS_REGISTRO, del más viejo al más nuevo), leída con
+    los offsets del índice: el costo depende de los registros del cliente, no del total.
+    """
+    return historias.historia(HISTORIAS_DIR, cliente_id)
+
+def reindexar_historias() -> tuple[int, int]:
+    """
+    Empaqueta las carpetas por cliente del formato anterior que queden (historias.migrar) y
+    rehace el índice desde los archivos. Devuelve (carpetas empaquetadas, registros indexados).
+    """
+    carpetas, _ = historias.migrar(HISTORIAS_DIR)
+    return carpetas, historias.reindexar(HISTORIAS_DIR)
+
+# =========================
+# AUDITORÍA DE AGENDA
+# =========================
+def minutos_serie(s: pd.Series) -> pd.Series:
+    """hhmm_a_min vectorizado: mismo formato (RE_HORA) -> minutos (NaN si no parsea)."""
+    s = s.astype(str).str.strip()
+    # Camino rápido para el formato guardado 'HH:MM'; el resto (pocas filas) de a uno con hhmm_a_min
+    canon = s.str.len().eq(5) & s.str.slice(2, 3).eq(":")
+    try:
+        d = np.frombuffer(s.where(canon, "99:99").to_numpy(dtype="S5").tobytes(), dtype=np.uint8).reshape(-1, 5) - 48
+    except UnicodeEncodeError:
+        canon[:] = False
+        d = np.full((len(s), 5), 9, dtype=np.uint8)
+    canon &= pd.Series((d[:, [0, 1, 3, 4]] <= 9).all(axis=1), index=s.index)
+    hh = pd.Series(d[:, 0] * 10.0 + d[:, 1], index=s.index).where(canon)
+    mm = pd.Series(d[:, 3] * 10.0 + d[:, 4], index=s.index).where(canon)
+    out = (hh * 60 + mm).where((hh < 24) & (mm < 60))
+    if not canon.all():
+        out[~canon] = s[~canon].map(hhmm_a_min).astype(float)
+    return out
+
+def hhmm_serie(minutos: pd.Series) -> pd.Series:
+    m = minutos.fillna(0).astype(int)
+    return (m // 60).astype(str).str.zfill(2) + ":" + (m % 60).astype(str).str.zfill(2)
+
+def superposiciones(turnos: pd.DataFrame, buffer_min: int = BUFFER_MIN_DEFAULT) -> pd.DataFrame:
+    """
+    Barrido por fecha (y por recurso si viene _rec) sobre turnos con columnas Fecha, ini, fin (minutos) y Turno_ID, en
+    O(n log n): ordenados por inicio, un turno choca si empieza antes de que termine (más
+    el buffer) el que más tarde termina de los anteriores de su día, que es el que se informa.
+    Con columna _buffer, el buffer de cada turno (el de su fecha) en lugar de `buffer_min`.
+    Devuelve, indexado como `turnos`, una fila por turno que choca: previo (índice),
+    Turno_ID_previo y fin_previo.
+    """
+    if turnos.empty:
+        return pd.DataFrame(columns=["previo", "Turno_ID_previo", "fin_previo"])
+    # Fechas a códigos enteros una sola vez: ordenar y agrupar por enteros es mucho más barato
+    dia = pd.factorize(turnos["Fecha"])[0]
+    if "_rec" in turnos.columns:  # un barrido por día y recurso (ver por_recurso)
+        dia = dia * (int(turnos["_rec"].max()) + 1) + turnos["_rec"].to_numpy()
+    t = turnos[["ini", "fin", "_buffer"] if "_buffer" in turnos.columns else ["ini", "fin"]].assign(_dia=dia)
+    t = t.sort_values(["_dia", "ini", "fin"], kind="stable")
+    dia = t["_dia"]
+    fin_max = t.groupby(dia, sort=False)["fin"].cummax()
+    es_max = t["fin"].eq(fin_max)
+    fin_previo = fin_max.groupby(dia, sort=False).shift()
+    previo = pd.Series(t.index, index=t.index).where(es_max).groupby(dia, sort=False).ffill().groupby(dia, sort=False).shift()
+    choca = fin_previo.notna() & (t["ini"] < fin_previo + (t["_buffer"] if "_buffer" in t.columns else buffer_min))
+    previo = previo[choca].astype(t.index.dtype)
+    return pd.DataFrame({"previo": previo, "Turno_ID_previo": turnos.loc[previo, "Turno_ID"].to_numpy(),
+                         "fin_previo": fin_previo[choca]})
+
+def por_recurso(turnos: pd.DataFrame) -> pd.DataFrame:
+    """
+    Una fila por turno y recurso que ocupa (_rec, índice en recursos()) con la etiqueta
+    original del turno en _orig. Sin recursos cargados no abre nada (_rec = 0).
+    """
+    rec = recursos()
+    out = turnos.assign(_orig=turnos.index)
+    if not rec.multi:
+        return out.assign(_rec=0).reset_index(drop=True)
+    asignados = turnos["Recursos"] if "Recursos" in turnos.columns else pd.Series("", index=turnos.index)
+    out["_rec"] = [list(rec.de_turno(x)) for x in asignados]
+    return out.explode("_rec").astype({"_rec": int}).reset_index(drop=True)
+
+def superposiciones_recursos(turnos: pd.DataFrame, buffer_min: int = BUFFER_MIN_DEFAULT) -> pd.DataFrame:
+    """superposiciones() por recurso (columna Recursos de cada turno); con sillón único es la misma."""
+    if turnos.empty or not recursos().multi:
+        return superposiciones(turnos, buffer_min)
+    ex = por_recurso(turnos)
+    choques = superposiciones(ex, buffer_min)
+    orig = ex["_orig"]
+    choques = choques.assign(previo=orig[choques["previo"]].to_numpy()).set_axis(orig[choques.index].to_numpy())
+    return choques[~choques.index.duplicated()]
+
+@rendimiento.cronometrado("auditar_agenda")
+def auditar_agenda(turnos: pd.DataFrame | None = None, buffer_min: int | None = None) -> pd.DataFrame:
+    """
+    Revisa los turnos activos (toda la tabla por defecto): superposiciones, turnos a menos de
+    `buffer_min` (por defecto, el buffer de los horarios de cada fecha) del anterior (en el mismo recurso si hay varios), Fin distinto de Inicio + Duracion_total y horarios que no parsean.
+    Devuelve una fila por problema (Fecha, Inicio, Fin, Turno_ID, Cliente_ID, Problema, Con, Detalle).
+    """
+    cols = ["Fecha", "Inicio", "Fin", "Turno_ID", "Cliente_ID", "Problema", "Con", "Detalle"]
+    t = load_df("turnos") if turnos is None else turnos
+    t = t[~t["Estado"].isin(ESTADOS_LIBERAN)]
+    if t.empty:
+        return pd.DataFrame(columns=cols)
+    ini, fin = minutos_serie(t["Inicio"]), minutos_serie(t["Fin"])
+    try:
+        dur = t["Duracion_total"].astype(float)
+    except ValueError:
+        dur = pd.to_numeric(t["Duracion_total"], errors="coerce")
+    problemas = []
+
+    invalidos = ini.isna() | fin.isna() | t["Fecha"].isna()
+    problemas.append(t[invalidos].assign(Problema="Horario inválido", Con="", Detalle="Fecha, Inicio o Fin no se pueden leer"))
+
+    distinto = ~invalidos & dur.notna() & (ini + dur != fin)
+    problemas.append(t[distinto].assign(
+        Problema="Fin no coincide", Con="",
+        Detalle="Inicio + " + dur[distinto].astype(int).astype(str) + " min = " + hhmm_serie(ini[distinto] + dur[distinto]),
+    ))
+
+    validos = t[~invalidos]
+    choques = superposiciones_recursos(pd.DataFrame({
+        "Fecha": validos["Fecha"], "ini": ini[~invalidos], "fin": fin[~invalidos],
+        "Turno_ID": validos["Turno_ID"], "Recursos": validos.get("Recursos", ""),
+        "_buffer": buffers_por_fecha(validos["Fecha"]) if buffer_min is None else buffer_min,
+    }))
+    if not choques.empty:
+        pisados = (choques["fin_previo"] - ini[choques.index]).astype(int)
+        pisa = pisados > 0
+        problemas.append(t.loc[choques.index].assign(
+            Problema=pisa.map({True: "Superposición", False: "Buffer"}),
+            Con=choques["Turno_ID_previo"],
+            Detalle=pisa.map({True: "se pisan ", False: "separados por "})
+                    + pisados.abs().astype(str) + " min",
+        ))
+
+    out = pd.concat([p for p in problemas if not p.empty] or [pd.DataFrame(columns=cols)], ignore_index=True)
+    return out.reindex(columns=cols).sort_values(["Fecha", "Inicio"], kind="stable").reset_index(drop=True)
+
+# =========================
+# ANALÍTICA (agregados materializados, ver analitica.py)
+# =========================
+# Columnas de turnos que mueven los agregados: cambiar solo Notas o RecordatorioEnviado no los toca
+COLS_ANALITICA = {"Fecha", "Tipo", "Zonas", "Duracion_total", "Estado", "Cliente_ID"}
+
+def _turnos_donde(fechas=None, where: dict | None = None) -> pd.DataFrame:
+    """Turnos actuales de esas fechas (o de toda la tabla) que coinciden con `where`."""
+    dias = [d for d in (pd.to_datetime(pd.Series(list(fechas or []), dtype=str), errors="coerce")) if not pd.isna(d)]
+    df = load_turnos(min(dias).date(), max(dias).date()) if dias else load_df("turnos")
+    for k, v in (where or {}).items():
+        df = df[df[k].astype(str) == str(v)]
+    return df
+
+def _actualizar_analitica(quitar: pd.DataFrame | None, agregar: pd.DataFrame | None):
+    """Suma a los agregados la diferencia de una escritura de turnos (si están al día con el catálogo)."""
+    analitica.aplicar(DATA_DIR, quitar, agregar, catalogo().servicios)
+
+def reconstruir_analitica() -> int:
+    """Rehace los agregados desde todos los turnos (tabla viva + archivo). Devuelve cuántos leyó."""
+    turnos = pd.concat([load_df("turnos"), archivo.leer_archivo(DATA_DIR)], ignore_index=True)
+    return analitica.reconstruir(DATA_DIR, turnos, catalogo().servicios)
+
+@rendimiento.cronometrado("tablero_analitica")
+def tablero_analitica(desde: date, hasta: date) -> dict:
+    """
+    Números del tablero entre `desde` y `hasta` leyendo solo los agregados (si faltan o
+    cambió el catálogo, se reconstruyen una vez). Devuelve {"dias", "clientes", "meta"}:
+    agregados por día × Tipo × Zona × Estado y por Cliente_ID × Estado.
+    """
+    meta = analitica.leer_meta(DATA_DIR)
+    if meta is None or meta.get("firma") != analitica.firma(catalogo().servicios):
+        reconstruir_analitica()
+        meta = analitica.leer_meta(DATA_DIR)
+    dias, clientes = analitica.leer(DATA_DIR, desde, hasta)
+    return {"dias": dias, "clientes": clientes, "meta": meta}
+
+def minutos_disponibles(desde: date, hasta: date) -> pd.Series:
+    """Minutos de atención por día de la semana (1 = lunes) entre `desde` y `hasta`, según los horarios de cada fecha."""
+    hor = horarios()
+    fechas = pd.date_range(desde, hasta)
+    minutos = [sum(b - a for a, b in hor.tramos(f.date())) for f in fechas]
+    return pd.Series(minutos, dtype=int).groupby(fechas.dayofweek + 1).sum().reindex(range(1, 8), fill_value=0)
+
+# =========================
+# API (app, jobs, benchmarks)
+# =========================
+def buscar_cliente(cliente_id: str) -> dict | None:
+    return indice_clientes().get(str(cliente_id))
+
+def buscar_turno(turno_id: str) -> dict | None:
+    return indice_turnos().get(str(turno_id))
+
+def disponibilidad(fecha: date, dur_min: int, pedidos=None) -> list[datetime]:
+    """Horarios libres de un día para una duración (sin los que ya pasaron si es hoy)."""
+    return filter_future_slots(fecha, generar_slots(fecha, dur_min, pedidos=pedidos))
+
+def proximos_horarios(dur_min: int, desde: date | None = None, dias: int = DIAS_BUSQUEDA,
+                      max_slots: int = 6, pedidos=None) -> tuple[list[datetime], dict[date, bool]]:
+    """Primeros horarios libres desde `desde` y qué días de la ventana tienen lugar."""
+    return disponibilidad_rango(desde or date.today(), dias, dur_min, None, max_slots, pedidos=pedidos)
+
+def registrar_cliente(cliente_id: str, nombre: str, email: str = "", actualizar: bool = True) -> bool:
+    """
+    Alta del cliente (el WhatsApp es el Cliente_ID). Si ya existe y `actualizar`, se
+    pisan nombre y email con los valores no vacíos. Devuelve True si era nuevo.
+    """
+    cliente_id, nombre, email = str(cliente_id).strip(), str(nombre or "").strip(), str(email or "").strip()
+    if cliente_id not in indice_clientes():
+        insert_row("clientes", {
+            "Cliente_ID": cliente_id,
+            "Nombre": nombre,
+            "WhatsApp": cliente_id,
+            "Email": email,
+            "Notas": ""
+        })
+        return True
+    if actualizar:
+        cambios = {}
+        if nombre:
+            cambios["Nombre"] = nombre
+        if email:
+            cambios["Email"] = email
+        update_row("clientes", {"Cliente_ID": cliente_id}, cambios)
+    return False
+
+def _agregar_nota(previa, nota: str) -> str:
+    previa = str(previa or "")
+    return (previa + " | " if previa else "") + nota
+
+def reservar(fecha: date, inicio: str, tipo: str, zonas: list[str], cliente_id: str, nombre: str = "",
+             email: str = "", notas: str = "", duracion: int | None = None) -> tuple[bool, str]:
+    """
+    Reserva completa: arma el turno (duración del catálogo salvo que se indique), lo
+    confirma con control de conflictos y da de alta / actualiza al cliente.
+    Devuelve (True, Turno_ID) o (False, motivo).
+    """
+    cat = catalogo()
+    dur = duracion if duracion is not None else cat.cotizar(tipo, zonas)[0]
+    if dur <= 0:
+        return False, "El servicio no tiene duración (revisá tipo y zonas)."
+    inicio_min = hhmm_a_min(inicio)
+    if inicio_min is None:
+        return False, "Horario inválido."
+    fin_min = inicio_min + dur
+    ok, res = reservar_turno({
+        "Turno_ID": str(uuid.uuid4())[:8],
+        "Cliente_ID": str(cliente_id).strip(),
+        "Fecha": fecha.isoformat(),
+        "Inicio": min_a_hhmm(inicio_min),
+        "Fin": min_a_hhmm(fin_min),
+        "Tipo": tipo,
+        "Zonas": humanize_list(zonas),
+        "Duracion_total": str(dur),
+        "Estado": "Confirmado",
+        "Notas": notas.strip(),
+        "RecordatorioEnviado": "",
+        "Recursos": ""
+    }, cat.requisitos(tipo, zonas))
+    if ok:
+        registrar_cliente(cliente_id, nombre, email)
+    return ok, res
+
+def cancelar(turno_id: str, motivo: str = "") -> bool:
+    """Marca el turno como Cancelado (libera el horario). False si no existe."""
+    turno = buscar_turno(turno_id)
+    if turno is None:
+        return False
+    cambios = {"Estado": "Cancelado"}
+    if motivo.strip():
+        cambios["Notas"] = _agregar_nota(turno["Notas"], motivo.strip())
+    return update_row("turnos", {"Turno_ID": str(turno_id)}, cambios, fecha=str(turno["Fecha"])) > 0
+
+def finalizar(turno_id: str, cliente_id: str | None = None, nombre: str = "", email: str = "",
+              notas: str = "") -> dict | None:
+    """
+    Marca el turno como Realizado (opcionalmente reasignándolo a `cliente_id`, que se da
+    de alta si no existe) y lo archiva en la historia del cliente y el historial global.
+    Devuelve el registro archivado, o None si el turno no existe.
+    """
+    turno = buscar_turno(turno_id)
+    if turno is None:
+        return None
+    cliente_id = str(cliente_id or "").strip()
+    if cliente_id:
+        registrar_cliente(cliente_id, nombre, email, actualizar=False)
+    cambios = {
+        "Cliente_ID": cliente_id or turno["Cliente_ID"],
+        "Estado": "Realizado",
+    }
+    if notas.strip():
+        cambios["Notas"] = _agregar_nota(turno["Notas"], notas.strip())
+    update_row("turnos", {"Turno_ID": str(turno_id)}, cambios, fecha=str(turno["Fecha"]))
+
+    row_turno = pd.Series({**turno, **cambios})
+    cli = buscar_cliente(row_turno["Cliente_ID"])
+    return write_historia_cliente(
+        cliente_id=str(row_turno["Cliente_ID"]),
+        nombre=nombre.strip() or (cli["Nombre"] if cli else ""),
+        turno_row=row_turno
+    )
+
+# =========================
+# CLI
+# =========================
+def _pedidos_args(args) -> tuple[str, ...] | None:
+    return catalogo().requisitos(args.tipo, args.zonas) if args.tipo else None
+
+def _duracion_args(parser, args) -> int:
+    if args.duracion:
+        return args.duracion
+    if not args.tipo or not args.zonas:
+        parser.exit(2, "Indicá --duracion o --tipo y --zonas\n")
+    cat = catalogo()
+    desconocidas = [z for z in args.zonas if (args.tipo, z) not in cat.servicios]
+    dur = cat.cotizar(args.tipo, args.zonas)[0]
+    if desconocidas or dur <= 0:
+        parser.exit(1, f"Servicio o zona desconocidos en el catálogo: {args.tipo} / {', '.join(desconocidas or args.zonas)}\n")
+    return dur
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Turnos Estética sin la app web: consultas y operaciones")
+    parser.add_argument("--data", default=None, help="Carpeta de datos (por defecto data/ o ESTETICA_DATA_DIR)")
+    parser.add_argument("--storage", default=None, help="csv o sqlite (por defecto ESTETICA_STORAGE o csv)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    def servicio(p):
+        p.add_argument("--duracion", type=int, default=None, help="Minutos (si no, se calcula del catálogo)")
+        p.add_argument("--tipo", default=None, help="Tipo de servicio (Láser, Descartable...)")
+        p.add_argument("--zonas", nargs="+", default=[], help="Zonas del servicio")
+
+    p_disp = sub.add_parser("disponibilidad", help="Horarios libres de un día")
+    p_disp.add_argument("--fecha", required=True, help="AAAA-MM-DD")
+    servicio(p_disp)
+    p_prox = sub.add_parser("proximos", help="Primeros horarios libres desde hoy")
+    servicio(p_prox)
+    p_prox.add_argument("--dias", type=int, default=DIAS_BUSQUEDA, help="Días a revisar")
+    p_prox.add_argument("--max", type=int, default=6, help="Cantidad de horarios")
+    p_res = sub.add_parser("reservar", help="Reserva un turno")
+    p_res.add_argument("--fecha", required=True, help="AAAA-MM-DD")
+    p_res.add_argument("--inicio", required=True, help="HH:MM")
+    p_res.add_argument("--tipo", required=True)
+    p_res.add_argument("--zonas", nargs="+", required=True)
+    p_res.add_argument("--cliente", required=True, help="WhatsApp del cliente (Cliente_ID)")
+    p_res.add_argument("--nombre", default="")
+    p_res.add_argument("--email", default="")
+    p_res.add_argument("--notas", default="")
+    p_can = sub.add_parser("cancelar", help="Cancela un turno")
+    p_can.add_argument("turno_id")
+    p_can.add_argument("--motivo", default="")
+    p_fin = sub.add_parser("finalizar", help="Marca un turno como Realizado y lo archiva en la historia del cliente")
+    p_fin.add_argument("turno_id")
+    p_fin.add_argument("--notas", default="")
+    sub.add_parser("auditar", help="Superposiciones, buffer y Fin inconsistente en toda la agenda")
+    p_hor = sub.add_parser("horarios", help="Horarios de atención que rigen cada día (reglas ya aplicadas)")
+    p_hor.add_argument("--desde", default=None, help="AAAA-MM-DD (por defecto hoy)")
+    p_hor.add_argument("--dias", type=int, default=14, help="Días a mostrar")
+    p_cli = sub.add_parser("cliente", help="Datos de un cliente")
+    p_cli.add_argument("cliente_id")
+    args = parser.parse_args(argv)
+
+    if args.data or args.storage:
+        configurar(Path(args.data) if args.data else None, args.storage)
+
+    if args.cmd == "disponibilidad":
+        fecha = date.fromisoformat(args.fecha)
+        slots = disponibilidad(fecha, _duracion_args(parser, args), _pedidos_args(args))
+        print(" ".join(s.strftime("%H:%M") for s in slots) if slots else "Sin horarios libres.")
+    elif args.cmd == "proximos":
+        primeros, _ = proximos_horarios(_duracion_args(parser, args), dias=args.dias, max_slots=args.max,
+                                        pedidos=_pedidos_args(args))
+        for s in primeros:
+            print(s.strftime("%Y-%m-%d %H:%M"))
+        if not primeros:
+            print("Sin horarios libres en la ventana.")
+    elif args.cmd == "reservar":
+        ok, res = reservar(date.fromisoformat(args.fecha), args.inicio, args.tipo, args.zonas,
+                           args.cliente, args.nombre, args.email, args.notas)
+        if not ok:
+            parser.exit(1, f"{res}\n")
+        print(f"Turno reservado: {res}")
+    elif args.cmd == "cancelar":
+        if not cancelar(args.turno_id, args.motivo):
+            parser.exit(1, f"No existe el turno {args.turno_id}\n")
+        print(f"Turno {args.turno_id} cancelado")
+    elif args.cmd == "finalizar":
+        registro = finalizar(args.turno_id, notas=args.notas)
+        if registro is None:
+            parser.exit(1, f"No existe el turno {args.turno_id}\n")
+        print(f"Turno {args.turno_id} finalizado y archivado en la historia de {registro['Cliente_ID']}")
+    elif args.cmd == "auditar":
+        problemas = auditar_agenda()
+        if problemas.empty:
+            print("Agenda sin problemas.")
+        else:
+            print(problemas.to_string(index=False))
+            parser.exit(1, f"{len(problemas)} problemas\n")
+    elif args.cmd == "horarios":
+        hor = horarios()
+        desde = date.fromisoformat(args.desde) if args.desde else date.today()
+        print(hor.rango(desde, desde + timedelta(days=args.dias - 1)).to_string(index=False))
+        for rid, error in hor.errores.items():
+            print(f"Regla {rid} ignorada: {error}")
+    elif args.cmd == "cliente":
+        cli = buscar_cliente(args.cliente_id)
+        if cli is None:
+            parser.exit(1, f"No existe el cliente {args.cliente_id}\n")
+        for k, v in cli.items():
+            if not k.startswith("_"):
+                print(f"{k}: {v}")
+
+
+if __name__ == "__main__":
+    main()
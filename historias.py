@@ -0,0 +1,324 @@
+# ==========================================================
+# Historias por cliente empaquetadas (JSONL de solo agregado + índice de offsets)
+# - historias/historias_AAAA.jsonl: un registro por evento (turno finalizado) de todos los
+#   clientes, con los campos del viejo TXT por turno; un archivo por año del evento. No hay
+#   un archivo por cliente: con miles de clientes volverían los miles de archivos chicos; la
+#   historia de cada uno sale del índice
+# - historias/indice.csv: Cliente_ID, Turno_ID, Anio, Offset, Largo de cada registro; la
+#   historia de un cliente (o un turno) se lee con seeks, sin recorrer los archivos
+# - texto() arma a pedido la vista TXT de siempre de un registro
+# - migrar() empaqueta las carpetas viejas (<cliente>_<slug>/historial.csv + un TXT por turno)
+# - Uso por consola: python historias.py migrar | reindexar | compactar | ver CLIENTE [--turno ID]
+# ==========================================================
+import argparse
+import csv
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+import storage
+
+COLS_REGISTRO = ["Fecha", "Evento", "Turno_ID", "Cliente_ID", "Nombre", "Turno_Fecha", "Inicio", "Fin",
+                 "Tipo", "Zonas", "Duracion_min", "Estado", "Notas"]
+COLS_INDICE = ["Cliente_ID", "Turno_ID", "Anio", "Offset", "Largo"]
+
+# Renglones del TXT por turno (etiqueta, campo del registro); "Horario" es Inicio - Fin
+RENGLONES_TXT = [
+    ("Fecha archivo", "Fecha"), ("Turno_ID", "Turno_ID"), ("Cliente_ID", "Cliente_ID"), ("Nombre", "Nombre"),
+    ("Turno Fecha", "Turno_Fecha"), ("Horario", "Horario"), ("Tipo", "Tipo"), ("Zonas", "Zonas"),
+    ("Duración (min)", "Duracion_min"), ("Estado", "Estado"), ("Notas", "Notas"),
+]
+
+_cache: dict = {}  # índice -> (mtime + tamaño, DataFrame, posiciones por Cliente_ID)
+
+
+def _lock(carpeta: Path) -> storage.FileLock:
+    return storage.FileLock(Path(carpeta) / ".historias.lock")
+
+
+def _path_anio(carpeta: Path, anio: str) -> Path:
+    return Path(carpeta) / f"historias_{anio}.jsonl"
+
+
+def _indice_path(carpeta: Path) -> Path:
+    return Path(carpeta) / "indice.csv"
+
+
+def _anios(carpeta: Path) -> list[str]:
+    return sorted(p.stem.split("_", 1)[1] for p in Path(carpeta).glob("historias_*.jsonl"))
+
+
+def _anio(registro: dict) -> str:
+    anio = str(registro.get("Fecha", ""))[:4]
+    return anio if anio.isdigit() else str(datetime.now().year)
+
+
+def _linea(registro: dict) -> bytes:
+    limpio = {c: "" if registro.get(c) is None else str(registro.get(c)) for c in COLS_REGISTRO}
+    return json.dumps(limpio, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def _agregar_indice(carpeta: Path, filas: list[tuple]):
+    path = _indice_path(carpeta)
+    nuevo = not path.exists()
+    if not nuevo and storage._falta_salto(path):
+        with open(path, "a", encoding="utf-8", newline="") as f:
+            f.write("\n")
+    with open(path, "a", encoding="utf-8", newline="") as f:
+        w = csv.writer(f, lineterminator="\n")
+        if nuevo:
+            w.writerow(COLS_INDICE)
+        w.writerows(filas)
+
+
+def agregar(carpeta: Path, registros: list[dict]) -> int:
+    """
+    Agrega registros (COLS_REGISTRO) al final del archivo de su año y sus offsets al índice,
+    bajo un lock: solo se escribe al final, nunca se reescribe nada. Devuelve cuántos agregó.
+    """
+    if not registros:
+        return 0
+    carpeta = Path(carpeta)
+    carpeta.mkdir(parents=True, exist_ok=True)
+    por_anio: dict[str, list[dict]] = {}
+    for r in registros:
+        por_anio.setdefault(_anio(r), []).append(r)
+    with _lock(carpeta):
+        filas = []
+        for anio, regs in por_anio.items():
+            path = _path_anio(carpeta, anio)
+            if path.exists() and storage._falta_salto(path):  # quedó un renglón a medias: se aísla
+                with open(path, "ab") as f:
+                    f.write(b"\n")
+            with open(path, "ab") as f:
+                offset = f.tell()
+                for r in regs:
+                    datos = _linea(r)
+                    f.write(datos)
+                    filas.append((str(r.get("Cliente_ID", "")), str(r.get("Turno_ID", "")), anio, offset, len(datos)))
+                    offset += len(datos)
+        _agregar_indice(carpeta, filas)
+    return len(registros)
+
+
+def _indice(carpeta: Path) -> tuple[pd.DataFrame, dict]:
+    """Índice parseado de nuevo solo si cambió (mtime + tamaño), con las posiciones por Cliente_ID."""
+    path = _indice_path(carpeta)
+    llave = storage._stat_key(path)
+    hit = _cache.get(path)
+    if hit is not None and hit[0] == llave:
+        return hit[1], hit[2]
+    if path.exists():
+        df = pd.read_csv(path, dtype={"Cliente_ID": str, "Turno_ID": str, "Anio": str}, keep_default_na=False)
+    else:
+        df = pd.DataFrame(columns=COLS_INDICE)
+    grupos = df.groupby("Cliente_ID", sort=False).indices if not df.empty else {}
+    _cache[path] = (llave, df, grupos)
+    return df, grupos
+
+
+def _leer(carpeta: Path, entradas: pd.DataFrame) -> list[dict]:
+    """Registros de esas entradas del índice: un open por año y un seek por registro, en orden de archivo."""
+    out = []
+    for anio, grupo in entradas.groupby("Anio", sort=True):
+        with open(_path_anio(carpeta, anio), "rb") as f:
+            for offset, largo in sorted(zip(grupo["Offset"].astype(int), grupo["Largo"].astype(int))):
+                f.seek(offset)
+                out.append(json.loads(f.read(largo)))
+    return out
+
+
+def historia(carpeta: Path, cliente_id: str) -> pd.DataFrame:
+    """Todos los registros de un cliente (COLS_REGISTRO), del más viejo al más nuevo."""
+    df, grupos = _indice(carpeta)
+    pos = grupos.get(str(cliente_id))
+    if pos is None:
+        return pd.DataFrame(columns=COLS_REGISTRO)
+    # Fecha es 'AAAA-MM-DD HH:MM': el orden de texto es el cronológico (y sorted es estable)
+    return pd.DataFrame(sorted(_leer(carpeta, df.iloc[pos]), key=lambda r: r["Fecha"]), columns=COLS_REGISTRO)
+
+
+def registro(carpeta: Path, turno_id: str) -> dict | None:
+    """Último registro de un turno, o None."""
+    df, _ = _indice(carpeta)
+    entradas = df[df["Turno_ID"] == str(turno_id)]
+    return _leer(carpeta, entradas.tail(1))[0] if not entradas.empty else None
+
+
+def texto(registro: dict) -> str:
+    """Vista TXT de un registro, igual al archivo que se guardaba por turno."""
+    renglones = []
+    for etiqueta, campo in RENGLONES_TXT:
+        valor = f"{registro.get('Inicio', '')} - {registro.get('Fin', '')}" if campo == "Horario" else registro.get(campo, "")
+        renglones.append(f"{etiqueta}: {valor}")
+    return "\n".join(renglones)
+
+
+def nombre_txt(registro: dict) -> str:
+    """Nombre que tenía el TXT del registro: <AAAAMMDD_HHMM>_<Turno_ID>.txt."""
+    fecha = pd.to_datetime(registro.get("Fecha", ""), errors="coerce")
+    ts = fecha.strftime("%Y%m%d_%H%M") if not pd.isna(fecha) else "sin-fecha"
+    return f"{ts}_{registro.get('Turno_ID', '')}.txt"
+
+
+def reindexar(carpeta: Path) -> int:
+    """Rehace el índice recorriendo los archivos una vez (los renglones rotos se saltean). Devuelve registros."""
+    carpeta = Path(carpeta)
+    with _lock(carpeta):
+        filas = []
+        for anio in _anios(carpeta):
+            offset = 0
+            with open(_path_anio(carpeta, anio), "rb") as f:
+                for datos in f:
+                    try:
+                        r = json.loads(datos)
+                        filas.append((str(r.get("Cliente_ID", "")), str(r.get("Turno_ID", "")), anio, offset, len(datos)))
+                    except ValueError:
+                        pass
+                    offset += len(datos)
+        storage.escribir_csv_atomico(pd.DataFrame(filas, columns=COLS_INDICE), _indice_path(carpeta))
+    return len(filas)
+
+
+def compactar(carpeta: Path) -> int:
+    """
+    Mantenimiento: reescribe cada archivo ordenado por Fecha, sin registros repetidos ni
+    renglones rotos, y rehace el índice. Devuelve los registros quitados.
+    """
+    carpeta = Path(carpeta)
+    quitados = 0
+    with _lock(carpeta):
+        for anio in _anios(carpeta):
+            path = _path_anio(carpeta, anio)
+            regs = []
+            with open(path, "rb") as f:
+                for datos in f:
+                    try:
+                        regs.append(json.loads(datos))
+                    except ValueError:
+                        quitados += 1
+            df = pd.DataFrame(regs, columns=COLS_REGISTRO).fillna("").astype(str)
+            sin_dup = df.drop_duplicates(keep="first")
+            quitados += len(df) - len(sin_dup)
+            orden = pd.to_datetime(sin_dup["Fecha"], errors="coerce")
+            sin_dup = sin_dup.assign(_ord=orden).sort_values("_ord", kind="stable", na_position="first").drop(columns=["_ord"])
+            tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+            try:
+                with open(tmp, "wb") as f:
+                    f.writelines(_linea(r) for r in sin_dup.to_dict("records"))
+                os.replace(tmp, path)
+            finally:
+                if tmp.exists():
+                    tmp.unlink()
+        reindexar(carpeta)
+    return quitados
+
+
+def _leer_txt(path: Path) -> dict:
+    """Campos de un TXT por turno viejo (Notas puede seguir en los renglones siguientes)."""
+    campos = dict((etiqueta, campo) for etiqueta, campo in RENGLONES_TXT)
+    out = {}
+    renglones = path.read_text(encoding="utf-8").splitlines()
+    for i, renglon in enumerate(renglones):
+        etiqueta, sep, valor = renglon.partition(": ")
+        if not sep or etiqueta not in campos:
+            continue
+        if campos[etiqueta] == "Notas":
+            out["Notas"] = "\n".join([valor] + renglones[i + 1:])
+            break
+        if campos[etiqueta] == "Horario":
+            out["Inicio"], _, out["Fin"] = valor.partition(" - ")
+        else:
+            out[campos[etiqueta]] = valor
+    if not out.get("Fecha"):  # el nombre del archivo es <AAAAMMDD_HHMM>_<Turno_ID>.txt
+        fecha = pd.to_datetime(path.stem[:13], format="%Y%m%d_%H%M", errors="coerce")
+        out["Fecha"] = fecha.strftime("%Y-%m-%d %H:%M") if not pd.isna(fecha) else ""
+    return out
+
+
+def _registros_carpeta(carpeta_cliente: Path) -> list[dict]:
+    """Registros de una carpeta vieja: cada fila de historial.csv con su TXT (por Turno_ID) y los TXT sueltos."""
+    cliente_id = carpeta_cliente.name.rsplit("_", 1)[0]  # el slug nunca tiene "_"
+    txts: dict[str, list[dict]] = {}
+    for path in sorted(carpeta_cliente.glob("*.txt")):
+        campos = _leer_txt(path)
+        txts.setdefault(campos.get("Turno_ID") or path.stem[14:], []).append(campos)
+    regs = []
+    hist_csv = carpeta_cliente / "historial.csv"
+    if hist_csv.exists():
+        for fila in pd.read_csv(hist_csv, dtype=str).fillna("").to_dict("records"):
+            propios = txts.get(fila.get("Turno_ID", ""))
+            txt = propios.pop(0) if propios else {}
+            regs.append({**txt, **{k: v for k, v in fila.items() if v != ""}})
+    for tid, sueltos in txts.items():
+        regs.extend({"Evento": "Turno finalizado", "Turno_ID": tid, **t} for t in sueltos)
+    for r in regs:
+        r.setdefault("Cliente_ID", cliente_id)
+        r.setdefault("Evento", "Turno finalizado")
+    return sorted(regs, key=lambda r: str(r.get("Fecha", "")))
+
+
+def carpetas_viejas(carpeta: Path) -> list[Path]:
+    """Carpetas por cliente del formato anterior (<cliente>_<slug>) que quedan sin empaquetar."""
+    if not Path(carpeta).is_dir():
+        return []
+    return sorted(p for p in Path(carpeta).iterdir() if p.is_dir() and "_" in p.name)
+
+
+def migrar(carpeta: Path, conservar: bool = False) -> tuple[int, int]:
+    """
+    Empaqueta las carpetas viejas: agrega sus registros y, salvo `conservar`, borra sus
+    historial.csv y TXT (y la carpeta si queda vacía) junto con el viejo _manifest.csv.
+    Carpeta por carpeta: si se corta en el medio, volver a correrlo sigue desde donde quedó.
+    Devuelve (carpetas migradas, registros agregados).
+    """
+    carpeta = Path(carpeta)
+    carpetas = carpetas_viejas(carpeta)
+    agregados = 0
+    for vieja in carpetas:
+        agregados += agregar(carpeta, _registros_carpeta(vieja))
+        if conservar:
+            continue
+        for path in [*vieja.glob("*.txt"), vieja / "historial.csv"]:
+            path.unlink(missing_ok=True)
+        if not any(vieja.iterdir()):
+            vieja.rmdir()
+    if not conservar:
+        (carpeta / "_manifest.csv").unlink(missing_ok=True)
+    return len(carpetas), agregados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Historias por cliente empaquetadas (JSONL + índice)")
+    parser.add_argument("accion", choices=["migrar", "reindexar", "compactar", "ver"])
+    parser.add_argument("cliente_id", nargs="?", default=None, help="Para 'ver': Cliente_ID")
+    parser.add_argument("--turno", default=None, help="Para 'ver': un Turno_ID, como el TXT de siempre")
+    parser.add_argument("--conservar", action="store_true", help="Para 'migrar': no borrar las carpetas viejas")
+    parser.add_argument("--data", default=str(Path(__file__).parent / "data"), help="Carpeta de datos")
+    args = parser.parse_args(argv)
+
+    carpeta = Path(args.data) / "historias"
+    if args.accion == "migrar":
+        carpetas, registros = migrar(carpeta, args.conservar)
+        print(f"{carpetas} carpetas empaquetadas ({registros} registros) en {carpeta}")
+    elif args.accion == "reindexar":
+        print(f"Índice rehecho: {reindexar(carpeta)} registros")
+    elif args.accion == "compactar":
+        print(f"Historias compactadas: {compactar(carpeta)} registros repetidos o rotos quitados")
+    elif args.turno:
+        reg = registro(carpeta, args.turno)
+        if reg is None:
+            parser.exit(1, f"No hay registros del turno {args.turno}\n")
+        print(texto(reg))
+    elif args.cliente_id:
+        df = historia(carpeta, args.cliente_id)
+        print(df.drop(columns=["Cliente_ID"]).to_string(index=False) if not df.empty else "Sin registros.")
+    else:
+        parser.error("'ver' necesita un Cliente_ID o --turno")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+# ==========================================================
+# Importación masiva de turnos y clientes (CSV / XLSX)
+# - Validación vectorizada: fechas, horarios, Tipo/Zonas contra el catálogo,
+#   Duracion_total y Fin recalculados, estados y clientes
+# - Superposiciones contra los turnos existentes y dentro del archivo (core.superposiciones),
+#   por recurso si la agenda tiene varios (columna Recursos opcional)
+# - Los clientes se dan de alta / actualizan por Cliente_ID (o WhatsApp)
+# - Siempre devuelve un informe por fila; solo escribe con aplicar=True
+# - Uso por consola: python importacion.py turnos agenda.csv [--aplicar]
+# ==========================================================
+import argparse
+import contextlib
+import io
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import core
+
+OBLIGATORIAS = {
+    "turnos": ["Fecha", "Inicio", "Tipo", "Zonas"],
+    "clientes": [],
+}
+CONOCIDAS = {
+    "turnos": ["Turno_ID", "Cliente_ID", "WhatsApp", "Nombre", "Email", "Fecha", "Inicio", "Tipo", "Zonas",
+               "Estado", "Notas", "Recursos"],
+    "clientes": ["Cliente_ID", "WhatsApp", "Nombre", "Email", "Notas"],
+}
+FORMATOS_FECHA = ["ISO8601", "%d/%m/%Y", "%d-%m-%Y", "%d/%m/%y"]
+RE_EMAIL = r"^[^@\s]+@[^@\s]+\.[^@\s]+$"
+
+
+# =========================
+# LECTURA
+# =========================
+def leer_tabla(origen, nombre: str | None = None) -> pd.DataFrame:
+    """
+    Lee un CSV (coma o punto y coma, UTF-8 o Latin-1) o un XLSX como texto.
+    `origen` es una ruta o un archivo abierto (p. ej. el de st.file_uploader).
+    """
+    nombre = nombre or getattr(origen, "name", None) or str(origen)
+    datos = origen.read() if hasattr(origen, "read") else Path(origen).read_bytes()
+    if nombre.lower().endswith((".xlsx", ".xlsm")):
+        try:
+            df = pd.read_excel(io.BytesIO(datos), dtype=str)
+        except ImportError:
+            raise ValueError("Para importar planillas .xlsx hace falta openpyxl (pip install openpyxl).")
+    else:
+        try:
+            texto = datos.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            texto = datos.decode("latin-1")
+        primera = texto.split("\n", 1)[0]
+        sep = ";" if primera.count(";") > primera.count(",") else ","
+        df = pd.read_csv(io.StringIO(texto), sep=sep, dtype=str, keep_default_na=False)
+    return df.fillna("")
+
+
+def _columnas(df: pd.DataFrame, tabla: str) -> pd.DataFrame:
+    """Renombra encabezados conocidos sin importar mayúsculas/espacios y recorta los valores."""
+    canon = {c.lower(): c for c in CONOCIDAS[tabla]}
+    df = df.rename(columns=lambda c: canon.get(str(c).strip().lower(), str(c).strip()))
+    faltan = [c for c in OBLIGATORIAS[tabla] if c not in df.columns]
+    if faltan:
+        raise ValueError(f"Faltan columnas: {', '.join(faltan)}")
+    if "Cliente_ID" not in df.columns and "WhatsApp" not in df.columns and tabla == "clientes":
+        raise ValueError("Falta la columna Cliente_ID o WhatsApp")
+    df = df.reindex(columns=CONOCIDAS[tabla]).fillna("").astype(str)
+    return df.apply(lambda s: s.str.strip()).reset_index(drop=True)
+
+
+# =========================
+# VALIDACIÓN (vectorizada)
+# =========================
+def _marcar(motivo: pd.Series, mask, texto) -> pd.Series:
+    """Anota `texto` en las filas de `mask` que todavía no tienen motivo (gana el primero)."""
+    return motivo.mask(mask & motivo.eq(""), texto)
+
+
+def _fechas(s: pd.Series) -> pd.Series:
+    """AAAA-MM-DD (o con hora, como las exporta Excel) y DD/MM/AAAA; NaT si no parsea."""
+    out = pd.Series(pd.NaT, index=s.index, dtype="datetime64[ns]")
+    for fmt in FORMATOS_FECHA:
+        falta = out.isna() & s.ne("")
+        if not falta.any():
+            break
+        out[falta] = pd.to_datetime(s[falta], format=fmt, errors="coerce")
+    return out.dt.normalize()
+
+
+def _cotizar(tipos: pd.Series, zonas: pd.Series, cat: core.Catalogo) -> tuple[pd.Series, pd.Series, pd.Series]:
+    """
+    Resuelve Tipo/Zonas contra el catálogo de una vez: explota las zonas, las cruza con
+    (Tipo, Zona) y suma duraciones por fila. Devuelve (duración, zonas normalizadas, motivo).
+    """
+    motivo = pd.Series("", index=tipos.index)
+    motivo = _marcar(motivo, ~tipos.isin(list(cat.zonas)), "Tipo desconocido")
+    lista = zonas.str.split(r"\s*[,;]\s*", regex=True).explode().str.strip()
+    lista = lista[lista.ne("")]
+    pares = pd.DataFrame({"fila": lista.index, "Tipo": tipos.loc[lista.index].to_numpy(), "Zona": lista.to_numpy()})
+    pares = pares.drop_duplicates(subset=["fila", "Zona"])
+    servicios = pd.DataFrame(
+        [(t, z, d) for (t, z), (d, _) in cat.servicios.items()], columns=["Tipo", "Zona", "Duracion_min"]
+    )
+    pares = pares.merge(servicios, on=["Tipo", "Zona"], how="left")
+    desconocidas = pares[pares["Duracion_min"].isna()].groupby("fila")["Zona"].agg(", ".join)
+    motivo = _marcar(motivo, motivo.index.isin(desconocidas.index),
+                     "Zona desconocida: " + desconocidas.reindex(motivo.index).fillna(""))
+    sin_zonas = ~tipos.index.isin(pares["fila"])
+    motivo = _marcar(motivo, sin_zonas, "Sin zonas")
+    dur = pares.groupby("fila")["Duracion_min"].sum().reindex(tipos.index).fillna(0).astype(int)
+    normalizadas = (zonas.str.replace(r"^[\s,;]+|[\s,;]+$", "", regex=True)
+                    .str.replace(r"\s*[,;][\s,;]*", ", ", regex=True))
+    return dur, normalizadas, motivo
+
+
+def _fuera_de_horario(fechas: pd.Series, ini: pd.Series, fin: pd.Series) -> pd.Series:
+    """True si [ini, fin] no entra en ningún tramo de los horarios de atención de esa fecha."""
+    hor = core.horarios()
+    dias = fechas.dt.date
+    tramos = pd.DataFrame([(d, a, b) for d in dias.unique() for a, b in hor.tramos(d)],
+                          columns=["dia", "t_ini", "t_fin"])
+    filas = pd.DataFrame({"fila": fechas.index, "dia": dias.to_numpy(), "ini": ini.to_numpy(), "fin": fin.to_numpy()})
+    cruce = filas.merge(tramos, on="dia", how="left")
+    dentro = cruce[(cruce["ini"] >= cruce["t_ini"]) & (cruce["fin"] <= cruce["t_fin"])]
+    return pd.Series(~fechas.index.isin(dentro["fila"]), index=fechas.index)
+
+
+def _claves_dia(fechas: pd.Series, recurso: pd.Series) -> np.ndarray:
+    """Día (y recurso) de cada fila como entero, escalado para poner sus minutos en su propia banda."""
+    dias = pd.to_datetime(fechas).to_numpy().astype("datetime64[D]").astype(np.int64)
+    return (dias * 1_000 + recurso.to_numpy()) * 10_000
+
+
+def choques_con(agenda: pd.DataFrame, lote: pd.DataFrame, buffer_min: int | None = None) -> pd.Series:
+    """
+    Turnos de `lote` que pisan alguno de `agenda` (mismas columnas que core.superposiciones), con
+    el buffer a ambos lados como en la grilla de la agenda (`buffer_min`, o el de los horarios de
+    cada fecha) y por recurso (core.por_recurso). Ordena la
+    agenda una vez y ubica cada turno con searchsorted. Devuelve el Turno_ID de agenda contra el
+    que choca, indexado como `lote`.
+    """
+    if agenda.empty or lote.empty:
+        return pd.Series(dtype=str)
+    agenda = agenda.assign(_buffer=core.buffers_por_fecha(agenda["Fecha"]) if buffer_min is None else buffer_min)
+    agenda, lote = core.por_recurso(agenda), core.por_recurso(lote)
+    base = _claves_dia(agenda["Fecha"], agenda["_rec"])
+    buffer = agenda["_buffer"].to_numpy(dtype=np.int64)
+    desde = base + agenda["ini"].to_numpy() - buffer
+    hasta = base + agenda["fin"].to_numpy() + buffer
+    orden = np.argsort(desde, kind="stable")
+    desde, hasta, ids = desde[orden], hasta[orden], agenda["Turno_ID"].to_numpy()[orden]
+    hasta_max = np.maximum.accumulate(hasta)
+    # posición del turno que alcanza el máximo hasta cada punto (para informar cuál es)
+    dueno = np.maximum.accumulate(np.where(hasta == hasta_max, np.arange(len(hasta)), 0))
+    base = _claves_dia(lote["Fecha"], lote["_rec"])
+    ini, fin = base + lote["ini"].to_numpy(), base + lote["fin"].to_numpy()
+    i = np.searchsorted(desde, fin, side="left") - 1
+    choca = (i >= 0) & (hasta_max[np.maximum(i, 0)] > ini)
+    res = pd.Series(ids[dueno[i[choca]]], index=lote["_orig"].to_numpy()[choca])
+    return res[~res.index.duplicated()]
+
+
+def _choques_agenda(lote: pd.DataFrame, buffer_min: int | None = None) -> pd.Series:
+    """choques_con contra los turnos activos guardados en las fechas del lote (leídos ahora)."""
+    agenda = core.load_turnos(lote["Fecha"].min(), lote["Fecha"].max())
+    agenda = agenda[~agenda["Estado"].isin(core.ESTADOS_LIBERAN) & agenda["Fecha"].isin(set(lote["Fecha"]))]
+    agenda = pd.DataFrame({"Fecha": agenda["Fecha"], "ini": core.minutos_serie(agenda["Inicio"]),
+                           "fin": core.minutos_serie(agenda["Fin"]), "Turno_ID": agenda["Turno_ID"],
+                           "Recursos": agenda["Recursos"]}).dropna()
+    return choques_con(agenda, lote, buffer_min)
+
+
+def _marcar_choques(motivo: pd.Series, contra: pd.Series) -> pd.Series:
+    return _marcar(motivo, motivo.index.isin(contra.index),
+                   "Se superpone con el turno existente " + contra.reindex(motivo.index).fillna(""))
+
+
+def _ids_nuevos(n: int, usados: set) -> pd.Series:
+    """n Turno_ID de 8 hex (como uuid4()[:8]) que no chocan con `usados` ni entre sí."""
+    rng = np.random.default_rng()
+    ids = pd.Series(dtype=str)
+    while len(ids) < n:
+        extra = pd.Series(rng.integers(0, 16 ** 8, n - len(ids))).map("{:08x}".format)
+        ids = pd.concat([ids, extra[~extra.isin(usados)]]).drop_duplicates()
+    return ids.reset_index(drop=True)
+
+
+def _cliente_id(df: pd.DataFrame) -> pd.Series:
+    return df["Cliente_ID"].where(df["Cliente_ID"].ne(""), df["WhatsApp"])
+
+
+def _informe(df: pd.DataFrame, motivo: pd.Series, aviso: pd.Series, columnas: list[str]) -> pd.DataFrame:
+    """Una fila por fila del archivo (numeradas como en la planilla: el encabezado es la 1)."""
+    return pd.DataFrame({
+        "Fila": df.index + 2,
+        "Estado": np.where(motivo.ne(""), "error", "ok"),
+        "Motivo": motivo.where(motivo.ne(""), aviso).to_numpy(),
+        **{c: df[c].to_numpy() for c in columnas},
+    })
+
+
+# =========================
+# CLIENTES
+# =========================
+def _upsert_clientes(entrantes: pd.DataFrame, aplicar: bool) -> tuple[int, int]:
+    """
+    Alta de los Cliente_ID que no existen y actualización de nombre/email/notas con los
+    valores no vacíos del archivo (mismas reglas que registrar_cliente). Devuelve (altas, cambios).
+    """
+    cols = ["Nombre", "Email", "Notas"]
+    entrantes = entrantes.drop_duplicates(subset=["Cliente_ID"], keep="last").set_index("Cliente_ID")
+    existentes = core.load_df("clientes").drop_duplicates(subset=["Cliente_ID"]).set_index("Cliente_ID")
+    nuevos = entrantes[~entrantes.index.isin(existentes.index)]
+    previos = existentes.reindex(columns=cols).fillna("").loc[entrantes.index.intersection(existentes.index)]
+    propuestos = entrantes.loc[previos.index, cols].where(lambda d: d.ne(""), previos)
+    cambiados = propuestos[propuestos.ne(previos).any(axis=1)]
+    if aplicar:
+        altas = nuevos.reset_index().assign(WhatsApp=lambda d: d["Cliente_ID"])
+        core.insert_rows("clientes", altas.reindex(columns=core.DEFAULT_CLIENTES.columns).fillna(""))
+        core.update_rows("clientes", "Cliente_ID", cambiados.reset_index())
+    return len(nuevos), len(cambiados)
+
+
+def importar_clientes(df: pd.DataFrame, aplicar: bool = False) -> dict:
+    """
+    Valida e importa clientes. Ante un Cliente_ID repetido en el archivo gana la última fila.
+    Devuelve {"informe", "validas", "errores", "clientes_nuevos", "clientes_actualizados", "aplicado"}.
+    """
+    df = _columnas(df, "clientes")
+    df["Cliente_ID"] = _cliente_id(df)
+    motivo = pd.Series("", index=df.index)
+    motivo = _marcar(motivo, df["Cliente_ID"].eq(""), "Sin Cliente_ID / WhatsApp")
+    motivo = _marcar(motivo, df["Email"].ne("") & ~df["Email"].str.match(RE_EMAIL), "Email inválido")
+    repetido = df["Cliente_ID"].ne("") & df.duplicated(subset=["Cliente_ID"], keep="last")
+    aviso = pd.Series(np.where(repetido, "Repetido: se usa la última fila", ""), index=df.index)
+
+    ok = motivo.eq("")
+    nuevos, actualizados = _upsert_clientes(df.loc[ok, ["Cliente_ID", "Nombre", "Email", "Notas"]], aplicar)
+    return {
+        "informe": _informe(df, motivo, aviso, ["Cliente_ID", "Nombre", "Email"]),
+        "validas": int(ok.sum()),
+        "errores": int((~ok).sum()),
+        "clientes_nuevos": nuevos,
+        "clientes_actualizados": actualizados,
+        "aplicado": aplicar,
+    }
+
+
+# =========================
+# TURNOS
+# =========================
+def importar_turnos(df: pd.DataFrame, aplicar: bool = False, buffer_min: int | None = None) -> dict:
+    """
+    Valida e importa turnos nuevos. Duración y Fin salen del catálogo; las filas con error
+    (incluidas las que se superponen con la agenda o con otra fila del archivo, con el buffer
+    de los horarios de cada fecha salvo `buffer_min`) no se importan. Los horarios fuera de
+    los horarios de atención (cierres y fechas especiales incluidos) solo se avisan. Con varios
+    recursos, la columna Recursos (Recurso_ID separados por coma) dice cuáles ocupa cada
+    turno; vacía = todos, como los turnos cargados antes de tener recursos. Con aplicar=True
+    el choque con la agenda se vuelve a controlar con la tabla de turnos tomada, justo antes
+    de escribir. Devuelve lo mismo que importar_clientes más "turnos" (las filas que se escriben).
+    """
+    df = _columnas(df, "turnos")
+    df["Cliente_ID"] = _cliente_id(df)
+    df["Estado"] = df["Estado"].where(df["Estado"].ne(""), "Confirmado")
+    motivo = pd.Series("", index=df.index)
+
+    fechas = _fechas(df["Fecha"])
+    motivo = _marcar(motivo, fechas.isna(), "Fecha inválida")
+    ini = core.minutos_serie(df["Inicio"])
+    motivo = _marcar(motivo, ini.isna(), "Horario inválido")
+    dur, zonas, motivo_cat = _cotizar(df["Tipo"], df["Zonas"], core.catalogo())
+    motivo = _marcar(motivo, motivo_cat.ne(""), motivo_cat)
+    fin = ini + dur
+    motivo = _marcar(motivo, fin > 24 * 60, "Termina después de medianoche")
+    motivo = _marcar(motivo, ~df["Estado"].isin(core.ESTADOS), "Estado inválido")
+    motivo = _marcar(motivo, df["Cliente_ID"].eq(""), "Sin Cliente_ID / WhatsApp")
+    motivo = _marcar(motivo, df["Email"].ne("") & ~df["Email"].str.match(RE_EMAIL), "Email inválido")
+    rec = core.recursos()
+    if rec.multi:
+        pedidos = df["Recursos"].str.split(",").explode().str.strip()
+        desconocido = pedidos.ne("") & ~pedidos.isin(list(rec.pos))
+        motivo = _marcar(motivo, df.index.isin(pedidos[desconocido].index), "Recurso desconocido")
+
+    existentes_ids = core.indice_turnos()
+    con_id = df["Turno_ID"].ne("")
+    motivo = _marcar(motivo, con_id & df["Turno_ID"].isin(list(existentes_ids)), "Turno_ID ya existe")
+    motivo = _marcar(motivo, con_id & df.duplicated(subset=["Turno_ID"], keep="first"), "Turno_ID repetido en el archivo")
+    df["Turno_ID"] = df["Turno_ID"].where(con_id, _ids_nuevos((~con_id).sum(), set(existentes_ids) | set(df["Turno_ID"]))
+                                          .set_axis(df.index[~con_id]))
+
+    ok = motivo.eq("")
+    aviso = pd.Series("", index=df.index)
+    if ok.any():
+        fuera = _fuera_de_horario(fechas[ok], ini[ok], fin[ok])
+        aviso[fuera[fuera].index] = "Fuera del horario de atención"
+
+        # Superposiciones: turnos activos del archivo + los existentes de esas fechas
+        activos = ok & ~df["Estado"].isin(core.ESTADOS_LIBERAN)
+        lote = pd.DataFrame({"Fecha": fechas[activos].dt.date, "ini": ini[activos], "fin": fin[activos],
+                             "Turno_ID": df.loc[activos, "Turno_ID"], "Recursos": df.loc[activos, "Recursos"]})
+        lote["_buffer"] = core.buffers_por_fecha(lote["Fecha"]) if buffer_min is None else buffer_min
+        if not lote.empty:
+            contra = _choques_agenda(lote, buffer_min)
+            motivo = _marcar_choques(motivo, contra)
+            # Dentro del archivo: se rechaza toda fila que pisa a otra anterior
+            internos = core.superposiciones_recursos(lote[~lote.index.isin(contra.index)])
+            fila_previa = (internos["previo"] + 2).astype(str).reindex(motivo.index).fillna("")
+            motivo = _marcar(motivo, motivo.index.isin(internos.index), "Se superpone con la fila " + fila_previa)
+        ok = motivo.eq("")
+
+    turnos = pd.DataFrame({
+        "Turno_ID": df["Turno_ID"],
+        "Cliente_ID": df["Cliente_ID"],
+        "Fecha": fechas.dt.strftime("%Y-%m-%d"),
+        "Inicio": core.hhmm_serie(ini),
+        "Fin": core.hhmm_serie(fin),
+        "Tipo": df["Tipo"],
+        "Zonas": zonas,
+        "Duracion_total": dur.astype(str),
+        "Estado": df["Estado"],
+        "Notas": df["Notas"],
+        "RecordatorioEnviado": "",
+        "Recursos": df["Recursos"],
+    }).reindex(columns=core.DEFAULT_TURNOS.columns).fillna("")
+
+    escribir = aplicar and ok.any()
+    with core.get_storage().lock("turnos") if escribir else contextlib.nullcontext():
+        if escribir:
+            # Con la tabla tomada (las reservas esperan) se vuelve a mirar la agenda: lo que se
+            # reservó mientras se validaba el archivo gana y esas filas pasan a error
+            pendientes = lote[lote.index.isin(ok[ok].index)]
+            if not pendientes.empty:
+                motivo = _marcar_choques(motivo, _choques_agenda(pendientes, buffer_min))
+                ok = motivo.eq("")
+        turnos = turnos[ok]
+        nuevos, actualizados = _upsert_clientes(df.loc[ok, ["Cliente_ID", "Nombre", "Email", "Notas"]].assign(Notas=""),
+                                                aplicar)
+        if aplicar:
+            core.insert_rows("turnos", turnos)
+    df["Fin"] = core.hhmm_serie(fin).where(fin.notna(), "")
+    return {
+        "informe": _informe(df, motivo, aviso, ["Turno_ID", "Cliente_ID", "Fecha", "Inicio", "Fin", "Tipo", "Zonas"]),
+        "turnos": turnos,
+        "validas": int(ok.sum()),
+        "errores": int((~ok).sum()),
+        "clientes_nuevos": nuevos,
+        "clientes_actualizados": actualizados,
+        "aplicado": aplicar,
+    }
+
+
+def importar(tabla: str, df: pd.DataFrame, aplicar: bool = False) -> dict:
+    if tabla == "turnos":
+        return importar_turnos(df, aplicar)
+    if tabla == "clientes":
+        return importar_clientes(df, aplicar)
+    raise ValueError(f"No se puede importar '{tabla}'")
+
+
+# =========================
+# CLI
+# =========================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa turnos o clientes desde CSV / XLSX")
+    parser.add_argument("tabla", choices=["turnos", "clientes"])
+    parser.add_argument("archivo", help="CSV (coma o punto y coma) o XLSX")
+    parser.add_argument("--aplicar", action="store_true", help="Escribir; sin esto solo se valida (simulación)")
+    parser.add_argument("--informe", default=None, help="CSV donde guardar el informe por fila")
+    parser.add_argument("--data", default=None, help="Carpeta de datos (por defecto data/ o ESTETICA_DATA_DIR)")
+    parser.add_argument("--storage", default=None, help="csv o sqlite")
+    args = parser.parse_args(argv)
+
+    if args.data or args.storage:
+        core.configurar(Path(args.data) if args.data else None, args.storage)
+    try:
+        res = importar(args.tabla, leer_tabla(args.archivo), aplicar=args.aplicar)
+    except (ValueError, OSError) as e:
+        parser.exit(1, f"{e}\n")
+
+    errores = res["informe"][res["informe"]["Estado"] == "error"]
+    for fila in errores.head(20).itertuples(index=False):
+        print(f"Fila {fila.Fila}: {fila.Motivo}")
+    if len(errores) > 20:
+        print(f"... y {len(errores) - 20} errores más")
+    if args.informe:
+        res["informe"].to_csv(args.informe, index=False, encoding="utf-8")
+    accion = "Importadas" if res["aplicado"] else "Válidas (simulación, usá --aplicar para escribir)"
+    print(f"{accion}: {res['validas']} · con error: {res['errores']} · "
+          f"clientes nuevos: {res['clientes_nuevos']} · actualizados: {res['clientes_actualizados']}")
+
+
+if __name__ == "__main__":
+    main()
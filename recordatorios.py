@@ -0,0 +1,137 @@
+# ==========================================================
+# Recordatorios de turnos (el día anterior)
+# - Toma los turnos activos de la fecha por el índice de fechas (load_turnos) y sin
+#   RecordatorioEnviado, les une WhatsApp / email del cliente en un solo merge
+# - Arma todos los mensajes de una vez y los entrega a un "enviador" en un lote
+# - Marca RecordatorioEnviado en una sola escritura: correr dos veces no duplica
+# - Enviador por defecto: bandeja de salida en archivos (data/outbox/*.jsonl) que
+#   después puede procesar un proveedor real; se elige con ESTETICA_ENVIADOR
+# - Uso por consola: python recordatorios.py [--fecha 2025-11-03] [--simular]
+# ==========================================================
+import argparse
+import os
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import core
+
+# Turnos que todavía tienen que venir
+ESTADOS_RECORDAR = ["Confirmado", "Reprogramado"]
+
+COLS_MENSAJE = ["Turno_ID", "Cliente_ID", "Nombre", "Canal", "Destino", "Mensaje"]
+
+
+class OutboxArchivo:
+    """
+    Enviador de prueba / por defecto: deja cada lote como un JSONL en la bandeja de salida.
+    Un enviador recibe el DataFrame de mensajes (COLS_MENSAJE) y devuelve una referencia del lote.
+    """
+
+    nombre = "archivo"
+
+    def __init__(self, carpeta: Path | None = None):
+        self.carpeta = Path(carpeta) if carpeta else core.DATA_DIR / "outbox"
+
+    def enviar(self, mensajes: pd.DataFrame) -> str:
+        self.carpeta.mkdir(parents=True, exist_ok=True)
+        path = self.carpeta / f"recordatorios_{datetime.now():%Y%m%d-%H%M%S-%f}.jsonl"
+        tmp = path.with_name(f".{path.name}.tmp")
+        mensajes.assign(Creado=datetime.now().isoformat(timespec="seconds")).to_json(
+            tmp, orient="records", lines=True, force_ascii=False)
+        os.replace(tmp, path)
+        return str(path)
+
+
+# Enviadores disponibles (un proveedor real se agrega acá con la misma interfaz)
+ENVIADORES = {"archivo": OutboxArchivo}
+
+
+def get_enviador(nombre: str | None = None):
+    nombre = nombre or os.environ.get("ESTETICA_ENVIADOR", "archivo")
+    if nombre not in ENVIADORES:
+        raise ValueError(f"Enviador desconocido: {nombre}")
+    return ENVIADORES[nombre]()
+
+
+def pendientes(fecha: date) -> pd.DataFrame:
+    """
+    Turnos de `fecha` a recordar (estado activo, sin RecordatorioEnviado) con los datos
+    de contacto del cliente y el mensaje armado. Canal vacío = cliente sin WhatsApp ni email.
+    """
+    turnos = core.load_turnos(fecha, fecha)
+    if "RecordatorioEnviado" not in turnos.columns:
+        turnos["RecordatorioEnviado"] = ""
+    turnos = turnos[turnos["Estado"].isin(ESTADOS_RECORDAR) & turnos["RecordatorioEnviado"].eq("")]
+    if turnos.empty:
+        return pd.DataFrame(columns=COLS_MENSAJE + ["Inicio"])
+    clientes = core.load_df("clientes").drop_duplicates(subset=["Cliente_ID"])
+    df = turnos.merge(clientes[["Cliente_ID", "Nombre", "WhatsApp", "Email"]], on="Cliente_ID", how="left")
+    df[["Nombre", "WhatsApp", "Email"]] = df[["Nombre", "WhatsApp", "Email"]].fillna("").astype(str)
+    df["WhatsApp"] = df["WhatsApp"].where(df["WhatsApp"].ne(""), df["Cliente_ID"])  # el Cliente_ID es el WhatsApp
+    df["Canal"] = np.select([df["WhatsApp"].ne(""), df["Email"].ne("")], ["whatsapp", "email"], "")
+    df["Destino"] = np.where(df["Canal"] == "whatsapp", df["WhatsApp"], np.where(df["Canal"] == "email", df["Email"], ""))
+    saludo = np.where(df["Nombre"].ne(""), "Hola " + df["Nombre"].str.split().str[0].fillna("") + "!", "¡Hola!")
+    df["Mensaje"] = (
+        saludo + " Te recordamos tu turno de " + df["Tipo"] + " (" + df["Zonas"] + ") el "
+        + fecha.strftime("%d/%m") + " a las " + df["Inicio"] + ". Si no podés venir, avisanos por acá 💬"
+    )
+    return df.sort_values("Inicio", kind="stable")[COLS_MENSAJE + ["Inicio"]].reset_index(drop=True)
+
+
+def enviar_recordatorios(fecha: date | None = None, enviador=None, simular: bool = False) -> dict:
+    """
+    Envía en un lote los recordatorios de `fecha` (por defecto mañana) y marca
+    RecordatorioEnviado. Bajo un lock por fecha, así dos corridas simultáneas no duplican.
+    Devuelve {"fecha", "enviados", "sin_contacto", "lote", "mensajes"}.
+    """
+    fecha = fecha or date.today() + timedelta(days=1)
+    with core.get_storage().lock("turnos", f"recordatorios-{fecha.isoformat()}"):
+        mensajes = pendientes(fecha)
+        con_contacto = mensajes[mensajes["Canal"] != ""]
+        res = {"fecha": fecha, "enviados": 0, "sin_contacto": int((mensajes["Canal"] == "").sum()),
+               "lote": None, "mensajes": mensajes}
+        if simular or con_contacto.empty:
+            return res
+        enviador = enviador or get_enviador()
+        res["lote"] = enviador.enviar(con_contacto[COLS_MENSAJE].reset_index(drop=True))
+        # Se marca después de entregar el lote: ante una caída en el medio se reenvía, no se pierde
+        marca = datetime.now().isoformat(timespec="seconds")
+        res["enviados"] = core.update_rows(
+            "turnos", "Turno_ID",
+            pd.DataFrame({"Turno_ID": con_contacto["Turno_ID"], "RecordatorioEnviado": marca}),
+            fechas=[fecha.isoformat()],
+        )
+    return res
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Envía los recordatorios de turnos del día siguiente")
+    parser.add_argument("--fecha", default=None, help="AAAA-MM-DD de los turnos (por defecto mañana)")
+    parser.add_argument("--simular", action="store_true", help="Solo mostrar los mensajes, sin enviar ni marcar")
+    parser.add_argument("--enviador", default=None, help=f"Uno de: {', '.join(ENVIADORES)}")
+    parser.add_argument("--data", default=None, help="Carpeta de datos (por defecto data/ o ESTETICA_DATA_DIR)")
+    parser.add_argument("--storage", default=None, help="csv o sqlite")
+    args = parser.parse_args(argv)
+
+    if args.data or args.storage:
+        core.configurar(Path(args.data) if args.data else None, args.storage)
+    try:
+        res = enviar_recordatorios(date.fromisoformat(args.fecha) if args.fecha else None,
+                                   get_enviador(args.enviador), simular=args.simular)
+    except ValueError as e:
+        parser.exit(1, f"{e}\n")
+    for m in res["mensajes"].itertuples(index=False):
+        print(f"{m.Inicio} {m.Canal or 'SIN CONTACTO':10} {m.Destino:20} {m.Mensaje}")
+    if args.simular:
+        print(f"{len(res['mensajes'])} recordatorios pendientes para {res['fecha']} (simulación)")
+    else:
+        print(f"{res['enviados']} recordatorios enviados para {res['fecha']}"
+              + (f" · lote: {res['lote']}" if res["lote"] else "")
+              + (f" · {res['sin_contacto']} sin contacto" if res["sin_contacto"] else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# ==========================================================
+# Medición de tiempos (opt-in)
+# - Se activa con ESTETICA_PERF=1 o desde el panel "Rendimiento" del admin
+# - cronometrado(): envuelve funciones calientes (tiempo + filas devueltas)
+# - tramo(): marca secciones de la página (vista, pestaña) sin reindentar código
+# - Cada corrida de la página se agrega a data/perf/rendimiento.jsonl (rotativo)
+# Apagado, el costo es un chequeo de un booleano por llamada.
+# ==========================================================
+import functools
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import storage
+
+MAX_BYTES = 2 * 1024 * 1024  # tamaño del JSONL antes de rotar
+ROTACIONES = 3               # rendimiento.jsonl.1 ... .3
+
+_estado = {"activo": os.environ.get("ESTETICA_PERF", "") == "1", "dir": None}
+_local = threading.local()  # corrida en curso del hilo (Streamlit corre cada sesión en su hilo)
+
+
+def activo() -> bool:
+    return _estado["activo"]
+
+
+def activar(valor: bool):
+    _estado["activo"] = bool(valor)
+
+
+def configurar(perf_dir: Path):
+    _estado["dir"] = Path(perf_dir)
+
+
+def log_path() -> Path | None:
+    return _estado["dir"] / "rendimiento.jsonl" if _estado["dir"] else None
+
+
+def iniciar_corrida(vista: str = "") -> dict:
+    """Abre la corrida de esta ejecución del script; los registros se juntan en ella."""
+    ahora = time.perf_counter()
+    corrida = {"inicio": datetime.now().isoformat(timespec="seconds"), "vista": vista,
+               "_t0": ahora, "_ultimo": ahora, "_tramo": None, "total_ms": None, "registros": []}
+    _local.corrida = corrida
+    return corrida
+
+
+def _registrar(corrida: dict | None, tipo: str, nombre: str, ms: float, filas: int | None = None):
+    if corrida is not None:
+        corrida["registros"].append({"tipo": tipo, "nombre": nombre, "ms": round(ms, 3), "filas": filas})
+        corrida["_ultimo"] = time.perf_counter()
+
+
+def _filas(res) -> int | None:
+    try:
+        return len(res)
+    except TypeError:
+        return None
+
+
+def cronometrado(nombre: str, filas=_filas, con_arg: bool = False):
+    """
+    Decorador: registra duración y filas (len del resultado, o `filas(res)`) si está activo.
+    Con con_arg=True el primer argumento va en el nombre (p. ej. "load_df(turnos)").
+    """
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _estado["activo"]:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            res = fn(*args, **kwargs)
+            _registrar(getattr(_local, "corrida", None), "funcion",
+                       f"{nombre}({args[0]})" if con_arg and args else nombre,
+                       (time.perf_counter() - t0) * 1000, filas(res) if filas else None)
+            return res
+        return wrapper
+    return deco
+
+
+def _cerrar_tramo(corrida: dict, fin: float):
+    abierto = corrida["_tramo"]
+    if abierto is not None:
+        corrida["_tramo"] = None
+        _registrar(corrida, "tramo", abierto[0], (fin - abierto[1]) * 1000)
+
+
+def tramo(nombre: str | None):
+    """Cierra el tramo abierto (si hay) y abre `nombre`. tramo(None) solo cierra."""
+    corrida = getattr(_local, "corrida", None)
+    if corrida is None or not _estado["activo"]:
+        return
+    ahora = time.perf_counter()
+    _cerrar_tramo(corrida, ahora)
+    if nombre:
+        corrida["_tramo"] = (nombre, ahora)
+        corrida["_ultimo"] = ahora
+
+
+def cerrar_corrida(corrida: dict | None = None, al_final: bool = True) -> dict | None:
+    """
+    Cierra la corrida (por defecto la del hilo), la agrega al JSONL y la devuelve.
+    Si el script se cortó antes (st.stop / st.rerun) se cierra en la corrida siguiente
+    con al_final=False: el total llega hasta el último registro, no hasta ahora.
+    """
+    corrida = corrida if corrida is not None else getattr(_local, "corrida", None)
+    if corrida is None or "_t0" not in corrida:
+        return None
+    if getattr(_local, "corrida", None) is corrida:
+        _local.corrida = None
+    fin = time.perf_counter() if al_final else corrida["_ultimo"]
+    _cerrar_tramo(corrida, fin)
+    corrida["total_ms"] = round((fin - corrida["_t0"]) * 1000, 3)
+    for k in ("_t0", "_ultimo", "_tramo"):
+        corrida.pop(k, None)
+    if corrida["registros"]:
+        _escribir(corrida)
+    return corrida
+
+
+def _escribir(corrida: dict):
+    path = log_path()
+    if path is None:
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    linea = json.dumps(corrida, ensure_ascii=False) + "\n"
+    with storage.FileLock(path.parent / ".rendimiento.lock"):
+        if path.exists() and path.stat().st_size + len(linea) > MAX_BYTES:
+            for i in range(ROTACIONES - 1, 0, -1):
+                viejo = path.with_name(f"{path.name}.{i}")
+                if viejo.exists():
+                    os.replace(viejo, path.with_name(f"{path.name}.{i + 1}"))
+            os.replace(path, path.with_name(f"{path.name}.1"))
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(linea)
+
+
+def leer_corridas(limite: int = 200) -> list[dict]:
+    """Últimas corridas del JSONL actual (la más nueva primero)."""
+    path = log_path()
+    if path is None or not path.exists():
+        return []
+    with open(path, encoding="utf-8") as f:
+        lineas = f.readlines()[-limite:]
+    corridas = []
+    for linea in reversed(lineas):
+        try:
+            corridas.append(json.loads(linea))
+        except json.JSONDecodeError:
+            continue  # línea cortada por una escritura concurrente
+    return corridas
@@ -0,0 +1,845 @@
+# ==========================================================
+# Almacenamiento de tablas (servicios, clientes, turnos, historial, recursos, horarios)
+# - CsvStorage: un CSV por tabla (comportamiento original)
+# - SqliteStorage: una base SQLite en modo WAL con escrituras por fila
+# - Importador único desde data/*.csv hacia SQLite
+# ==========================================================
+import argparse
+import contextlib
+import csv
+import io
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import pandas as pd
+
+TABLAS = ["servicios", "clientes", "turnos", "historial", "recursos", "horarios"]
+
+# Columnas que identifican una fila en cada tabla (historial es solo agregado)
+CLAVES = {
+    "servicios": ("Tipo", "Zona"),
+    "clientes": ("Cliente_ID",),
+    "turnos": ("Turno_ID",),
+    "historial": (),
+    "recursos": ("Recurso_ID",),
+    "horarios": ("Regla_ID",),
+}
+
+# Tablas que el backend CSV puede guardar particionadas por mes de Fecha
+PARTICIONADAS = ("turnos",)
+SIN_FECHA = "sin-fecha"
+
+# Índices SQLite por tabla
+INDICES = {
+    "clientes": ["Cliente_ID"],
+    "turnos": ["Fecha", "Cliente_ID", "Turno_ID"],
+    "historial": ["Cliente_ID", "Fecha"],
+}
+
+
+class FileLock:
+    """
+    Lock sobre un archivo, válido entre procesos y entre hilos: exclusivo o, con
+    `compartido=True`, compartido con otros compartidos (en Windows siempre exclusivo).
+    Es reentrante dentro del mismo hilo (una escritura puede llamar a otra); lo que no se
+    puede es pedirlo exclusivo teniéndolo compartido.
+    """
+
+    _held = threading.local()
+
+    def __init__(self, path: Path, timeout: float = 15.0, compartido: bool = False):
+        self.path = Path(path)
+        self.timeout = timeout
+        self.compartido = compartido
+
+    def _registro(self) -> dict:
+        if not hasattr(self._held, "locks"):
+            self._held.locks = {}
+        return self._held.locks
+
+    def __enter__(self):
+        reg = self._registro()
+        key = str(self.path)
+        if key in reg:
+            fd, n, compartido = reg[key]
+            if compartido and not self.compartido:
+                raise RuntimeError(f"El lock {self.path} ya se tiene compartido: no se puede pedir exclusivo")
+            reg[key] = (fd, n + 1, compartido)
+            return self
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        limite = time.monotonic() + self.timeout
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, (fcntl.LOCK_SH if self.compartido else fcntl.LOCK_EX) | fcntl.LOCK_NB)
+                else:
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if time.monotonic() >= limite:
+                    os.close(fd)
+                    raise TimeoutError(f"No se pudo tomar el lock {self.path}")
+                time.sleep(0.02)
+        reg[key] = (fd, 1, self.compartido)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        reg = self._registro()
+        key = str(self.path)
+        fd, n, compartido = reg[key]
+        if n > 1:
+            reg[key] = (fd, n - 1, compartido)
+            return False
+        del reg[key]
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, 0)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+        return False
+
+
+class CsvStorage:
+    """
+    Un archivo CSV por tabla. Las altas se agregan al final; el resto reescribe el archivo.
+    Los turnos pueden estar particionados por mes (data/turnos/AAAA-MM.csv): en ese caso
+    las lecturas por rango de fechas abren solo las particiones que se superponen.
+    """
+
+    nombre = "csv"
+
+    def __init__(self, data_dir: Path, defaults: dict[str, pd.DataFrame]):
+        self.data_dir = Path(data_dir)
+        self.defaults = defaults
+        self.files = {name: self.data_dir / f"{name}.csv" for name in TABLAS}
+        self.locks_dir = self.data_dir / ".locks"
+
+    def _tabla_lock(self, name: str) -> FileLock:
+        return FileLock(self.locks_dir / f"{name}.lock")
+
+    def lock_escritura(self, name: str) -> FileLock:
+        """
+        El lock que toma cada escritura de la tabla: teniéndolo, nadie más escribe, así que
+        la versión leída antes y después de escribir solo difiere por lo propio.
+        """
+        return self._tabla_lock(name)
+
+    @contextlib.contextmanager
+    def lock(self, name: str, scope: str = ""):
+        """
+        Lock de aplicación para leer-validar-escribir. Sin `scope` es el de toda la tabla
+        (importaciones, editores, archivo) y es exclusivo. Con `scope` (por ejemplo los
+        turnos de una fecha) toma el de la tabla compartido y después el suyo exclusivo:
+        dos fechas distintas no se bloquean entre sí, pero ninguna entra mientras alguien
+        tiene la tabla entera. Las escrituras en sí toman además el lock de escritura de la
+        tabla. No pedir el de la tabla teniendo uno con scope (da RuntimeError).
+        """
+        tabla = self.locks_dir / f"{name}-all.lock"
+        with FileLock(tabla, compartido=bool(scope)):
+            if not scope:
+                yield
+                return
+            with FileLock(self.locks_dir / f"{name}-{scope}.lock"):
+                yield
+
+    def ensure(self):
+        for name, df in self.defaults.items():
+            if self.particionada(name) or self.files[name].exists():
+                continue
+            if name in PARTICIONADAS:
+                # Instalación nueva: los turnos arrancan particionados por mes
+                self.dir_particiones(name).mkdir(parents=True, exist_ok=True)
+            else:
+                df.to_csv(self.files[name], index=False, encoding="utf-8")
+
+    # ---- particiones
+    def dir_particiones(self, name: str) -> Path:
+        return self.data_dir / name
+
+    def particionada(self, name: str) -> bool:
+        return name in PARTICIONADAS and self.dir_particiones(name).is_dir()
+
+    def _particiones(self, name: str) -> list[Path]:
+        return sorted(self.dir_particiones(name).glob("*.csv"))
+
+    def _particion(self, name: str, mes: str) -> Path:
+        return self.dir_particiones(name) / f"{mes}.csv"
+
+    def _paths(self, name: str) -> list[Path]:
+        return self._particiones(name) if self.particionada(name) else [self.files[name]]
+
+    def _columnas_base(self, name: str) -> list[str]:
+        for path in self._paths(name):
+            if path.exists():
+                return _header(path)
+        df = self.defaults.get(name)
+        return list(df.columns) if df is not None else []
+
+    # ---- lectura
+    def version(self, name: str) -> tuple:
+        return tuple((str(p), *_stat_key(p)) for p in self._paths(name))
+
+    def version_rango(self, name: str, desde: str, hasta: str) -> tuple:
+        return tuple((str(p), *_stat_key(p)) for p in self._paths_rango(name, desde, hasta))
+
+    def read(self, name: str) -> pd.DataFrame:
+        return self._leer(name, self._paths(name))
+
+    def read_range(self, name: str, desde: str, hasta: str) -> pd.DataFrame:
+        """Filas de las particiones que cubren [desde, hasta] (AAAA-MM-DD). Sin particiones, toda la tabla."""
+        return self._leer(name, self._paths_rango(name, desde, hasta))
+
+    def _paths_rango(self, name: str, desde: str, hasta: str) -> list[Path]:
+        if not self.particionada(name):
+            return [self.files[name]]
+        if desde[:7] == hasta[:7]:  # un solo mes (consultas por día): sin listar la carpeta
+            path = self._particion(name, desde[:7])
+            return [path] if path.exists() else []
+        return [p for p in self._particiones(name) if desde[:7] <= p.stem <= hasta[:7]]
+
+    def _leer(self, name: str, paths: list[Path]) -> pd.DataFrame:
+        frames = [pd.read_csv(p, dtype=str).fillna("") for p in paths if p.exists()]
+        if not frames:
+            return pd.DataFrame(columns=self._columnas_base(name), dtype=str)
+        if len(frames) == 1:
+            return frames[0]
+        return pd.concat(frames, ignore_index=True).fillna("")
+
+    # ---- escritura
+    def write(self, name: str, df: pd.DataFrame):
+        with self._tabla_lock(name):
+            if not self.particionada(name):
+                escribir_csv_atomico(df, self.files[name])
+                return
+            meses = _mes_de(df["Fecha"]) if "Fecha" in df.columns else pd.Series(SIN_FECHA, index=df.index)
+            nuevas = set()
+            for mes, grupo in df.groupby(meses, sort=True):
+                escribir_csv_atomico(grupo, self._particion(name, mes))
+                nuevas.add(mes)
+            for path in self._particiones(name):
+                if path.stem not in nuevas:
+                    path.unlink()
+
+    def insert(self, name: str, row: dict):
+        with self._tabla_lock(name):
+            if self.particionada(name):
+                path = self._particion(name, _mes_de(pd.Series([row.get("Fecha", "")])).iloc[0])
+            else:
+                path = self.files[name]
+            agregar_fila_csv(path, row, self._columnas_base(name))
+
+    def insert_many(self, name: str, df: pd.DataFrame) -> int:
+        """Agrega muchas filas de una vez (un append por archivo o partición)."""
+        if df.empty:
+            return 0
+        with self._tabla_lock(name):
+            if not self.particionada(name):
+                agregar_filas_csv(self.files[name], df, self._columnas_base(name))
+                return len(df)
+            base = self._columnas_base(name)
+            for mes, grupo in df.groupby(_mes_de(df["Fecha"]), sort=True):
+                agregar_filas_csv(self._particion(name, mes), grupo, base)
+            return len(df)
+
+    def update(self, name: str, where: dict, values: dict, fecha: str | None = None) -> int:
+        """
+        Actualiza las filas que coinciden con `where`. Con turnos particionados, `fecha`
+        (la Fecha actual de la fila) indica la partición; sin ella se recorren todas.
+        """
+        with self._tabla_lock(name):
+            if not self.particionada(name):
+                paths = [self.files[name]]
+            elif fecha:
+                paths = [self._particion(name, _mes_de(pd.Series([fecha])).iloc[0])]
+            else:
+                paths = list(reversed(self._particiones(name)))
+            total = 0
+            for path in paths:
+                if path.exists():
+                    total += self._update_archivo(name, path, where, values)
+            return total
+
+    def _update_archivo(self, name: str, path: Path, where: dict, values: dict) -> int:
+        df = self._leer(name, [path])
+        mask = pd.Series(True, index=df.index)
+        for col, val in where.items():
+            mask &= df[col] == str(val)
+        n = int(mask.sum())
+        if not n:
+            return 0
+        for col, val in values.items():
+            if col not in df.columns:
+                df[col] = ""
+            df.loc[mask, col] = _to_str(val)
+        self._reescribir(name, path, df, "Fecha" in values)
+        return n
+
+    def _reescribir(self, name: str, path: Path, df: pd.DataFrame, cambio_fecha: bool = False):
+        """
+        Guarda un archivo ya modificado. Con turnos particionados y Fecha cambiada, las filas
+        que pasaron a otro mes se mueven a su partición; una partición vacía se borra.
+        """
+        if self.particionada(name) and cambio_fecha:
+            meses = _mes_de(df["Fecha"])
+            mover = meses != path.stem
+            for mes, grupo in df[mover].groupby(meses[mover]):
+                destino = self._particion(name, mes)
+                previo = self._leer(name, [destino]) if destino.exists() else grupo.iloc[0:0]
+                escribir_csv_atomico(pd.concat([previo, grupo], ignore_index=True).fillna(""), destino)
+            df = df[~mover]
+        if df.empty and self.particionada(name):
+            path.unlink()
+        else:
+            escribir_csv_atomico(df, path)
+
+    def update_many(self, name: str, clave: str, cambios: pd.DataFrame, fechas=None) -> int:
+        """
+        Actualiza en bloque: cada fila de `cambios` pisa, en la fila con el mismo `clave`,
+        las columnas que trae. Una lectura y una escritura por archivo. Con turnos
+        particionados, `fechas` (las Fecha actuales de esas filas) limita las particiones.
+        """
+        if cambios.empty:
+            return 0
+        nuevos = cambios.drop_duplicates(subset=[clave], keep="last").set_index(clave)
+        with self._tabla_lock(name):
+            if self.particionada(name) and fechas is not None:
+                paths = [self._particion(name, mes) for mes in sorted(set(_mes_de(pd.Series(list(fechas)))))]
+            else:
+                paths = self._paths(name)
+            total = 0
+            for path in paths:
+                if not path.exists():
+                    continue
+                df = self._leer(name, [path])
+                mask = df[clave].isin(nuevos.index)
+                if not mask.any():
+                    continue
+                for col in nuevos.columns:
+                    if col not in df.columns:
+                        df[col] = ""
+                    df.loc[mask, col] = df.loc[mask, clave].map(nuevos[col]).map(_to_str).to_numpy()
+                total += int(mask.sum())
+                self._reescribir(name, path, df, "Fecha" in nuevos.columns)
+            return total
+
+    def read_tail(self, name: str, offset: int, limit: int) -> pd.DataFrame:
+        """Página de filas en orden inverso de inserción (tablas solo-agregado como historial)."""
+        return leer_ultimas_csv(self.files[name], offset, limit)
+
+    def compact(self, name: str, orden: str) -> int:
+        """Reordena cronológicamente por `orden` y quita filas duplicadas exactas."""
+        with self._tabla_lock(name):
+            df = self.read(name)
+            out = _compactado(df, orden)
+            self.write(name, out)
+            return len(df) - len(out)
+
+    def delete(self, name: str, col: str, keys, fechas=None) -> int:
+        """
+        Borra las filas cuyo `col` está en `keys`. Devuelve cuántas borró. Con turnos
+        particionados, `fechas` (las Fecha de esas filas) limita las particiones como en update_many.
+        """
+        keys = {str(k) for k in keys}
+        if not keys:
+            return 0
+        with self._tabla_lock(name):
+            if self.particionada(name) and fechas is not None:
+                paths = [self._particion(name, mes) for mes in sorted(set(_mes_de(pd.Series(list(fechas)))))]
+            else:
+                paths = self._paths(name)
+            total = 0
+            for path in paths:
+                if not path.exists():
+                    continue
+                df = self._leer(name, [path])
+                mask = df[col].isin(keys)
+                n = int(mask.sum())
+                if n:
+                    self._reescribir(name, path, df[~mask])
+                    total += n
+            return total
+
+    def delete_row(self, name: str, where: dict, fecha: str | None = None) -> int:
+        """Borra las filas que coinciden con `where`; `fecha` indica la partición como en update."""
+        with self._tabla_lock(name):
+            if not self.particionada(name):
+                paths = [self.files[name]]
+            elif fecha:
+                paths = [self._particion(name, _mes_de(pd.Series([fecha])).iloc[0])]
+            else:
+                paths = self._particiones(name)
+            total = 0
+            for path in paths:
+                if not path.exists():
+                    continue
+                df = self._leer(name, [path])
+                mask = pd.Series(True, index=df.index)
+                for col, val in where.items():
+                    mask &= df[col] == str(val)
+                n = int(mask.sum())
+                if n:
+                    restantes = df[~mask]
+                    if restantes.empty and self.particionada(name):
+                        path.unlink()
+                    else:
+                        escribir_csv_atomico(restantes, path)
+                    total += n
+            return total
+
+    def upsert(self, name: str, row: dict, update_cols: list[str] | None = None):
+        where = {k: row[k] for k in CLAVES[name]}
+        cols = update_cols if update_cols is not None else [c for c in row if c not in where]
+        with self._tabla_lock(name):
+            if not self.update(name, where, {c: row[c] for c in cols}) and not self._exists(name, where):
+                self.insert(name, row)
+
+    def _exists(self, name: str, where: dict) -> bool:
+        df = self.read(name)
+        mask = pd.Series(True, index=df.index)
+        for col, val in where.items():
+            mask &= df[col] == str(val)
+        return bool(mask.any())
+
+    def particionar(self, name: str = "turnos") -> int:
+        """Migra data/<name>.csv a particiones mensuales. Deja el original como <name>.csv.migrado."""
+        with self._tabla_lock(name):
+            if self.particionada(name) and self._particiones(name):
+                raise RuntimeError(f"'{name}' ya está particionada en {self.dir_particiones(name)}")
+            df = self._leer(name, [self.files[name]]) if self.files[name].exists() else pd.DataFrame()
+            self.dir_particiones(name).mkdir(parents=True, exist_ok=True)
+            if not df.empty:
+                self.write(name, df)
+            if self.files[name].exists():
+                os.replace(self.files[name], self.files[name].with_name(f"{name}.csv.migrado"))
+            return len(df)
+
+
+class SqliteStorage:
+    """
+    Todas las tablas en una base SQLite (modo WAL). Altas, actualizaciones y upserts
+    tocan una sola fila; las columnas se guardan como TEXT igual que en los CSV.
+    """
+
+    nombre = "sqlite"
+
+    def __init__(self, db_path: Path, defaults: dict[str, pd.DataFrame]):
+        self.db_path = Path(db_path)
+        self.defaults = defaults
+        self._local = threading.local()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def ensure(self):
+        self.conn.execute("CREATE TABLE IF NOT EXISTS _versiones (tabla TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+        for name, df in self.defaults.items():
+            if not self._columnas(name):
+                self._crear(name, list(df.columns))
+                if not df.empty:
+                    self.write(name, df)
+
+    def _columnas(self, name: str) -> list[str]:
+        return [r[1] for r in self.conn.execute(f"PRAGMA table_info({_q(name)})")]
+
+    def _crear(self, name: str, columnas: list[str]):
+        cols = ", ".join(f"{_q(c)} TEXT NOT NULL DEFAULT ''" for c in columnas)
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {_q(name)} ({cols})")
+        for col in INDICES.get(name, []):
+            if col in columnas:
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS {_q(f'ix_{name}_{col}')} ON {_q(name)} ({_q(col)})")
+        self.conn.execute("INSERT OR IGNORE INTO _versiones (tabla, version) VALUES (?, 0)", (name,))
+
+    def _agregar_columnas(self, name: str, columnas) -> list[str]:
+        actuales = self._columnas(name)
+        if not actuales:
+            self._crear(name, list(columnas))
+            return list(columnas)
+        for col in columnas:
+            if col not in actuales:
+                self.conn.execute(f"ALTER TABLE {_q(name)} ADD COLUMN {_q(col)} TEXT NOT NULL DEFAULT ''")
+                actuales.append(col)
+        return actuales
+
+    def _bump(self, name: str):
+        self.conn.execute("UPDATE _versiones SET version = version + 1 WHERE tabla = ?", (name,))
+
+    def version(self, name: str) -> tuple:
+        row = self.conn.execute("SELECT version FROM _versiones WHERE tabla = ?", (name,)).fetchone()
+        return (str(self.db_path), name, row[0] if row else -1)
+
+    def read(self, name: str) -> pd.DataFrame:
+        cols = self._columnas(name)
+        rows = self.conn.execute(f"SELECT {', '.join(_q(c) for c in cols)} FROM {_q(name)} ORDER BY rowid").fetchall()
+        return pd.DataFrame(rows, columns=cols, dtype=str).fillna("")
+
+    def version_rango(self, name: str, desde: str, hasta: str) -> tuple:
+        return self.version(name)
+
+    def read_range(self, name: str, desde: str, hasta: str) -> pd.DataFrame:
+        """Filas con Fecha entre desde y hasta (AAAA-MM-DD), resuelto por el índice de Fecha."""
+        cols = self._columnas(name)
+        rows = self.conn.execute(
+            f"SELECT {', '.join(_q(c) for c in cols)} FROM {_q(name)} WHERE Fecha >= ? AND Fecha <= ? ORDER BY rowid",
+            (desde, hasta),
+        ).fetchall()
+        return pd.DataFrame(rows, columns=cols, dtype=str).fillna("")
+
+    def write(self, name: str, df: pd.DataFrame):
+        with self._tx():
+            cols = self._agregar_columnas(name, df.columns)
+            self.conn.execute(f"DELETE FROM {_q(name)}")
+            if not df.empty:
+                data = df.reindex(columns=cols).fillna("")
+                sql = f"INSERT INTO {_q(name)} ({', '.join(_q(c) for c in cols)}) VALUES ({', '.join('?' * len(cols))})"
+                self.conn.executemany(sql, ([_to_str(v) for v in r] for r in data.itertuples(index=False, name=None)))
+            self._bump(name)
+
+    def insert(self, name: str, row: dict):
+        with self._tx():
+            self._agregar_columnas(name, row.keys())
+            cols = list(row.keys())
+            sql = f"INSERT INTO {_q(name)} ({', '.join(_q(c) for c in cols)}) VALUES ({', '.join('?' * len(cols))})"
+            self.conn.execute(sql, [_to_str(row[c]) for c in cols])
+            self._bump(name)
+
+    def insert_many(self, name: str, df: pd.DataFrame) -> int:
+        if df.empty:
+            return 0
+        with self._tx():
+            self._agregar_columnas(name, df.columns)
+            cols = list(df.columns)
+            sql = f"INSERT INTO {_q(name)} ({', '.join(_q(c) for c in cols)}) VALUES ({', '.join('?' * len(cols))})"
+            self.conn.executemany(sql, ([_to_str(v) for v in r] for r in df.fillna("").itertuples(index=False, name=None)))
+            self._bump(name)
+        return len(df)
+
+    def update(self, name: str, where: dict, values: dict, fecha: str | None = None) -> int:
+        if not values:
+            return 0
+        with self._tx():
+            self._agregar_columnas(name, values.keys())
+            sets = ", ".join(f"{_q(c)} = ?" for c in values)
+            cond, params = _donde(where)
+            cur = self.conn.execute(f"UPDATE {_q(name)} SET {sets}{cond}",
+                                    [_to_str(v) for v in values.values()] + params)
+            if cur.rowcount:
+                self._bump(name)
+            return cur.rowcount
+
+    def update_many(self, name: str, clave: str, cambios: pd.DataFrame, fechas=None) -> int:
+        if cambios.empty:
+            return 0
+        cols = [c for c in cambios.columns if c != clave]
+        with self._tx():
+            self._agregar_columnas(name, cols)
+            sql = f"UPDATE {_q(name)} SET {', '.join(f'{_q(c)} = ?' for c in cols)} WHERE {_q(clave)} = ?"
+            antes = self.conn.total_changes
+            self.conn.executemany(sql, ([_to_str(v) for v in r] for r in cambios[cols + [clave]].fillna("").itertuples(index=False, name=None)))
+            total = self.conn.total_changes - antes
+            if total:
+                self._bump(name)
+        return total
+
+    def read_tail(self, name: str, offset: int, limit: int) -> pd.DataFrame:
+        cols = self._columnas(name)
+        rows = self.conn.execute(
+            f"SELECT {', '.join(_q(c) for c in cols)} FROM {_q(name)} ORDER BY rowid DESC LIMIT ? OFFSET ?",
+            (limit, offset),
+        ).fetchall()
+        return pd.DataFrame(rows, columns=cols, dtype=str).fillna("")
+
+    def compact(self, name: str, orden: str) -> int:
+        with self._tx():
+            df = self.read(name)
+            out = _compactado(df, orden)
+            self.write(name, out)
+        self.conn.execute("VACUUM")
+        return len(df) - len(out)
+
+    def delete(self, name: str, col: str, keys, fechas=None) -> int:
+        keys = [str(k) for k in keys]
+        if not keys:
+            return 0
+        total = 0
+        with self._tx():
+            for i in range(0, len(keys), 500):
+                lote = keys[i:i + 500]
+                cur = self.conn.execute(f"DELETE FROM {_q(name)} WHERE {_q(col)} IN ({', '.join('?' * len(lote))})", lote)
+                total += cur.rowcount
+            if total:
+                self._bump(name)
+        return total
+
+    def delete_row(self, name: str, where: dict, fecha: str | None = None) -> int:
+        with self._tx():
+            cond, params = _donde(where)
+            cur = self.conn.execute(f"DELETE FROM {_q(name)}{cond}", params)
+            if cur.rowcount:
+                self._bump(name)
+            return cur.rowcount
+
+    def upsert(self, name: str, row: dict, update_cols: list[str] | None = None):
+        where = {k: row[k] for k in CLAVES[name]}
+        cols = update_cols if update_cols is not None else [c for c in row if c not in where]
+        with self._tx():
+            cond = " AND ".join(f"{_q(c)} = ?" for c in where)
+            found = self.conn.execute(f"SELECT 1 FROM {_q(name)} WHERE {cond} LIMIT 1", [_to_str(v) for v in where.values()]).fetchone()
+            if found:
+                self.update(name, where, {c: row[c] for c in cols})
+            else:
+                self.insert(name, row)
+
+    def _tx(self):
+        return _Transaccion(self.conn)
+
+    def lock_escritura(self, name: str):
+        """Transacción BEGIN IMMEDIATE, como lock(): nadie más escribe en la base mientras dura."""
+        return self._tx()
+
+    def lock(self, name: str, scope: str = ""):
+        """
+        Transacción BEGIN IMMEDIATE: serializa a los escritores y da lecturas consistentes.
+        Con o sin `scope` abarca la base entera (el de la tabla también frena a las fechas).
+        """
+        return self._tx()
+
+
+class _Transaccion:
+    """BEGIN IMMEDIATE / COMMIT reentrante sobre una conexión en modo autocommit."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.propia = False
+
+    def __enter__(self):
+        if not self.conn.in_transaction:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.propia = True
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.propia:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def agregar_fila_csv(path: Path, row: dict, columnas_base: list[str] | None = None):
+    """
+    Agrega una fila al final de un CSV (modo append, sin leer el archivo). Solo reescribe
+    si el archivo no existe todavía o la fila trae una columna que el encabezado no tiene.
+    """
+    header = _header(path) if path.exists() else []
+    if not header or any(c not in header for c in row):
+        if path.exists():
+            base = pd.read_csv(path, dtype=str).fillna("")
+        else:
+            base = pd.DataFrame(columns=columnas_base or [])
+        df = pd.concat([base, pd.DataFrame([row])], ignore_index=True)
+        escribir_csv_atomico(df.fillna(""), path)
+        return
+    with open(path, "a", encoding="utf-8", newline="") as f:
+        if _falta_salto(path):
+            f.write("\n")
+        csv.writer(f, lineterminator="\n").writerow([_to_str(row.get(c, "")) for c in header])
+
+
+def agregar_filas_csv(path: Path, df: pd.DataFrame, columnas_base: list[str] | None = None):
+    """Como agregar_fila_csv pero con un DataFrame entero en un solo append."""
+    header = _header(path) if path.exists() else []
+    if not header or any(c not in header for c in df.columns):
+        if path.exists():
+            base = pd.read_csv(path, dtype=str).fillna("")
+        else:
+            base = pd.DataFrame(columns=columnas_base or [])
+        escribir_csv_atomico(pd.concat([base, df], ignore_index=True).fillna(""), path)
+        return
+    datos = df.reindex(columns=header).fillna("").to_csv(index=False, header=False, lineterminator="\n")
+    with open(path, "a", encoding="utf-8", newline="") as f:
+        if _falta_salto(path):
+            f.write("\n")
+        f.write(datos)
+
+
+def _falta_salto(path: Path) -> bool:
+    """True si el archivo no termina en salto de línea (hay que agregarlo antes de un append)."""
+    with open(path, "rb") as f:
+        f.seek(0, 2)
+        if f.tell() == 0:
+            return False
+        f.seek(-1, 2)
+        return f.read(1) != b"\n"
+
+
+def leer_ultimas_csv(path: Path, offset: int, limit: int) -> pd.DataFrame:
+    """
+    Filas de un CSV del final hacia el principio (la más nueva primero), leyendo
+    bloques desde el final del archivo hasta juntar offset + limit filas.
+    """
+    header = _header(path)
+    need = offset + limit
+    bloque = 64 * 1024
+    with open(path, "rb") as f:
+        f.seek(0, 2)
+        pos = f.tell()
+        data = b""
+        while pos > 0 and data.count(b"\n") <= need + 1:
+            leer = min(bloque, pos)
+            pos -= leer
+            f.seek(pos)
+            data = f.read(leer) + data
+    # se descarta la primera línea: es el encabezado o una línea cortada por el bloque
+    texto = data.decode("utf-8", errors="replace").split("\n", 1)[1] if b"\n" in data else ""
+    filas = [r for r in csv.reader(io.StringIO(texto, newline="")) if r]
+    if any(len(r) != len(header) for r in filas):
+        # Algún campo con saltos de línea: se lee todo el archivo
+        df = pd.read_csv(path, dtype=str).fillna("")
+        return df.iloc[::-1].iloc[offset:offset + limit].reset_index(drop=True)
+    filas = filas[::-1][offset:offset + limit]
+    return pd.DataFrame(filas, columns=header, dtype=str)
+
+
+def _compactado(df: pd.DataFrame, orden: str) -> pd.DataFrame:
+    if df.empty:
+        return df
+    claves = pd.to_datetime(df[orden], errors="coerce")
+    out = df.assign(_ord=claves).sort_values("_ord", kind="stable", na_position="first").drop(columns=["_ord"])
+    return out.drop_duplicates(keep="first").reset_index(drop=True)
+
+
+def _header(path: Path) -> list[str]:
+    with open(path, encoding="utf-8", newline="") as f:
+        return next(csv.reader(f), [])
+
+
+def _stat_key(path: Path) -> tuple:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return (0, 0)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _mes_de(fechas: pd.Series) -> pd.Series:
+    """Fecha (texto o date) -> 'AAAA-MM'; lo que no parsea va a la partición 'sin-fecha'."""
+    meses = pd.to_datetime(fechas.astype(str), errors="coerce", format="mixed").dt.strftime("%Y-%m")
+    return meses.fillna(SIN_FECHA)
+
+
+def escribir_csv_atomico(df: pd.DataFrame, path: Path):
+    """Escribe a un temporal en la misma carpeta y lo renombra: nunca queda un CSV a medias."""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        df.to_csv(tmp, index=False, encoding="utf-8")
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def _donde(where: dict) -> tuple[str, list[str]]:
+    """Cláusula WHERE por igualdad y sus parámetros. Sin condiciones son todas las filas, como en CsvStorage."""
+    if not where:
+        return "", []
+    return " WHERE " + " AND ".join(f"{_q(c)} = ?" for c in where), [_to_str(v) for v in where.values()]
+
+
+def _q(ident: str) -> str:
+    return '"' + str(ident).replace('"', '""') + '"'
+
+
+def _to_str(val) -> str:
+    if val is None or pd.isna(val):
+        return ""
+    return str(val)
+
+
+def get_storage(tipo: str, data_dir: Path, defaults: dict[str, pd.DataFrame]):
+    """Crea el backend pedido ('csv' o 'sqlite') y se asegura de que existan las tablas."""
+    tipo = (tipo or "csv").strip().lower()
+    if tipo == "csv":
+        backend = CsvStorage(data_dir, defaults)
+    elif tipo == "sqlite":
+        backend = SqliteStorage(Path(data_dir) / "estetica.db", defaults)
+    else:
+        raise ValueError(f"Backend de almacenamiento desconocido: {tipo!r} (usar 'csv' o 'sqlite')")
+    backend.ensure()
+    return backend
+
+
+def importar_csv_a_sqlite(data_dir: Path, db_path: Path | None = None, forzar: bool = False) -> dict[str, int]:
+    """
+    Copia data/*.csv a la base SQLite (una sola vez). Si la base ya tiene datos,
+    no hace nada salvo que se pida forzar. Devuelve filas importadas por tabla.
+    """
+    data_dir = Path(data_dir)
+    destino = SqliteStorage(db_path or data_dir / "estetica.db", {})
+    destino.ensure()
+    origen = CsvStorage(data_dir, {})
+    if not forzar:
+        for name in TABLAS:
+            if destino._columnas(name) and destino.conn.execute(f"SELECT 1 FROM {_q(name)} LIMIT 1").fetchone():
+                raise RuntimeError(f"La base ya tiene datos en '{name}'. Usá --forzar para reemplazarlos.")
+    importadas = {}
+    for name in TABLAS:
+        if not origen.particionada(name) and not origen.files[name].exists():
+            continue
+        df = origen.read(name)
+        destino.write(name, df)
+        importadas[name] = len(df)
+    return importadas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Herramientas de almacenamiento de Turnos Estética")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_imp = sub.add_parser("importar", help="Importa data/*.csv a SQLite")
+    p_imp.add_argument("--data", default=str(Path(__file__).parent / "data"), help="Carpeta con los CSV")
+    p_imp.add_argument("--db", default=None, help="Ruta de la base (por defecto <data>/estetica.db)")
+    p_imp.add_argument("--forzar", action="store_true", help="Reemplaza datos existentes en la base")
+    p_part = sub.add_parser("particionar", help="Migra data/turnos.csv a data/turnos/AAAA-MM.csv")
+    p_part.add_argument("--data", default=str(Path(__file__).parent / "data"), help="Carpeta con los CSV")
+    p_comp = sub.add_parser("compactar", help="Ordena cronológicamente el historial global y quita duplicados")
+    p_comp.add_argument("--data", default=str(Path(__file__).parent / "data"), help="Carpeta de datos")
+    p_comp.add_argument("--storage", default=os.environ.get("ESTETICA_STORAGE", "csv"), help="csv o sqlite")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "importar":
+        try:
+            importadas = importar_csv_a_sqlite(Path(args.data), Path(args.db) if args.db else None, args.forzar)
+        except RuntimeError as e:
+            parser.exit(1, f"{e}\n")
+        for name, n in importadas.items():
+            print(f"{name}: {n} filas")
+    elif args.cmd == "particionar":
+        try:
+            n = CsvStorage(Path(args.data), {}).particionar("turnos")
+        except RuntimeError as e:
+            parser.exit(1, f"{e}\n")
+        print(f"turnos: {n} filas particionadas por mes")
+    elif args.cmd == "compactar":
+        n = get_storage(args.storage, Path(args.data), {}).compact("historial", "Fecha")
+        print(f"historial: {n} filas duplicadas quitadas")
+
+
+if __name__ == "__main__":
+    main()
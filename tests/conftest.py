@@ -0,0 +1,85 @@
+# ==========================================================
+# Fixtures de las pruebas
+# - datos: núcleo apuntando a una carpeta temporal, una vez por backend (csv / sqlite)
+# - otro_proceso: reserva desde un proceso aparte, disparada cuando la prueba lo pide
+# ==========================================================
+import subprocess
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+import core  # noqa: E402
+
+# Reserva en otro proceso: espera una línea por stdin y recién ahí reserva
+SCRIPT_RESERVA = """
+import sys
+from datetime import date
+from pathlib import Path
+sys.path.insert(0, sys.argv[1])
+import core
+core.configurar(Path(sys.argv[2]), sys.argv[3])
+core.load_df("turnos")
+print("listo", flush=True)
+sys.stdin.readline()
+ok, res = core.reservar(date.fromisoformat(sys.argv[4]), sys.argv[5], "Láser", ["Axilas"], cliente_id="otro")
+print(res, flush=True)
+sys.exit(0 if ok else 1)
+"""
+
+
+def martes(semanas: int = 8) -> date:
+    """Primer martes de un mes futuro: martes y miércoles abren 09-17 y caen en la misma partición."""
+    base = date.today() + timedelta(weeks=semanas)
+    d = base.replace(day=1)
+    return d + timedelta(days=(1 - d.weekday()) % 7)
+
+
+@pytest.fixture(params=["csv", "sqlite"])
+def datos(request, tmp_path):
+    core.configurar(tmp_path, request.param)
+    core.ensure_files()
+    return core
+
+
+class OtroProceso:
+    """Un `core.reservar` en un proceso aparte sobre la misma carpeta de datos."""
+
+    def __init__(self, data_dir: Path, backend: str, fecha: date, inicio: str):
+        self.proc = subprocess.Popen(
+            [sys.executable, "-c", SCRIPT_RESERVA, str(BASE_DIR), str(data_dir), backend, fecha.isoformat(), inicio],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        assert self.proc.stdout.readline().strip() == "listo"
+
+    def disparar(self, espera: float = 3.0):
+        """Libera la reserva y espera hasta `espera` segundos (puede quedar bloqueada en un lock)."""
+        self.proc.stdin.write("\n")
+        self.proc.stdin.flush()
+        try:
+            self.proc.wait(timeout=espera)
+        except subprocess.TimeoutExpired:
+            pass
+
+    def terminar(self) -> bool:
+        """Espera a que termine; True si la reserva se hizo."""
+        return self.proc.wait(timeout=60) == 0
+
+
+@pytest.fixture
+def otro_proceso(datos):
+    procesos = []
+
+    def crear(fecha: date, inicio: str) -> OtroProceso:
+        p = OtroProceso(core.DATA_DIR, core.STORAGE_BACKEND, fecha, inicio)
+        procesos.append(p)
+        return p
+
+    yield crear
+    for p in procesos:
+        if p.proc.poll() is None:
+            p.proc.kill()
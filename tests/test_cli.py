@@ -0,0 +1,16 @@
+import pytest
+
+from conftest import martes
+
+
+def test_disponibilidad_por_consola(datos, capsys):
+    datos.main(["disponibilidad", "--fecha", martes().isoformat(), "--tipo", "Láser", "--zonas", "Axilas"])
+    assert capsys.readouterr().out.startswith("09:00 09:10")
+
+
+@pytest.mark.parametrize("tipo, zonas", [("Laser", ["Axilas"]), ("Láser", ["Axila"]), ("Láser", ["Axilas", "Codo"])])
+def test_servicio_desconocido_sale_con_error(datos, capsys, tipo, zonas):
+    with pytest.raises(SystemExit) as salida:
+        datos.main(["disponibilidad", "--fecha", martes().isoformat(), "--tipo", tipo, "--zonas", *zonas])
+    assert salida.value.code == 1
+    assert "desconocidos" in capsys.readouterr().err
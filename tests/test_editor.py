@@ -0,0 +1,82 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+import analitica
+import core
+from conftest import martes
+
+
+def _ventana(desde, hasta):
+    return lambda: core.load_turnos(desde, hasta).assign(Fecha=lambda d: d["Fecha"].astype(str))
+
+
+def test_no_agrega_un_turno_id_que_existe_fuera_de_la_ventana(datos):
+    d = martes()
+    ok, tid = datos.reservar(d, "10:00", "Láser", ["Axilas"], cliente_id="1")
+    assert ok
+    desde, hasta = d + timedelta(days=60), d + timedelta(days=67)
+    base = datos.load_turnos(desde, hasta).reindex(columns=datos.DEFAULT_TURNOS.columns)
+    nueva = {"Turno_ID": tid, "Cliente_ID": "2", "Fecha": (d + timedelta(days=61)).isoformat(), "Inicio": "10:00",
+             "Fin": "10:15", "Tipo": "Láser", "Zonas": "Axilas", "Duracion_total": "15", "Estado": "Confirmado"}
+    res = datos.aplicar_cambios_editor("turnos", base, {"added_rows": [nueva]}, _ventana(desde, hasta))
+    assert res["agregados"] == 0 and res["conflictos"] == [f"{tid}: ya existe, no se agregó"]
+    assert (datos.load_df("turnos")["Turno_ID"] == tid).sum() == 1
+
+
+def test_guarda_en_bloque_y_mantiene_grillas_y_analitica(datos, monkeypatch):
+    d = martes()
+    ids = [datos.reservar(d, f"{h:02d}:00", "Láser", ["Axilas"], cliente_id=str(h))[1] for h in range(9, 16)]
+    datos.reconstruir_analitica()
+    datos.grillas_rango(d, d + timedelta(days=40))
+    base = datos.load_turnos(d, d).sort_values("Inicio").reset_index(drop=True)
+    base = base.assign(Fecha=base["Fecha"].astype(str)).reindex(columns=datos.DEFAULT_TURNOS.columns)
+    otro_mes = (d + timedelta(days=35)).isoformat()
+    cambios = {
+        "edited_rows": {0: {"Estado": "Cancelado"}, 1: {"Notas": "x", "Estado": "Realizado"},
+                        2: {"Fecha": otro_mes}},
+        "deleted_rows": [3, 4],
+        "added_rows": [{"Cliente_ID": "9", "Fecha": d.isoformat(), "Inicio": "16:00", "Fin": "16:15",
+                        "Tipo": "Láser", "Zonas": "Axilas", "Duracion_total": "15", "Estado": "Confirmado"}],
+    }
+    st_ = datos.get_storage()
+    llamadas = []
+    for metodo in ("update", "update_many", "delete", "delete_row", "insert", "insert_many"):
+        original = getattr(st_, metodo)
+        monkeypatch.setattr(st_, metodo, lambda *a, _m=metodo, _o=original, **k: llamadas.append(_m) or _o(*a, **k))
+    res = datos.aplicar_cambios_editor("turnos", base, cambios, _ventana(d, d))
+    assert res == {"actualizados": 3, "agregados": 1, "borrados": 2, "conflictos": []}
+    assert sorted(llamadas) == ["delete", "insert_many", "update_many"]
+
+    turnos = datos.load_df("turnos").set_index("Turno_ID")
+    assert turnos.loc[ids[0], "Estado"] == "Cancelado"
+    assert turnos.loc[ids[1], ["Notas", "Estado"]].tolist() == ["x", "Realizado"]
+    assert str(turnos.loc[ids[2], "Fecha"]) == otro_mes
+    assert ids[3] not in turnos.index and ids[4] not in turnos.index
+    assert len(turnos) == 6
+    for dia in (d, date.fromisoformat(otro_mes)):
+        cacheada = datos.grilla_dia(dia)
+        assert np.array_equal(cacheada.conteo, datos.armar_grilla(dia, datos.load_turnos(dia, dia)).conteo)
+    incremental, _ = analitica.leer(datos.DATA_DIR, d, d + timedelta(days=40))
+    datos.reconstruir_analitica()
+    reconstruido, _ = analitica.leer(datos.DATA_DIR, d, d + timedelta(days=40))
+    orden = ["Fecha", "Tipo", "Zona", "Estado"]
+    pd.testing.assert_frame_equal(incremental.sort_values(orden).reset_index(drop=True),
+                                  reconstruido.sort_values(orden).reset_index(drop=True), check_dtype=False)
+
+
+
+def test_normaliza_o_rechaza_inicio_y_fin(datos):
+    d = martes()
+    ids = [datos.reservar(d, f"{h:02d}:00", "Láser", ["Axilas"], cliente_id=str(h))[1] for h in (9, 11)]
+    base = datos.load_turnos(d, d).sort_values("Inicio").reset_index(drop=True)
+    base = base.assign(Fecha=base["Fecha"].astype(str)).reindex(columns=datos.DEFAULT_TURNOS.columns)
+    cambios = {"edited_rows": {0: {"Inicio": "9.30", "Fin": "09:45:00"}, 1: {"Inicio": "11:5"}}}
+    res = datos.aplicar_cambios_editor("turnos", base, cambios, _ventana(d, d))
+    assert res["actualizados"] == 1
+    assert res["conflictos"] == [f"{ids[1]}: Inicio no es una hora (HH:MM), no se guardó"]
+    turnos = datos.load_df("turnos").set_index("Turno_ID")
+    assert turnos.loc[ids[0], ["Inicio", "Fin"]].tolist() == ["09:30", "09:45"]
+    assert turnos.loc[ids[1], "Inicio"] == "11:00"
+    assert datos.asignar_recursos(d, 9 * 60 + 30, 15) is None
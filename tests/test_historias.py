@@ -0,0 +1,21 @@
+import historias
+
+
+def _registro(cliente: str, turno: str, fecha: str) -> dict:
+    return {"Fecha": fecha, "Evento": "Turno finalizado", "Turno_ID": turno, "Cliente_ID": cliente, "Nombre": "N",
+            "Turno_Fecha": fecha[:10], "Inicio": "10:00", "Fin": "10:30", "Tipo": "Láser", "Zonas": "Axilas",
+            "Duracion_min": "30", "Estado": "Realizado", "Notas": ""}
+
+
+def test_indice_incremental_igual_al_reconstruido(tmp_path):
+    historias.agregar(tmp_path, [_registro("1", "a", "2025-12-30 10:00"), _registro("2", "b", "2026-01-02 11:00")])
+    historias.agregar(tmp_path, [_registro("1", "c", "2026-01-05 09:00")])
+    indice = tmp_path / "indice.csv"
+    incremental = indice.read_bytes()
+    assert b"\r" not in incremental
+    historias.reindexar(tmp_path)
+    assert indice.read_bytes() == incremental
+    historias.agregar(tmp_path, [_registro("2", "d", "2026-02-01 09:00")])
+    assert b"\r" not in indice.read_bytes()
+    assert list(historias.historia(tmp_path, "1")["Turno_ID"]) == ["a", "c"]
+    assert historias.registro(tmp_path, "d")["Cliente_ID"] == "2"
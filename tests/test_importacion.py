@@ -0,0 +1,40 @@
+import pandas as pd
+
+import importacion
+from conftest import martes
+
+
+def test_importar_mientras_se_reserva(datos, otro_proceso, monkeypatch):
+    d = martes()
+    otro = otro_proceso(d, "10:00")
+    original = importacion.choques_con
+    llamadas = []
+
+    def choques_con(agenda, lote, buffer_min=None):
+        res = original(agenda, lote, buffer_min)
+        llamadas.append(len(agenda))
+        if len(llamadas) == 1:
+            otro.disparar()  # la reserva entra entre la validación y la escritura
+        return res
+
+    monkeypatch.setattr(importacion, "choques_con", choques_con)
+    res = importacion.importar_turnos(pd.DataFrame([
+        {"Fecha": d.isoformat(), "Inicio": "10:00", "Tipo": "Láser", "Zonas": "Axilas", "Cliente_ID": "1"},
+        {"Fecha": d.isoformat(), "Inicio": "12:00", "Tipo": "Láser", "Zonas": "Axilas", "Cliente_ID": "2"},
+    ]), aplicar=True)
+    assert otro.terminar()
+    assert res["validas"] == 1 and res["errores"] == 1
+    assert res["informe"]["Motivo"].iloc[0].startswith("Se superpone con el turno existente")
+    assert list(res["turnos"]["Inicio"]) == ["12:00"]
+    turnos = datos.load_df("turnos")
+    assert sorted(turnos["Inicio"]) == ["10:00", "12:00"]
+    assert datos.auditar_agenda().empty
+
+
+def test_simulacion_no_escribe(datos):
+    d = martes()
+    res = importacion.importar_turnos(pd.DataFrame([
+        {"Fecha": d.isoformat(), "Inicio": "10:00", "Tipo": "Láser", "Zonas": "Axilas", "Cliente_ID": "1"},
+    ]))
+    assert res["validas"] == 1 and not res["aplicado"]
+    assert datos.load_df("turnos").empty and datos.load_df("clientes").empty
@@ -0,0 +1,50 @@
+import pandas as pd
+
+import core
+from conftest import martes
+
+RECURSOS = pd.DataFrame([
+    ["ana", "Ana", "Operadora", "", "Sí"],
+    ["bea", "Bea", "Operadora", "", "Sí"],
+    ["laser1", "Equipo láser", "Laser", "", "Sí"],
+], columns=core.DEFAULT_RECURSOS.columns)
+
+
+def test_servicio_sin_recursos_ocupa_una_operadora(datos):
+    datos.insert_rows("recursos", RECURSOS)
+    d = martes()
+    assert datos.recursos().requisitos([]) == [(0, 1)]
+    asignados = []
+    for cliente in ("1", "2"):
+        ok, tid = datos.reservar(d, "10:00", "Láser", ["Axilas"], cliente_id=cliente)
+        assert ok
+        asignados.append(datos.load_df("turnos").set_index("Turno_ID").loc[tid, "Recursos"])
+    assert sorted(asignados) == ["ana", "bea"]
+    # El equipo queda libre pero no alcanza: hace falta una operadora
+    assert datos.asignar_recursos(d, 600, 15) is None
+    ok, _ = datos.reservar(d, "10:00", "Láser", ["Axilas"], cliente_id="3")
+    assert not ok
+
+
+def test_clase_por_defecto_configurable(datos, monkeypatch):
+    datos.insert_rows("recursos", RECURSOS)
+    monkeypatch.setattr(core, "CLASE_DEFECTO", "laser")
+    assert core.Recursos(datos.load_df("recursos")).requisitos([]) == [(2,)]
+    # Sin recursos de la clase por defecto, cualquiera sirve
+    monkeypatch.setattr(core, "CLASE_DEFECTO", "cabina")
+    assert core.Recursos(datos.load_df("recursos")).requisitos([]) == [(0, 1, 2)]
+
+
+def test_editor_de_servicios_rechaza_recursos_desconocidos(datos):
+    datos.insert_rows("recursos", RECURSOS)
+    base = datos.load_df("servicios").reset_index(drop=True)
+    nueva = {"Tipo": "Láser", "Zona": "Espalda", "Duracion_min": "30", "Precio": "20000", "Recursos": "cabina"}
+    cambios = {"edited_rows": {0: {"Recursos": "operadora, laserr"}, 1: {"Recursos": "Laser"}},
+               "added_rows": [nueva]}
+    res = datos.aplicar_cambios_editor("servicios", base, cambios, lambda: datos.load_df("servicios"))
+    assert res["actualizados"] == 1 and res["agregados"] == 0
+    assert len(res["conflictos"]) == 2
+    assert "laserr" in res["conflictos"][0] and "cabina" in res["conflictos"][1]
+    servicios = datos.load_df("servicios")
+    assert servicios.loc[0, "Recursos"] == "" and servicios.loc[1, "Recursos"] == "Laser"
+    assert "Espalda" not in set(servicios["Zona"])
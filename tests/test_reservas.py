@@ -0,0 +1,97 @@
+import threading
+import time
+from datetime import timedelta
+
+import core
+import storage
+from conftest import martes
+
+
+def _turno(fecha, inicio: str, fin: str, turno_id: str) -> dict:
+    return {"Turno_ID": turno_id, "Cliente_ID": "x", "Fecha": fecha.isoformat(), "Inicio": inicio, "Fin": fin,
+            "Tipo": "Láser", "Zonas": "Axilas", "Duracion_total": "15", "Estado": "Confirmado", "Notas": "",
+            "RecordatorioEnviado": "", "Recursos": ""}
+
+
+def _en_hilo(fn) -> tuple[threading.Thread, threading.Event]:
+    hecho = threading.Event()
+
+    def correr():
+        fn()
+        hecho.set()
+
+    hilo = threading.Thread(target=correr)
+    hilo.start()
+    return hilo, hecho
+
+
+def test_lock_de_tabla_frena_a_las_fechas(datos):
+    d = martes()
+    st_ = datos.get_storage()
+
+    def fecha():
+        with st_.lock("turnos", d.isoformat()):
+            pass
+
+    with st_.lock("turnos"):
+        hilo, hecho = _en_hilo(fecha)
+        time.sleep(0.3)
+        assert not hecho.is_set()
+    hilo.join(10)
+    assert hecho.is_set()
+
+
+def test_fechas_distintas_no_se_bloquean(tmp_path):
+    core.configurar(tmp_path, "csv")
+    st_ = core.get_storage()
+    d = martes()
+
+    def otra_fecha():
+        with st_.lock("turnos", (d + timedelta(days=1)).isoformat()):
+            pass
+
+    with st_.lock("turnos", d.isoformat()):
+        hilo, hecho = _en_hilo(otra_fecha)
+        hilo.join(5)
+        assert hecho.is_set()
+
+
+def test_reserva_revalida_con_cambios_de_afuera(datos):
+    d = martes()
+    assert any(s.strftime("%H:%M") == "10:00" for s in datos.generar_slots(d, 15))  # grilla cacheada
+    afuera = storage.get_storage(datos.STORAGE_BACKEND, datos.DATA_DIR, datos.DEFAULT_TABLAS)
+    afuera.insert("turnos", _turno(d, "10:00", "10:15", "afuera"))
+    ok, motivo = datos.reservar(d, "10:00", "Láser", ["Axilas"], cliente_id="1")
+    assert not ok and "ocupar" in motivo
+    assert all(s.strftime("%H:%M") != "10:00" for s in datos.generar_slots(d, 15))
+
+
+def test_misma_fecha_en_dos_procesos(datos, otro_proceso):
+    d = martes()
+    otro = otro_proceso(d, "10:00")
+    with datos.get_storage().lock("turnos", d.isoformat()):
+        otro.disparar(espera=0.5)  # queda esperando el lock de la fecha
+        assert datos.reservar(d, "10:00", "Láser", ["Axilas"], cliente_id="1")[0]
+    assert not otro.terminar()
+    assert len(datos.load_df("turnos")) == 1
+    assert datos.auditar_agenda().empty
+
+
+def test_grillas_no_se_marcan_al_dia_con_escrituras_ajenas(datos, otro_proceso, monkeypatch):
+    martes_, miercoles = martes(), martes() + timedelta(days=1)
+    datos.grillas_rango(martes_, miercoles)
+    otro = otro_proceso(miercoles, "10:00")
+    original = datos._grillas_frescas
+
+    def grillas_frescas():
+        frescas = original()
+        otro.disparar(espera=1.5)  # otro proceso reserva el miércoles entre la foto y la escritura
+        return frescas
+
+    monkeypatch.setattr(datos, "_grillas_frescas", grillas_frescas)
+    assert datos.reservar(martes_, "09:00", "Láser", ["Axilas"], cliente_id="1")[0]
+    monkeypatch.setattr(datos, "_grillas_frescas", original)
+    assert otro.terminar()
+    assert all(s.strftime("%H:%M") != "10:00" for s in datos.generar_slots(miercoles, 15))
+    assert not datos.reservar(miercoles, "10:00", "Láser", ["Axilas"], cliente_id="1")[0]
+    assert datos.auditar_agenda().empty
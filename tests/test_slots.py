@@ -0,0 +1,100 @@
+import random
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+import core
+from conftest import martes
+
+
+def slots_originales(date_obj: date, dur_min: int, turnos_df: pd.DataFrame, slot_step_min: int = core.SLOT_STEP_MIN):
+    """generar_slots tal como estaba antes del motor por intervalos (candidato × turno con iterrows)."""
+    if dur_min <= 0:
+        return []
+    tramos = core.DEFAULT_DISPONIBILIDAD_CODE.get(date_obj.isoweekday(), [])
+    if not tramos:
+        return []
+    activos = pd.DataFrame()
+    if not turnos_df.empty:
+        activos = turnos_df[(turnos_df["Fecha"] == date_obj) & (~turnos_df["Estado"].isin(["Cancelado", "No-show"]))]
+    result = []
+    step, dur = timedelta(minutes=slot_step_min), timedelta(minutes=dur_min)
+    buff = timedelta(minutes=core.BUFFER_MIN_DEFAULT)
+    for ini, fin in tramos:
+        current = datetime.combine(date_obj, core.to_time(ini))
+        end_window = datetime.combine(date_obj, core.to_time(fin))
+        while current + dur <= end_window:
+            ok = True
+            for _, t in activos.iterrows():
+                try:
+                    t_start = datetime.combine(date_obj, datetime.strptime(t["Inicio"], "%H:%M").time())
+                    t_end = datetime.combine(date_obj, datetime.strptime(t["Fin"], "%H:%M").time())
+                except Exception:
+                    continue
+                if current - buff < t_end and t_start < current + dur + buff:
+                    ok = False
+                    break
+            if ok:
+                result.append(current)
+            current += step
+    return sorted(dict.fromkeys(result))
+
+
+def _agenda(dias: list[date], semilla: int) -> pd.DataFrame:
+    rnd = random.Random(semilla)
+    filas = []
+    for d in dias:
+        for k in range(rnd.randint(0, 8)):
+            ini = rnd.randrange(8 * 60, 17 * 60, 5)
+            fin = ini + rnd.choice([15, 20, 25, 40, 70])
+            filas.append({"Turno_ID": f"{d}-{k}", "Cliente_ID": "1", "Fecha": d.isoformat(),
+                          "Inicio": f"{ini // 60:02d}:{ini % 60:02d}", "Fin": f"{fin // 60:02d}:{fin % 60:02d}",
+                          "Tipo": "Láser", "Zonas": "Axilas", "Duracion_total": str(fin - ini),
+                          "Estado": rnd.choice(["Confirmado", "Confirmado", "Cancelado", "No-show", "Realizado"]),
+                          "Notas": "", "RecordatorioEnviado": "", "Recursos": ""})
+    filas.append({**filas[-1], "Turno_ID": "roto", "Inicio": "9:7x"})
+    return pd.DataFrame(filas).reindex(columns=core.DEFAULT_TURNOS.columns)
+
+
+def test_generar_slots_igual_al_original(datos):
+    dias = [martes() - timedelta(days=1) + timedelta(days=k) for k in range(14)]
+    datos.save_df("turnos", _agenda(dias, 7))
+    turnos = datos.load_df("turnos")
+    for d in dias:
+        for dur in (10, 15, 30, 45, 60, 95):
+            esperado = slots_originales(d, dur, turnos)
+            assert datos.generar_slots(d, dur, turnos) == esperado, (d, dur)
+            assert datos.generar_slots(d, dur) == esperado, (d, dur)  # grilla cacheada
+            assert datos.generar_slots(d, dur, turnos, slot_step_min=15) == slots_originales(d, dur, turnos, 15)
+
+
+def test_grilla_cacheada_sigue_las_escrituras(datos):
+    d = martes()
+    datos.generar_slots(d, 30)
+    ok, tid = datos.reservar(d, "10:00", "Láser", ["Axilas"], cliente_id="1")
+    assert ok
+    turnos = datos.load_df("turnos")
+    assert datos.generar_slots(d, 30) == slots_originales(d, 30, turnos)
+    datos.cancelar(tid)
+    turnos = datos.load_df("turnos")
+    assert datos.generar_slots(d, 30) == slots_originales(d, 30, turnos)
+
+
+def test_horas_raras_igual_en_un_dia_y_en_un_rango(datos):
+    raras = ["10:00", "10:00:00", "10.30", "9:05", " 11:00", "9:5", "24:00", "10:60", "", "nan", "１０:００"]
+    esperado = [core.hhmm_a_min(x) for x in raras]
+    serie = core.minutos_serie(pd.Series(raras))
+    assert [None if pd.isna(m) else int(m) for m in serie] == esperado
+    assert esperado[:6] == [600, 600, 630, 545, 660, None]
+
+    d = martes()
+    dia = pd.DataFrame([{"Turno_ID": str(k), "Fecha": d.isoformat(), "Inicio": x, "Fin": "12:00",
+                         "Estado": "Confirmado", "Recursos": ""} for k, x in enumerate(raras)])
+    relleno = pd.concat([dia.assign(Fecha=(d + timedelta(days=1)).isoformat())] * 50, ignore_index=True)
+    rec = datos.recursos()
+    _, ini_dia, _, pos_dia = core._celdas_turnos(dia, rec)
+    _, ini_rango, _, pos_rango = core._celdas_turnos(pd.concat([dia, relleno], ignore_index=True), rec)
+    assert len(relleno) + len(dia) > 500
+    en_dia = pos_rango < len(dia)
+    assert pos_dia.tolist() == pos_rango[en_dia].tolist()
+    assert ini_dia.tolist() == ini_rango[en_dia].tolist()